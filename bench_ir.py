@@ -0,0 +1,91 @@
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from dc_ir import dc_from_json
+
+
+OPS = ["EQUAL", "UNEQUAL", "LESS", "LESS_EQUAL", "GREATER", "GREATER_EQUAL"]
+
+
+def generate_dc_dicts(num_templates, num_columns, max_predicates, table="flights.csv", seed=0):
+    """Gera DCs sintéticas no formato JSON do Metanome (já decodificadas)."""
+    rng = random.Random(seed)
+    columns = [f"col_{c}" for c in range(num_columns)]
+
+    def column(name):
+        return {"tableIdentifier": table, "columnIdentifier": name}
+
+    dcs = []
+    for _ in range(num_templates):
+        predicates = []
+        for _ in range(rng.randint(1, max_predicates)):
+            name = rng.choice(columns)
+            predicates.append({
+                "type": "de.metanome.algorithm_integration.PredicateVariable",
+                "column1": column(name), "index1": 0,
+                "op": rng.choice(OPS),
+                "column2": column(name), "index2": 1
+            })
+        dcs.append({"type": "DenialConstraint", "predicates": predicates})
+
+    return dcs
+
+
+# todos partem do texto JSON de cada linha, como no arquivo de resultados
+
+def build_dicts(texts, count):
+    # json.loads puro: cada DC com seus próprios dicts e strings
+    return [json.loads(texts[k % len(texts)]) for k in range(count)]
+
+
+def build_tuples(texts, count):
+    # forma antiga de dc_to_predicates: tuplas com os nomes das colunas
+    dcs = []
+    for k in range(count):
+        dc = json.loads(texts[k % len(texts)])
+        dcs.append([
+            (p["column1"]["columnIdentifier"], p["index1"], p["op"],
+             p["column2"]["columnIdentifier"], p["index2"])
+            for p in dc["predicates"]
+        ])
+    return dcs
+
+
+def build_ir(texts, count):
+    return [dc_from_json(texts[k % len(texts)]) for k in range(count)]
+
+
+def measure(name, build, texts, count):
+    # tempo sem tracemalloc, que deixa a alocação bem mais lenta
+    start_time = time.perf_counter()
+    objects = build(texts, count)
+    elapsed = time.perf_counter() - start_time
+    del objects
+
+    tracemalloc.start()
+    objects = build(texts, count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+
+    print(f"{name:<8} | {elapsed:8.2f} s | {count / elapsed:12.0f} DCs/s | "
+          f"retido: {current / 1024 ** 2:9.1f} MB | pico: {peak / 1024 ** 2:9.1f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memória e tempo de construção da IR de DCs")
+    parser.add_argument("--count", type=int, default=1_000_000, help="Número de DCs construídas")
+    parser.add_argument("--templates", type=int, default=10_000, help="DCs distintas geradas")
+    parser.add_argument("--columns", type=int, default=20, help="Colunas distintas")
+    parser.add_argument("--max-predicates", type=int, default=5, help="Máximo de predicados por DC")
+    args = parser.parse_args()
+
+    texts = [json.dumps(dc) for dc in generate_dc_dicts(args.templates, args.columns, args.max_predicates)]
+
+    print(f"Construindo {args.count} DCs a partir de {args.templates} modelos")
+    measure("dicts", build_dicts, texts, args.count)
+    measure("tuplas", build_tuples, texts, args.count)
+    measure("IR", build_ir, texts, args.count)
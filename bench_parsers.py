@@ -0,0 +1,73 @@
+import argparse
+import random
+import time
+
+from dc_parser_lark import parse_text_dc, lalr_text_parser, earley_text_parser
+from dc_parser_parsimonious import translate_dc_to_sql_parsimonious
+
+
+OPS = ["=", "!=", "<", "<=", ">", ">="]
+
+
+def generate_text_dcs(count, num_columns, max_predicates, seed=0):
+    """Gera DCs sintéticas no formato textual ¬(t.a = t'.a ∧ ...)."""
+    rng = random.Random(seed)
+    columns = [f"col_{c}" for c in range(num_columns)]
+
+    dcs = []
+    for _ in range(count):
+        predicates = []
+        for _ in range(rng.randint(1, max_predicates)):
+            predicates.append(f"t.{rng.choice(columns)} {rng.choice(OPS)} t'.{rng.choice(columns)}")
+        # sem espaço depois de "¬(", que a gramática do parsimonious não aceita
+        dcs.append("¬(" + " ∧ ".join(predicates) + ")")
+
+    return dcs
+
+
+def parse_earley(texts):
+    for text in texts:
+        parse_text_dc(text, "bench.csv", parser="earley")
+
+
+def parse_lalr(texts):
+    for text in texts:
+        parse_text_dc(text, "bench.csv", parser="lalr")
+
+
+def parse_parsimonious(texts):
+    # tradutor como está em dc_parser_parsimonious: monta a gramática a cada
+    # DC e devolve o SQL
+    for text in texts:
+        translate_dc_to_sql_parsimonious(text, "bench.csv")
+
+
+def measure(name, parse, texts):
+    start_time = time.perf_counter()
+    parse(texts)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"{name:<13} | {len(texts):8d} DCs | {elapsed:8.2f} s | {len(texts) / elapsed:10.0f} DCs/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vazão dos parsers do formato textual de DCs")
+    parser.add_argument("--count", type=int, default=20_000, help="Número de DCs analisadas por parser")
+    parser.add_argument("--columns", type=int, default=20, help="Colunas distintas")
+    parser.add_argument("--max-predicates", type=int, default=5, help="Máximo de predicados por DC")
+    args = parser.parse_args()
+
+    texts = generate_text_dcs(args.count, args.columns, args.max_predicates)
+
+    # a construção dos parsers (e a leitura do cache do LALR) fica fora da medida
+    start_time = time.perf_counter()
+    earley_text_parser()
+    print(f"Construção Earley: {time.perf_counter() - start_time:.3f} s")
+
+    start_time = time.perf_counter()
+    lalr_text_parser("bench.csv")
+    print(f"Construção LALR:   {time.perf_counter() - start_time:.3f} s")
+
+    measure("lark earley", parse_earley, texts)
+    measure("lark lalr", parse_lalr, texts)
+    measure("parsimonious", parse_parsimonious, texts)
@@ -0,0 +1,76 @@
+import argparse
+import os
+import time
+import duckdb
+
+from dc_planner import count_equality_dcs
+
+
+def generate_equality_csv(file_path, num_rows, cardinality):
+    """Gera um CSV com uma coluna de baixa cardinalidade para DCs de igualdade."""
+    if os.path.exists(file_path):
+        print(f"O arquivo {file_path} já existe. Pulando a geração.")
+        return
+
+    print(f"Gerando arquivo CSV com {num_rows} linhas em {file_path}...")
+    duckdb.execute(
+        f"COPY (SELECT i AS id, i % {cardinality} AS grupo FROM range({num_rows}) t(i)) "
+        f"TO '{file_path}' (HEADER, DELIMITER ',');"
+    )
+
+
+def time_query(fn):
+    start_time = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start_time
+
+
+def run_benchmark(row_counts, cardinality, out_dir):
+    """
+    Compara o self-join de dc_to_sql com o group_count para a DC
+    t0.grupo = t1.grupo em tabelas de tamanhos crescentes.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    con = duckdb.connect()
+    results = []
+
+    for num_rows in row_counts:
+        csv_file = os.path.join(out_dir, f"bench_equality_{num_rows}.csv")
+        generate_equality_csv(csv_file, num_rows, cardinality)
+
+        join_sql = (
+            f"SELECT COUNT(*) FROM read_csv_auto('{csv_file}') t1, read_csv_auto('{csv_file}') t2 "
+            f'WHERE t1."grupo" = t2."grupo";'
+        )
+        join_count, join_time = time_query(lambda: con.execute(join_sql).fetchone()[0])
+
+        (group_count,), group_time = time_query(
+            lambda: count_equality_dcs(con, csv_file, [[("grupo", 0, "EQUAL", "grupo", 1)]])
+        )
+
+        assert join_count == group_count, (join_count, group_count)
+
+        results.append((num_rows, join_time, group_time))
+        print(f"{num_rows:>10} linhas | self-join: {join_time:.4f} s | group_count: {group_time:.4f} s "
+              f"| pares: {group_count}")
+
+    con.close()
+
+    # razão de crescimento entre tamanhos consecutivos: ~4x no join (O(n²)) e ~2x no group_count (O(n))
+    print("\n--- Crescimento entre tamanhos consecutivos ---")
+    for (n_prev, join_prev, group_prev), (n, join_t, group_t) in zip(results, results[1:]):
+        print(f"{n_prev} -> {n}: self-join x{join_t / join_prev:.2f} | group_count x{group_t / group_prev:.2f}")
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark do caminho rápido para DCs só de igualdades")
+    parser.add_argument("--rows", type=int, nargs="+", default=[25_000, 50_000, 100_000, 200_000],
+                        help="Tamanhos de tabela a testar")
+    parser.add_argument("--cardinality", type=int, default=10, help="Número de valores distintos da coluna agrupada")
+    parser.add_argument("--out-dir", type=str, default=os.path.join("bench_data", "planner"),
+                        help="Diretório dos CSVs gerados (bench_data/ fica fora do git)")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.cardinality, args.out_dir)
@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import time
+from threading import Thread
+
+import duckdb
+
+from bench_scaling import generate_dc_table, metanome_dc, run_mode, DC_SETS
+from bench_strategies import strategy_counts, DCS as STRATEGY_DCS
+from dc_datasets import DatasetRegistry, group_by_table
+from dc_index import IndexStore
+from dc_parsimonious import run_sequential, run_table_group, count_dc, dc_to_sql
+from dc_planner import dc_to_predicates
+from dc_stream import read_dcs, parse_dcs, run_streaming
+from dc_strategy import TableStats, choose
+from dc_types import coerce_dcs
+
+
+######################################################
+# casos
+######################################################
+
+# arquivos de DCs do repositório e o CSV do seu tableIdentifier
+BUNDLED = {
+    "flights": ("flights.csv", "results.txt"),
+    "astronomical": ("WDC_astronomical.csv", "results_astronomical.txt"),
+}
+
+# modos do bench_scaling mais os caminhos do dc_parsimonious que ele não cobre e,
+# em strategies, cada estratégia aplicável à DC forçada
+MODES = ["sequential", "threaded", "process", "planner", "evidence", "per_table", "stream", "sample", "strategies"]
+
+# desvios padrão aceitos entre a estimativa do modo sample e a contagem exata
+SAMPLE_SIGMAS = 4
+
+
+def load_cases(out_dir, generated_rows, cardinality, correlation) -> dict:
+    """
+    {nome: (csv, [(i, dc_json)])} com os arquivos do repositório, as DCs do
+    bench_strategies (uma ou mais por estratégia) e um CSV gerado por DC set.
+    """
+    cases = {name: (csv_file, list(read_dcs(dcs_file))) for name, (csv_file, dcs_file) in BUNDLED.items()}
+    cases["flights_strategies"] = ("flights.csv", list(enumerate(metanome_dc("flights.csv", dc) for dc in STRATEGY_DCS)))
+
+    # um único CSV gerado serve aos três DC sets
+    csv_file = os.path.join(out_dir, f"data_{generated_rows}_{cardinality}_{correlation}.csv")
+    generate_dc_table(csv_file, generated_rows, cardinality, correlation)
+
+    for dc_set, dcs in DC_SETS.items():
+        cases[f"generated_{dc_set}"] = (csv_file, list(enumerate(metanome_dc(csv_file, dc) for dc in dcs)))
+
+    return cases
+
+
+######################################################
+# execução
+######################################################
+
+def run_case(mode, csv_file, indexed_dcs, workers, sample_size) -> list:
+    """Executa as DCs no modo e devolve [(i, violações)]."""
+    if mode == "per_table":
+        # sem --csv-file: tabelas carregadas pelo DatasetRegistry, uma thread por grupo
+        results = []
+        con = duckdb.connect()
+        registry = DatasetRegistry(".")
+        threads = [Thread(target=run_table_group, args=(con, registry, tables, table_dcs, results, False, "auto",
+                                                        False, 512))
+                   for tables, table_dcs in group_by_table(indexed_dcs).items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        con.close()
+        return results
+
+    if mode == "stream":
+        results = []
+        con = duckdb.connect()
+        run_streaming(con, parse_dcs(iter(indexed_dcs)),
+                      lambda cursor, i, dc_json, predicates, strategy:
+                          count_dc(cursor, dc_json, predicates, strategy, csv_file),
+                      lambda i, num_violations: results.append((i, num_violations)), workers)
+        con.close()
+        return results
+
+    if mode == "sample":
+        results = []
+        run_sequential(workers, indexed_dcs, csv_file, results, False, strategy="evidence",
+                       evidence_sample=sample_size)
+        return results
+
+    if mode == "strategies":
+        return forced_counts(csv_file, indexed_dcs)
+
+    return run_mode(mode, csv_file, indexed_dcs, workers)
+
+
+def forced_counts(csv_file, indexed_dcs) -> list:
+    """
+    [(i, {estratégia: violações})] com cada estratégia que o modelo de custo
+    considera para a DC forçada, sobre o CSV carregado em uma tabela e com
+    os tipos resolvidos como na execução. As DCs rejeitadas ficam com None.
+    """
+    con = duckdb.connect()
+    con.execute(f"CREATE TABLE dc_data AS SELECT * FROM read_csv_auto('{csv_file}');")
+    table, indexed_dcs, rejected = coerce_dcs(con, "dc_data", indexed_dcs)
+    results = [(i, None) for i, _ in rejected]
+
+    index_store = IndexStore()
+    stats = TableStats()
+    for i, dc_json in indexed_dcs:
+        predicates = dc_to_predicates(dc_json)
+        columns = sorted({c for p in predicates for c in (p[0], p[3])})
+        choice = choose(predicates, *stats.get(con, table, columns))
+        counts = strategy_counts(con, table, dc_json, predicates, choice.costs, index_store)
+        results.append((i, {strategy: count for strategy, (count, _) in counts.items()}))
+
+    con.close()
+    return results
+
+
+def reference_counts(csv_file, indexed_dcs) -> dict:
+    """
+    Contagens de referência: o COUNT(*) do self-join que o dc_to_sql gera
+    para cada DC, sem os templates, o planejador nem a conversão de tipos.
+    As DCs que o DuckDB não consegue executar assim ficam com None, como as
+    rejeitadas nos modos.
+    """
+    con = duckdb.connect()
+    expected = {}
+    for i, dc_json in indexed_dcs:
+        sql_query = dc_to_sql(dc_json, csv_file).replace(";", "")
+        try:
+            expected[i] = con.execute(f"SELECT COUNT(*) FROM ({sql_query}) AS violations_subquery;").fetchone()[0]
+        except duckdb.Error:
+            expected[i] = None
+    con.close()
+    return expected
+
+
+def timed_case(mode, csv_file, indexed_dcs, workers, sample_size, repeat) -> tuple:
+    """
+    (contagens, menor tempo entre repeat execuções). A saída dos modos vai
+    para um buffer: o que interessa aqui são as contagens.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            results = run_case(mode, csv_file, indexed_dcs, workers, sample_size)
+            best = min(best, time.perf_counter() - start_time)
+
+    return dict(results), best
+
+
+def row_count(csv_file) -> int:
+    return duckdb.execute(f"SELECT COUNT(*) FROM read_csv_auto('{csv_file}');").fetchone()[0]
+
+
+def check_counts(mode, counts, expected, num_rows, sample_size) -> list:
+    """
+    Diferenças entre as contagens do modo e as de referência. O modo
+    sample só precisa ficar a SAMPLE_SIGMAS desvios padrão da binomial
+    dos pares sorteados; no modo strategies cada estratégia forçada é
+    conferida.
+    """
+    errors = []
+    pairs = num_rows * num_rows
+
+    for i, exact in sorted(expected.items()):
+        got = counts.get(i)
+
+        if mode == "sample" and got is not None and exact is not None and sample_size < pairs:
+            p = exact / pairs
+            bound = SAMPLE_SIGMAS * pairs * math.sqrt(p * (1 - p) / sample_size) + pairs / sample_size
+            if abs(got - exact) > bound:
+                errors.append(f"DC #{i+1}: estimativa {got} fora de {exact} ± {bound:.0f}")
+
+        elif isinstance(got, dict):
+            errors += [f"DC #{i+1}: {strategy} deu {count} violações, esperado {exact}"
+                       for strategy, count in sorted(got.items()) if count != exact]
+
+        elif got != exact:
+            errors.append(f"DC #{i+1}: {got} violações, esperado {exact}")
+
+    return errors
+
+
+######################################################
+# baseline de tempo
+######################################################
+
+def load_baseline(path) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, timings):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(timings, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Baseline gravado em {path}")
+
+
+def check_time(seconds, baseline_seconds, tolerance, slack):
+    """
+    Regressão quando o tempo passa do baseline por mais que a tolerância
+    relativa; slack (segundos) evita falhas por ruído nos casos de
+    milissegundos.
+    """
+    if baseline_seconds is None:
+        return None
+    limit = baseline_seconds * (1 + tolerance) + slack
+    return None if seconds <= limit else f"{seconds:.4f} s > limite {limit:.4f} s (baseline {baseline_seconds:.4f} s)"
+
+
+######################################################
+# Main
+######################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Confere as contagens de todos os modos de execução contra o self-join e o tempo contra um baseline")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="Modos de execução")
+    parser.add_argument("--cases", nargs="+", default=None, help="Casos a executar (padrão: todos)")
+    parser.add_argument("--workers", type=int, default=4, help="Threads/processos por modo")
+    parser.add_argument("--generated-rows", type=int, default=3000, help="Linhas dos CSVs gerados")
+    parser.add_argument("--cardinality", type=int, default=50, help="Valores distintos da coluna a dos CSVs gerados")
+    parser.add_argument("--correlation", type=float, default=0.9, help="Correlação entre a/b e x/y nos CSVs gerados")
+    parser.add_argument("--sample-size", type=int, default=200_000, help="Pares sorteados no modo sample")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por caso; vale o menor tempo")
+    parser.add_argument("--baseline", type=str, required=True,
+                        help="JSON com o tempo de referência de cada caso/modo, desta máquina; gere com "
+                             "--update-baseline (bench_regression_baseline.json fica fora do git)")
+    parser.add_argument("--update-baseline", action="store_true", help="Grava os tempos desta execução como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Aumento relativo de tempo aceito (0.5 = 50%%)")
+    parser.add_argument("--slack", type=float, default=0.05, help="Folga absoluta em segundos sobre o baseline")
+    parser.add_argument("--out-dir", type=str, default=os.path.join("bench_data", "regression"),
+                        help="Diretório dos CSVs gerados (bench_data/ fica fora do git)")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    cases = load_cases(args.out_dir, args.generated_rows, args.cardinality, args.correlation)
+    if args.cases:
+        unknown = set(args.cases) - set(cases)
+        if unknown:
+            parser.error(f"Casos desconhecidos: {', '.join(sorted(unknown))} (disponíveis: {', '.join(cases)})")
+        cases = {name: cases[name] for name in args.cases}
+
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        parser.error(f"Baseline {args.baseline} não existe; grave um com --update-baseline")
+
+    baseline = load_baseline(args.baseline)
+    timings = dict(baseline)
+    failures = []
+
+    for name, (csv_file, indexed_dcs) in cases.items():
+        num_rows = row_count(csv_file)
+        expected = reference_counts(csv_file, indexed_dcs)
+
+        for mode in args.modes:
+            key = f"{name}/{mode}"
+            counts, seconds = timed_case(mode, csv_file, indexed_dcs, args.workers, args.sample_size, args.repeat)
+            timings[key] = round(seconds, 6)
+
+            errors = check_counts(mode, counts, expected, num_rows, args.sample_size)
+            regression = None if args.update_baseline else \
+                check_time(seconds, baseline.get(key), args.tolerance, args.slack)
+            if regression:
+                errors.append(f"tempo: {regression}")
+
+            status = "ok" if not errors else "FALHA"
+            new = " (sem baseline)" if key not in baseline and not args.update_baseline else ""
+            print(f"{name:<22} | {mode:<10} | {seconds:9.4f} s | {status}{new}")
+            for error in errors:
+                print(f"    {error}")
+            failures += [(key, error) for error in errors]
+
+    if args.update_baseline:
+        save_baseline(args.baseline, timings)
+
+    print(f"\n{len(failures)} falhas")
+    sys.exit(1 if failures else 0)
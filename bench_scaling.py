@@ -0,0 +1,282 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from threading import Thread
+
+import duckdb
+
+from dc_metrics import ResourceMeter
+from dc_parsimonious import run_sequential, run_query_in_thread, dc_to_sql
+
+
+######################################################
+# dados sintéticos
+######################################################
+
+def generate_dc_table(file_path, num_rows, cardinality, correlation, seed=0):
+    """
+    Gera um CSV para as DCs do benchmark, no espírito do generate_large_csv
+    do test.py, mas com a distribuição controlada:
+
+    - a: chave com cardinality valores distintos;
+    - b: função de a com probabilidade correlation, senão aleatória
+      (correlation=1 faz a -> b valer e a DC do tipo FD não ter violações);
+    - x, y: numéricas, y = correlation * x + ruído (correlation=1 faz a
+      ordem de x e de y coincidir e a DC de ordem não ter violações).
+
+    Os valores aleatórios vêm de hash(linha, semente), então o mesmo
+    arquivo sai igual em qualquer execução.
+    """
+    if os.path.exists(file_path):
+        print(f"O arquivo {file_path} já existe. Pulando a geração.")
+        return
+
+    print(f"Gerando arquivo CSV com {num_rows} linhas em {file_path}...")
+    duckdb.execute(f"""
+        COPY (
+            SELECT id, a,
+                   CASE WHEN u < {correlation} THEN (a * 31 + 7) % {cardinality}
+                        ELSE CAST(v * {cardinality} AS BIGINT) % {cardinality} END AS b,
+                   x,
+                   {correlation} * x + (1 - {correlation}) * w * 1000 AS y
+            FROM (
+                SELECT i AS id,
+                       hash(i, {seed}, 1) % {cardinality} AS a,
+                       (hash(i, {seed}, 2) % 1000000) / 1000000.0 AS u,
+                       (hash(i, {seed}, 3) % 1000000) / 1000000.0 AS v,
+                       (hash(i, {seed}, 4) % 1000000) / 1000000.0 AS w,
+                       (hash(i, {seed}, 5) % 1000000) / 1000.0 AS x
+                FROM range({num_rows}) t(i)
+            )
+        ) TO '{file_path}' (HEADER, DELIMITER ',');
+    """)
+
+
+def metanome_dc(table_id, predicates) -> str:
+    """DC no formato JSON do Metanome a partir de (coluna1, op, coluna2)."""
+    def column(name):
+        return {"tableIdentifier": table_id, "columnIdentifier": name}
+
+    return json.dumps({"type": "DenialConstraint", "predicates": [
+        {"type": "de.metanome.algorithm_integration.PredicateVariable",
+         "column1": column(column1), "index1": 0, "op": op, "column2": column(column2), "index2": 1}
+        for column1, op, column2 in predicates
+    ]}, separators=(",", ":"))
+
+
+# conjuntos de DCs sobre as colunas de generate_dc_table
+DC_SETS = {
+    "equality": [[("a", "EQUAL", "a")], [("a", "EQUAL", "a"), ("b", "EQUAL", "b")]],
+    "fd": [[("a", "EQUAL", "a"), ("b", "UNEQUAL", "b")]],
+    "order": [[("x", "LESS", "x"), ("y", "GREATER", "y")]],
+}
+
+# DC sets que o planejador resolve sem self-join (GROUP BY ou postos ordenados)
+LINEAR_SETS = {"equality", "fd", "order"}
+
+
+######################################################
+# modos de execução
+######################################################
+
+def _count_in_process(csv_file, i, dc_json):
+    con = duckdb.connect(config={'threads': 1})
+    sql_query = dc_to_sql(dc_json, csv_file)
+    count = con.execute(f"SELECT COUNT(*) FROM ({sql_query.replace(';', '')}) as violations_subquery;").fetchone()[0]
+    con.close()
+    return i, count
+
+
+def run_mode(mode, csv_file, indexed_dcs, workers) -> list:
+    """Executa as DCs em um dos modos e devolve [(i, violações)]."""
+    results = []
+
+    if mode == "sequential":
+        run_sequential(workers, indexed_dcs, csv_file, results, False, strategy="sql")
+
+    elif mode == "threaded":
+        # uma thread por DC, como o --parallel com --strategy sql
+        con = duckdb.connect(config={'threads': workers})
+        threads = [Thread(target=run_query_in_thread, args=(con, dc_json, csv_file, i, results, False))
+                   for i, dc_json in indexed_dcs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        con.close()
+
+    elif mode == "process":
+        # um processo com conexão própria por DC
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.starmap(_count_in_process, [(csv_file, i, dc_json) for i, dc_json in indexed_dcs])
+
+    elif mode == "planner":
+        # GROUP BY/histograma do DuckDB para as DCs que o planejador reconhece
+        run_sequential(workers, indexed_dcs, csv_file, results, False, strategy="auto", cache_budget_mb=512)
+
+    elif mode == "evidence":
+        run_sequential(workers, indexed_dcs, csv_file, results, False, strategy="evidence")
+
+    else:
+        raise ValueError(f"Modo desconhecido: {mode}")
+
+    return results
+
+
+MODES = ["sequential", "threaded", "process", "planner", "evidence"]
+
+
+def _run_child(mode, csv_file, indexed_dcs, workers, queue):
+    # o processo mede a si mesmo: getrusage inclui as threads do DuckDB e,
+    # depois que o Pool termina, os workers do modo process
+    meter = ResourceMeter()
+    try:
+        meter.start()
+        start_time = time.perf_counter()
+        results = run_mode(mode, csv_file, indexed_dcs, workers)
+        elapsed = time.perf_counter() - start_time
+        avg_cpu, peak_mem = meter.stop()
+        queue.put((elapsed, sum(count for _, count in results), avg_cpu, peak_mem))
+    except Exception as e:
+        queue.put((None, f"{type(e).__name__}: {e}", None, None))
+
+
+def measure(mode, csv_file, indexed_dcs, workers) -> dict:
+    """
+    Executa o modo em um processo novo, para que o pico de RSS de uma
+    medida não herde a memória das anteriores.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    child = context.Process(target=_run_child, args=(mode, csv_file, indexed_dcs, workers, queue))
+    child.start()
+
+    elapsed, violations, avg_cpu, peak_mem = queue.get()
+    child.join()
+
+    if elapsed is None:
+        raise RuntimeError(violations)
+
+    return {
+        "seconds": elapsed,
+        "peak_rss_mb": peak_mem,
+        "cpu_pct": avg_cpu,
+        "violations": violations,
+    }
+
+
+######################################################
+# gráficos
+######################################################
+
+def plot_results(rows, out_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    for dc_set in sorted({row["dc_set"] for row in rows}):
+        fig, (ax_time, ax_pairs) = plt.subplots(1, 2, figsize=(12, 4.5))
+
+        for mode in MODES:
+            points = sorted(
+                (row["rows"], row["seconds"], row["pairs_per_second"])
+                for row in rows if row["dc_set"] == dc_set and row["mode"] == mode and row["status"] == "ok"
+            )
+            if not points:
+                continue
+
+            sizes = [p[0] for p in points]
+            ax_time.plot(sizes, [p[1] for p in points], marker="o", label=mode)
+            ax_pairs.plot(sizes, [p[2] for p in points], marker="o", label=mode)
+
+        for ax, ylabel in ((ax_time, "tempo (s)"), (ax_pairs, "pares/s")):
+            ax.set_xscale("log")
+            ax.set_yscale("log")
+            ax.set_xlabel("linhas")
+            ax.set_ylabel(ylabel)
+            ax.grid(True, which="both", alpha=0.3)
+            ax.legend()
+
+        fig.suptitle(f"Escalabilidade - DCs {dc_set}")
+        fig.tight_layout()
+        path = os.path.join(out_dir, f"scaling_{dc_set}.png")
+        fig.savefig(path, dpi=120)
+        plt.close(fig)
+        print(f"Gráfico gravado em {path}")
+
+
+######################################################
+# Main
+######################################################
+
+FIELDS = ["rows", "cardinality", "correlation", "dc_set", "mode", "workers", "seconds", "peak_rss_mb", "cpu_pct",
+          "pairs_per_second", "violations", "status"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de escalabilidade da checagem de DCs")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000],
+                        help="Tamanhos de tabela a testar")
+    parser.add_argument("--cardinality", type=int, default=1000, help="Valores distintos da coluna a")
+    parser.add_argument("--correlation", type=float, default=0.9, help="Correlação entre a/b e x/y (0 a 1)")
+    parser.add_argument("--dc-sets", nargs="+", choices=list(DC_SETS), default=list(DC_SETS), help="Conjuntos de DCs")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="Modos de execução")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Threads/processos por modo")
+    parser.add_argument("--max-join-rows", type=int, default=100_000,
+                        help="Maior tabela em que modos quadráticos (self-join, evidências) são executados")
+    parser.add_argument("--out-dir", type=str, default=os.path.join("bench_data", "scaling"),
+                        help="Diretório dos CSVs e gráficos (bench_data/ fica fora do git)")
+    parser.add_argument("--no-plots", action="store_true", help="Não gera os gráficos")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    rows = []
+
+    for num_rows in args.rows:
+        csv_file = os.path.join(args.out_dir, f"data_{num_rows}_{args.cardinality}_{args.correlation}.csv")
+        generate_dc_table(csv_file, num_rows, args.cardinality, args.correlation)
+
+        for dc_set in args.dc_sets:
+            indexed_dcs = list(enumerate(metanome_dc(csv_file, dc) for dc in DC_SETS[dc_set]))
+
+            for mode in args.modes:
+                row = {"rows": num_rows, "cardinality": args.cardinality, "correlation": args.correlation,
+                       "dc_set": dc_set, "mode": mode, "workers": args.workers}
+
+                quadratic = mode != "planner" or dc_set not in LINEAR_SETS
+                if quadratic and num_rows > args.max_join_rows:
+                    row.update(seconds="", peak_rss_mb="", cpu_pct="", pairs_per_second="", violations="",
+                               status="skipped")
+                    rows.append(row)
+                    continue
+
+                try:
+                    row.update(measure(mode, csv_file, indexed_dcs, args.workers))
+                except RuntimeError as e:
+                    print(f"{num_rows:>10} linhas | {dc_set:<8} | {mode:<10} | erro: {e}")
+                    row.update(seconds="", peak_rss_mb="", cpu_pct="", pairs_per_second="", violations="",
+                               status="error")
+                    rows.append(row)
+                    continue
+
+                # pares ordenados avaliados por DC, como no self-join
+                row["pairs_per_second"] = len(indexed_dcs) * num_rows ** 2 / row["seconds"]
+                row["status"] = "ok"
+                rows.append(row)
+
+                print(f"{num_rows:>10} linhas | {dc_set:<8} | {mode:<10} | {row['seconds']:9.3f} s | "
+                      f"pico: {row['peak_rss_mb']:8.1f} MB | CPU: {row['cpu_pct']:6.1f}% | "
+                      f"{row['pairs_per_second']:12.3e} pares/s | violações: {row['violations']}")
+
+    results_file = os.path.join(args.out_dir, "scaling_results.csv")
+    with open(results_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Resultados gravados em {results_file}")
+
+    if not args.no_plots:
+        plot_results(rows, args.out_dir)
@@ -0,0 +1,123 @@
+import argparse
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+
+from bench_regression import load_baseline, save_baseline, check_time
+
+
+######################################################
+# casos
+######################################################
+
+# caminhos da CLI que não executam DCs: nenhum deve pagar pelo DuckDB
+CASES = {
+    "help": ["dc_parsimonious.py", "--help"],
+    "sql_only": ["dc_parsimonious.py", "--sql-only", "--results-file", "results.txt"],
+    "daemon_help": ["dc_daemon.py", "--help"],
+}
+
+# módulos que cada caso não pode importar
+HEAVY = ["duckdb", "numpy", "pandas", "psutil", "http.server"]
+FORBIDDEN = {
+    "help": HEAVY + ["parsimonious"],
+    "sql_only": HEAVY,
+    # o servidor HTTP do dc_daemon é definido no módulo; o DuckDB só no serve
+    "daemon_help": ["duckdb", "numpy", "pandas", "psutil", "parsimonious"],
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+######################################################
+# medição
+######################################################
+
+def parse_importtime(stderr) -> dict:
+    """{módulo: tempo acumulado em segundos} dos imports de primeiro nível do -X importtime."""
+    imports = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            imports[match.group(4)] = int(match.group(2)) / 1e6
+    return imports
+
+
+def imported_modules(stderr) -> set:
+    return {match.group(4) for match in map(IMPORT_LINE.match, stderr.splitlines()) if match}
+
+
+def measure(command, repeat) -> tuple:
+    """
+    (menor tempo de parede entre repeat execuções, imports da última).
+    O tempo é medido sem -X importtime, que custa alguns ms por conta própria.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, *command], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start_time)
+
+    traced = subprocess.run([sys.executable, "-X", "importtime", *command], stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, check=True)
+    return best, traced.stderr
+
+
+######################################################
+# Main
+######################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo de partida da CLI (--help, --sql-only) e os imports de cada caminho")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="Casos a executar")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções por caso; vale o menor tempo")
+    parser.add_argument("--target-ms", type=float, default=150, help="Tempo máximo de partida de cada caso")
+    parser.add_argument("--top", type=int, default=5, help="Imports de primeiro nível mais caros mostrados por caso")
+    parser.add_argument("--baseline", type=str, required=True,
+                        help="JSON com o tempo de referência de cada caso, desta máquina (o mesmo do bench_regression)")
+    parser.add_argument("--update-baseline", action="store_true", help="Grava os tempos desta execução como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Aumento relativo de tempo aceito (0.5 = 50%%)")
+    parser.add_argument("--slack", type=float, default=0.02, help="Folga absoluta em segundos sobre o baseline")
+    args = parser.parse_args()
+
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        parser.error(f"Baseline {args.baseline} não existe; grave um com --update-baseline")
+
+    baseline = load_baseline(args.baseline)
+    timings = dict(baseline)
+    failures = []
+
+    for name in args.cases:
+        key = f"startup/{name}"
+        seconds, stderr = measure(CASES[name], args.repeat)
+        timings[key] = round(seconds, 6)
+
+        errors = []
+        if seconds * 1000 > args.target_ms:
+            errors.append(f"{seconds * 1000:.1f} ms > alvo de {args.target_ms:.0f} ms")
+
+        modules = imported_modules(stderr)
+        errors += [f"importa {module}" for module in FORBIDDEN[name] if module in modules]
+
+        regression = None if args.update_baseline else \
+            check_time(seconds, baseline.get(key), args.tolerance, args.slack)
+        if regression:
+            errors.append(f"tempo: {regression}")
+
+        status = "ok" if not errors else "FALHA"
+        print(f"{name:<12} | {seconds * 1000:7.1f} ms | {status}")
+        top = sorted(parse_importtime(stderr).items(), key=lambda m: -m[1])[:args.top]
+        print("    " + ", ".join(f"{module} {t * 1000:.1f} ms" for module, t in top))
+        for error in errors:
+            print(f"    {error}")
+        failures += [(key, error) for error in errors]
+
+    if args.update_baseline:
+        save_baseline(args.baseline, timings)
+
+    print(f"\n{len(failures)} falhas")
+    sys.exit(1 if failures else 0)
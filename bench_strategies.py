@@ -0,0 +1,103 @@
+import argparse
+import sys
+import time
+
+import duckdb
+
+from bench_scaling import metanome_dc
+from dc_index import IndexStore, count_order_dc, SORT_RANK
+from dc_parsimonious import dc_to_sql
+from dc_plan_cache import parse_dc, count_violations
+from dc_planner import count_equality_dcs, count_fd_dc, dc_to_predicates, GROUP_COUNT, FD_HISTOGRAM, SQL_JOIN
+from dc_strategy import TableStats, choose
+
+
+TABLE = "flights"
+
+# DCs sobre as colunas do flights4.csv (year, month, passengers), cobrindo
+# cada estratégia; a de ordem com != é a DC #1 do results.txt
+DCS = [
+    [("year", "EQUAL", "year")],
+    [("year", "EQUAL", "year"), ("month", "EQUAL", "month")],
+    [("year", "EQUAL", "year"), ("month", "EQUAL", "month"), ("passengers", "UNEQUAL", "passengers")],
+    [("month", "EQUAL", "month"), ("year", "UNEQUAL", "year")],
+    [("passengers", "LESS", "passengers")],
+    [("year", "EQUAL", "year"), ("passengers", "LESS_EQUAL", "passengers")],
+    [("passengers", "LESS", "passengers"), ("year", "GREATER", "year")],
+    [("month", "EQUAL", "month"), ("passengers", "GREATER_EQUAL", "passengers"), ("year", "LESS", "year")],
+    [("passengers", "LESS", "passengers"), ("year", "LESS", "year"), ("month", "UNEQUAL", "month")],
+    [("year", "LESS", "passengers")],
+]
+
+
+def strategy_counts(con, table, dc_json, predicates, strategies, index_store) -> dict:
+    """Contagem e tempo de cada uma das estratégias dadas, forçada, sobre a tabela."""
+    runners = {
+        GROUP_COUNT: lambda: count_equality_dcs(con, table, [predicates])[0],
+        FD_HISTOGRAM: lambda: count_fd_dc(con, table, predicates),
+        SORT_RANK: lambda: count_order_dc(con, table, predicates, index_store),
+        SQL_JOIN: lambda: count_violations(con, parse_dc(dc_json), table),
+    }
+
+    results = {}
+    for strategy in strategies:
+        start_time = time.perf_counter()
+        count = runners[strategy]()
+        results[strategy] = (count, time.perf_counter() - start_time)
+
+    return results
+
+
+def run_check(csv_file, num_rows) -> list:
+    """
+    Confere, DC a DC, que todas as estratégias aplicáveis devolvem a mesma
+    contagem que o self-join do dc_to_sql (força bruta), com os tempos e a
+    escolha do planejador. Devolve as divergências.
+    """
+    con = duckdb.connect()
+    # a força bruta sobre o arquivo inteiro leva minutos; sem a barra de progresso no terminal
+    con.execute("SET enable_progress_bar = false;")
+    limit = f" LIMIT {num_rows}" if num_rows else ""
+    con.execute(f"CREATE TABLE {TABLE} AS SELECT * FROM read_csv_auto('{csv_file}'){limit};")
+    print(f"{csv_file}: {con.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0]} linhas")
+
+    index_store = IndexStore()
+    stats = TableStats()
+    mismatches = []
+
+    for k, dc in enumerate(DCS):
+        dc_json = metanome_dc(TABLE, dc)
+        predicates = dc_to_predicates(dc_json)
+
+        start_time = time.perf_counter()
+        sql_query = dc_to_sql(dc_json, TABLE).replace(";", "")
+        expected = con.execute(f"SELECT COUNT(*) FROM ({sql_query}) AS violations_subquery;").fetchone()[0]
+        brute_time = time.perf_counter() - start_time
+
+        columns = sorted({c for p in predicates for c in (p[0], p[3])})
+        choice = choose(predicates, *stats.get(con, TABLE, columns))
+
+        # as candidatas do modelo de custo são as estratégias que avaliam a DC
+        results = strategy_counts(con, TABLE, dc_json, predicates, choice.costs, index_store)
+        mismatches += [f"DC #{k+1}: {strategy} deu {count} violações, esperado {expected}"
+                       for strategy, (count, _) in results.items() if count != expected]
+
+        timings = " | ".join(f"{s}{'*' if s == choice.strategy else ''}: {t:.4f} s" for s, (_, t) in results.items())
+        print(f"DC #{k+1}: {expected} violações | força bruta: {brute_time:.4f} s | {timings}")
+
+    con.close()
+    print("* = escolha do planejador")
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Confere cada estratégia contra o self-join por força bruta")
+    parser.add_argument("--csv-file", type=str, default="flights4.csv", help="CSV com as colunas year, month, passengers")
+    parser.add_argument("--rows", type=int, default=None, help="Usa só as primeiras linhas do CSV")
+    args = parser.parse_args()
+
+    mismatches = run_check(args.csv_file, args.rows)
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"\n{len(mismatches)} divergências")
+    sys.exit(1 if mismatches else 0)
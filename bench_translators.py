@@ -0,0 +1,249 @@
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from bench_ir import generate_dc_dicts
+from dc_ir import Op, dc_from_json, dc_to_sql_ir
+from dc_parser_lark import translate_json_dc_to_sql_lark, parse_text_dc
+from dc_parser_parsimonious import translate_dc_to_sql_parsimonious
+from dc_parsimonious import dc_to_sql
+from dc_plan_cache import count_sql
+from dc_planner import source_sql
+from dc_stream import read_dcs
+
+
+###########################################################
+# arquivos sintéticos de DCs
+###########################################################
+
+def dc_dict_to_text(dc) -> str:
+    """A mesma DC no formato textual ¬(t.a = t'.a ∧ ...)."""
+    predicates = [
+        f"t.{p['column1']['columnIdentifier']} {Op(p['op']).sql} t'.{p['column2']['columnIdentifier']}"
+        for p in dc["predicates"]
+    ]
+    return "¬(" + " ∧ ".join(predicates) + ")"
+
+
+def write_dc_files(out_dir, count, num_columns, max_predicates, seed=0) -> tuple:
+    """
+    Gera count DCs e grava dois arquivos com as mesmas DCs: dcs.json, no
+    formato do Metanome (um objeto por linha), e dcs.txt, no formato
+    textual. Devolve os caminhos.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    dcs = generate_dc_dicts(count, num_columns, max_predicates, table="bench.csv", seed=seed)
+
+    json_path = os.path.join(out_dir, "dcs.json")
+    text_path = os.path.join(out_dir, "dcs.txt")
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        for dc in dcs:
+            f.write(json.dumps(dc, separators=(",", ":")) + "\n")
+
+    with open(text_path, "w", encoding="utf-8") as f:
+        for dc in dcs:
+            f.write(dc_dict_to_text(dc) + "\n")
+
+    return json_path, text_path
+
+
+###########################################################
+# tradutores
+###########################################################
+
+def translate_json_parsimonious(text):
+    return dc_to_sql(text, "bench.csv")
+
+
+def translate_json_lark(text):
+    # o tradutor imprime uma linha por DC; a saída vai para um buffer
+    with redirect_stdout(io.StringIO()):
+        return translate_json_dc_to_sql_lark(text, "bench.csv")
+
+
+def translate_json_decode(text):
+    # json.loads + IR, sem gramática
+    return dc_to_sql_ir(dc_from_json(text), source_sql("bench.csv"))
+
+
+def translate_json_template(text):
+    # COUNT(*) pronto do template da forma da DC, como no runner
+    return count_sql(dc_from_json(text), source_sql("bench.csv"))
+
+
+def translate_text_parsimonious(text):
+    return translate_dc_to_sql_parsimonious(text, "bench.csv")
+
+
+def translate_text_lalr(text):
+    return dc_to_sql_ir(parse_text_dc(text, "bench.csv"), source_sql("bench.csv"))
+
+
+# nome -> (formato de entrada, função que traduz uma DC para SQL)
+TRANSLATORS = {
+    "json_parsimonious": ("json", translate_json_parsimonious),
+    "json_lark": ("json", translate_json_lark),
+    "json_decode_ir": ("json", translate_json_decode),
+    "json_template": ("json", translate_json_template),
+    "text_parsimonious": ("text", translate_text_parsimonious),
+    "text_lark_lalr": ("text", translate_text_lalr),
+}
+
+
+###########################################################
+# medidas
+###########################################################
+
+def percentile(sorted_values, q):
+    """Percentil q (0-100) por interpolação linear, como numpy.percentile."""
+    if not sorted_values:
+        return 0.0
+
+    pos = (len(sorted_values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def time_pass(translate, texts) -> tuple:
+    latencies = []
+    start_time = time.perf_counter()
+    for text in texts:
+        t0 = time.perf_counter_ns()
+        translate(text)
+        latencies.append(time.perf_counter_ns() - t0)
+
+    return time.perf_counter() - start_time, latencies
+
+
+def measure(translate, texts, repeat=3) -> dict:
+    """
+    Traduz todas as DCs repeat vezes medindo a latência de cada DC e a
+    vazão, e fica com a passada mais rápida (a menos afetada pelo resto da
+    máquina). Uma última passada roda com tracemalloc, que deixa a alocação
+    bem mais lenta e por isso não entra no tempo.
+    """
+    elapsed, latencies = min((time_pass(translate, texts) for _ in range(repeat)), key=lambda run: run[0])
+
+    tracemalloc.start()
+    start_snapshot = tracemalloc.take_snapshot()
+    for text in texts:
+        translate(text)
+    _, peak = tracemalloc.get_traced_memory()
+    allocated = sum(
+        stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(start_snapshot, "filename") if stat.size_diff > 0
+    )
+    tracemalloc.stop()
+
+    latencies.sort()
+    to_us = lambda ns: ns / 1000
+
+    return {
+        "dcs": len(texts),
+        "repeat": repeat,
+        "seconds": elapsed,
+        "dcs_per_second": len(texts) / elapsed if elapsed else 0.0,
+        "latency_us": {
+            "p50": to_us(percentile(latencies, 50)),
+            "p90": to_us(percentile(latencies, 90)),
+            "p99": to_us(percentile(latencies, 99)),
+            "max": to_us(latencies[-1]) if latencies else 0.0,
+        },
+        "peak_traced_mb": peak / 1024 ** 2,
+        "retained_mb": allocated / 1024 ** 2,
+    }
+
+
+def compare(results, baseline_file, threshold):
+    """Imprime a variação de vazão e de p99 em relação a uma execução anterior."""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = 0
+    print(f"\nComparação com {baseline_file}:")
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+
+        old = baseline[name]
+        throughput = current["dcs_per_second"] / old["dcs_per_second"] - 1 if old["dcs_per_second"] else 0.0
+        p99 = current["latency_us"]["p99"] / old["latency_us"]["p99"] - 1 if old["latency_us"]["p99"] else 0.0
+
+        flag = ""
+        if throughput < -threshold or p99 > threshold:
+            flag = "  <-- regressão"
+            regressions += 1
+
+        print(f"{name:<18} | vazão {throughput:+7.1%} | p99 {p99:+7.1%}{flag}")
+
+    return regressions
+
+
+###########################################################
+# Main
+###########################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark dos tradutores de DC para SQL")
+    parser.add_argument("--count", type=int, default=500, help="Número de DCs geradas")
+    parser.add_argument("--columns", type=int, default=20, help="Colunas distintas")
+    parser.add_argument("--max-predicates", type=int, default=5, help="Máximo de predicados por DC")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do gerador de DCs")
+    parser.add_argument("--repeat", type=int, default=3, help="Passadas medidas por tradutor (vale a mais rápida)")
+    parser.add_argument("--translators", nargs="+", choices=list(TRANSLATORS), default=list(TRANSLATORS),
+                        help="Tradutores medidos")
+    parser.add_argument("--data-dir", type=str, default=os.path.join("bench_data", "translators"),
+                        help="Diretório dos arquivos de DCs gerados (bench_data/ fica fora do git)")
+    parser.add_argument("--output", type=str, default=os.path.join("bench_data", "translators.json"),
+                        help="Arquivo JSON com os resultados")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Variação relativa a partir da qual a comparação acusa regressão")
+    args = parser.parse_args()
+
+    json_path, text_path = write_dc_files(args.data_dir, args.count, args.columns, args.max_predicates, args.seed)
+
+    inputs = {
+        "json": [dc_json for _, dc_json in read_dcs(json_path)],
+        "text": [line.strip() for line in open(text_path, "r", encoding="utf-8") if line.strip()],
+    }
+
+    print(f"{args.count} DCs, {args.columns} colunas, até {args.max_predicates} predicados por DC")
+
+    results = {}
+    for name in args.translators:
+        input_format, translate = TRANSLATORS[name]
+        results[name] = measure(translate, inputs[input_format], args.repeat)
+
+        r = results[name]
+        print(f"{name:<18} | {r['dcs_per_second']:9.0f} DCs/s | p50 {r['latency_us']['p50']:9.1f} us | "
+              f"p99 {r['latency_us']['p99']:9.1f} us | pico: {r['peak_traced_mb']:7.2f} MB")
+
+    report = {
+        "config": {
+            "count": args.count, "columns": args.columns,
+            "max_predicates": args.max_predicates, "seed": args.seed, "repeat": args.repeat,
+        },
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados gravados em {args.output}")
+
+    if args.baseline:
+        if compare(results, args.baseline, args.threshold):
+            sys.exit(1)
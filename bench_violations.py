@@ -0,0 +1,235 @@
+import argparse
+import multiprocessing
+import sys
+import time
+
+import duckdb
+
+from bench_scaling import metanome_dc
+from dc_metrics import ResourceMeter
+from dc_parsimonious import dc_to_sql
+from dc_violations import violation_chunks, chunk_len, result_names, ViolationStream, FORMATS, DEFAULT_CHUNK_ROWS
+
+
+TABLE = "flights"
+
+# a DC das medidas: t0.year < t1.year, com milhões de pares nas primeiras 3000 linhas do flights4.csv
+DC = [("year", "LESS", "year")]
+
+# chunks menores nas checagens, para que o resultado tenha centenas deles
+CHECK_CHUNK_ROWS = 8192
+PREFETCH = 2
+
+
+######################################################
+# dados
+######################################################
+
+def load_table(con, csv_file, num_rows):
+    con.execute("SET enable_progress_bar = false;")
+    limit = f" LIMIT {num_rows}" if num_rows else ""
+    con.execute(f"CREATE TABLE {TABLE} AS SELECT * FROM read_csv_auto('{csv_file}'){limit};")
+
+
+def violations_sql() -> str:
+    return dc_to_sql(metanome_dc(TABLE, DC), TABLE).replace(";", "")
+
+
+def available_formats() -> list:
+    """FORMATS sem o arrow quando o pyarrow (opcional) não está instalado."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return [fmt for fmt in FORMATS if fmt != "arrow"]
+    return list(FORMATS)
+
+
+######################################################
+# checagens
+######################################################
+
+def check_formats(con, sql_query, expected) -> list:
+    """Todos os formatos entregam os mesmos pares, em chunks de até CHECK_CHUNK_ROWS linhas."""
+    errors = []
+    names = list(con.execute(f"SELECT * FROM ({sql_query}) LIMIT 0").fetchnumpy())
+    if result_names(con.execute(f"SELECT * FROM ({sql_query}) LIMIT 0").description) != names:
+        errors.append(f"numpy: nomes das colunas diferem dos do fetchnumpy ({names})")
+
+    # soma do year de t1 em todos os pares: não depende da ordem dos chunks (o read_csv_auto lê year como
+    # VARCHAR no flights4.csv, daí a conversão)
+    year = names.index("year")
+    totals = {}
+    for fmt in available_formats():
+        rows = 0
+        total = 0
+        for chunk in violation_chunks(con, sql_query, CHECK_CHUNK_ROWS, fmt):
+            size = chunk_len(chunk)
+            if size > CHECK_CHUNK_ROWS:
+                errors.append(f"{fmt}: chunk com {size} linhas, limite {CHECK_CHUNK_ROWS}")
+            rows += size
+            if fmt == "numpy":
+                total += int(chunk["year"].astype("int64").sum())
+            elif fmt == "rows":
+                total += sum(int(row[year]) for row in chunk)
+        if rows != expected:
+            errors.append(f"{fmt}: {rows} pares, esperado {expected}")
+        if fmt in ("numpy", "rows"):
+            totals[fmt] = total
+
+    if len(set(totals.values())) > 1:
+        errors.append(f"numpy e rows com valores diferentes: {totals}")
+
+    return errors
+
+
+def check_backpressure(con, sql_query, expected) -> list:
+    """
+    Com o consumidor parado, a thread lê no máximo PREFETCH chunks para a
+    fila mais o que está tentando entregar, e nada se perde depois.
+    """
+    errors = []
+    if expected < (PREFETCH + 4) * CHECK_CHUNK_ROWS:
+        return [f"backpressure: {expected} pares é pouco para o teste"]
+
+    cursor = con.cursor()
+    with ViolationStream(cursor, sql_query, CHECK_CHUNK_ROWS, prefetch=PREFETCH) as stream:
+        chunks = iter(stream)
+        next(chunks)
+        time.sleep(0.5)
+
+        ahead = stream.fetched - 1
+        if ahead > PREFETCH + 1:
+            errors.append(f"backpressure: a thread leu {ahead} chunks à frente, limite {PREFETCH + 1}")
+
+        for _ in chunks:
+            pass
+        if stream.rows != expected:
+            errors.append(f"backpressure: {stream.rows} pares, esperado {expected}")
+
+    cursor.close()
+    return errors
+
+
+def check_early_close(con, sql_query) -> list:
+    """Quem para no primeiro chunk encerra a thread e recupera o cursor."""
+    errors = []
+    cursor = con.cursor()
+
+    stream = ViolationStream(cursor, sql_query, CHECK_CHUNK_ROWS, prefetch=PREFETCH)
+    next(iter(stream))
+    stream.close()
+
+    if stream._thread.is_alive():
+        errors.append("close: a thread continua viva")
+    if cursor.execute("SELECT 42").fetchone()[0] != 42:
+        errors.append("close: o cursor não executa outra consulta")
+
+    cursor.close()
+    return errors
+
+
+def check_errors(con) -> list:
+    """Erros do DuckDB, na consulta ou no meio do resultado, chegam ao consumidor."""
+    errors = []
+    cursor = con.cursor()
+
+    cases = {
+        "consulta inválida": f"SELECT coluna_inexistente FROM {TABLE}",
+        "erro no meio do resultado": "SELECT CASE WHEN range < 100000 THEN range ELSE error('falha no meio') END AS v "
+                                     "FROM range(200000)",
+    }
+    for name, sql_query in cases.items():
+        stream = ViolationStream(cursor, sql_query, CHECK_CHUNK_ROWS, prefetch=PREFETCH)
+        try:
+            for _ in stream:
+                pass
+            errors.append(f"{name}: nenhum erro chegou ao consumidor")
+        except duckdb.Error:
+            pass
+        finally:
+            stream.close()
+
+    cursor.close()
+    return errors
+
+
+######################################################
+# medidas
+######################################################
+
+def _measure_child(csv_file, num_rows, fmt, chunk_rows, queue):
+    con = duckdb.connect()
+    load_table(con, csv_file, num_rows)
+    sql_query = violations_sql()
+
+    meter = ResourceMeter()
+    meter.start()
+    start_time = time.perf_counter()
+
+    if fmt == "fetchone":
+        result = con.execute(sql_query)
+        pairs = 0
+        while result.fetchone() is not None:
+            pairs += 1
+    else:
+        pairs = sum(chunk_len(chunk) for chunk in violation_chunks(con, sql_query, chunk_rows, fmt))
+
+    elapsed = time.perf_counter() - start_time
+    _, peak_mem = meter.stop()
+    con.close()
+    queue.put((pairs, elapsed, peak_mem))
+
+
+def measure(csv_file, num_rows, fmt, chunk_rows) -> tuple:
+    """(pares, segundos, pico de RSS em MB) em um processo novo por formato."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    child = context.Process(target=_measure_child, args=(csv_file, num_rows, fmt, chunk_rows, queue))
+    child.start()
+    result = queue.get()
+    child.join()
+    return result
+
+
+######################################################
+# Main
+######################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Confere o violation_chunks e o ViolationStream (formatos, backpressure, close, erros) e mede "
+                    "a vazão de cada formato contra o fetchone")
+    parser.add_argument("--csv-file", type=str, default="flights4.csv", help="CSV com a coluna year")
+    parser.add_argument("--rows", type=int, default=3000, help="Usa só as primeiras linhas do CSV (0 = todas)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Linhas por chunk nas medidas")
+    parser.add_argument("--no-measure", action="store_true", help="Só as checagens, sem as medidas")
+    args = parser.parse_args()
+
+    con = duckdb.connect()
+    load_table(con, args.csv_file, args.rows)
+    sql_query = violations_sql()
+    expected = con.execute(f"SELECT COUNT(*) FROM ({sql_query}) AS violations_subquery;").fetchone()[0]
+    print(f"{args.csv_file}: {con.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0]} linhas, "
+          f"{expected} pares para t0.year < t1.year")
+
+    failures = []
+    for name, errors in (("formatos", check_formats(con, sql_query, expected)),
+                         ("backpressure", check_backpressure(con, sql_query, expected)),
+                         ("close antecipado", check_early_close(con, sql_query)),
+                         ("erros", check_errors(con))):
+        print(f"{name:<18} | {'ok' if not errors else 'FALHA'}")
+        for error in errors:
+            print(f"    {error}")
+        failures += errors
+    con.close()
+
+    if not args.no_measure:
+        print()
+        for fmt in ["fetchone"] + available_formats():
+            pairs, seconds, peak_mem = measure(args.csv_file, args.rows, fmt, args.chunk_rows)
+            print(f"{fmt:<10} | {seconds:8.3f} s | {pairs / seconds:12.3e} pares/s | pico: {peak_mem:8.1f} MB")
+            if pairs != expected:
+                failures.append(f"{fmt}: {pairs} pares, esperado {expected}")
+
+    print(f"\n{len(failures)} falhas")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,229 @@
+from collections import Counter, OrderedDict
+
+from dc_planner import dc_to_predicates, canonical_predicate, predicate_sql, source_sql
+
+
+###########################################################
+# cache de conjuntos de pares por subconjunto de predicados
+###########################################################
+
+BASE_TABLE = "dc_base"
+
+# nome da estratégia nos resultados estruturados
+PAIR_CACHE = "pair_cache"
+
+# cada par materializado guarda dois BIGINT (r1, r2)
+BYTES_PER_PAIR = 16
+
+
+def predicate_key(predicates) -> frozenset:
+    """Chave canônica de um conjunto de predicados, independente da ordem."""
+    return frozenset(canonical_predicate(p) for p in predicates)
+
+
+def conjunction_sql(key) -> str:
+    return " AND ".join(predicate_sql(p) for p in sorted(key))
+
+
+class PairCache:
+    """
+    Cache LRU de conjuntos de pares (r1, r2) que satisfazem um subconjunto
+    de predicados, materializados como tabelas temporárias do DuckDB.
+
+    As entradas são chaveadas pelo conjunto canônico de predicados. Quando
+    o total estimado passa de budget_bytes, as entradas usadas há mais
+    tempo são descartadas (DROP TABLE).
+    """
+    def __init__(self, connection, budget_bytes):
+        self._con = connection
+        self._budget = budget_bytes
+        self._entries = OrderedDict() # chave -> (tabela, linhas)
+        self._used_bytes = 0
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def lookup(self, key):
+        """
+        Retorna (chave, tabela, linhas) da maior entrada contida em key,
+        ou None se nenhuma servir.
+        """
+        best = None
+        for cached_key, (table, rows) in self._entries.items():
+            if cached_key <= key and (best is None or len(cached_key) > len(best[0])):
+                best = (cached_key, table, rows)
+
+        if best is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best[0])
+        return best
+
+    def store(self, key, select_sql):
+        """
+        Materializa o resultado de select_sql (colunas r1, r2) sob key.
+        Retorna (tabela, linhas); a tabela só permanece no cache se couber
+        no orçamento.
+        """
+        table = f"dc_pairs_{self._next_id}"
+        self._next_id += 1
+
+        self._con.execute(f"CREATE TEMP TABLE {table} AS {select_sql};")
+        rows = self._con.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+        size = rows * BYTES_PER_PAIR
+
+        if size > self._budget:
+            return table, rows
+
+        while self._used_bytes + size > self._budget:
+            _, (old_table, old_rows) = self._entries.popitem(last=False)
+            self._con.execute(f"DROP TABLE IF EXISTS {old_table};")
+            self._used_bytes -= old_rows * BYTES_PER_PAIR
+
+        self._entries[key] = (table, rows)
+        self._used_bytes += size
+        return table, rows
+
+    def release(self, table):
+        """Descarta uma tabela criada por store que não ficou no cache."""
+        if all(table != t for t, _ in self._entries.values()):
+            self._con.execute(f"DROP TABLE IF EXISTS {table};")
+
+    def close(self):
+        for table, _ in self._entries.values():
+            self._con.execute(f"DROP TABLE IF EXISTS {table};")
+        self._entries.clear()
+        self._used_bytes = 0
+
+
+def shared_subsets(keys) -> set:
+    """
+    Escolhe os subconjuntos de predicados que valem a pena materializar:
+    o núcleo de igualdades compartilhado por duas ou mais DCs, e toda DC
+    que é a outra DC do lote com um predicado a menos.
+    """
+    cores = Counter()
+    for key in keys:
+        core = frozenset(p for p in key if p[2] == "EQUAL")
+        if core and core != key:
+            cores[core] += 1
+
+    subsets = {core for core, n in cores.items() if n >= 2}
+
+    all_keys = set(keys)
+    for key in all_keys:
+        for p in key:
+            smaller = key - {p}
+            if smaller in all_keys:
+                subsets.add(smaller)
+
+    return subsets
+
+
+def split_shared(indexed_dcs):
+    """
+    Separa as DCs (i, dc_json) que compartilham algum subconjunto de
+    predicados com outra DC do lote das que não compartilham nada.
+    """
+    keyed = [(i, dc_json, predicate_key(dc_to_predicates(dc_json))) for i, dc_json in indexed_dcs]
+    subsets = shared_subsets([key for _, _, key in keyed])
+
+    shared = []
+    others = []
+    for i, dc_json, key in keyed:
+        if any(subset <= key for subset in subsets):
+            shared.append((i, dc_json))
+        else:
+            others.append((i, dc_json))
+
+    return shared, others
+
+
+###########################################################
+# execução com cache
+###########################################################
+
+def pairs_from_base(key) -> str:
+    return (
+        f"SELECT t1.__rid AS r1, t2.__rid AS r2 "
+        f"FROM {BASE_TABLE} t1, {BASE_TABLE} t2 "
+        f"WHERE {conjunction_sql(key)}"
+    )
+
+
+def refine_pairs(table, rest) -> str:
+    """Filtra os pares candidatos de table pelos predicados restantes."""
+    return (
+        f"SELECT p.r1, p.r2 FROM {table} p "
+        f"JOIN {BASE_TABLE} t1 ON t1.__rid = p.r1 "
+        f"JOIN {BASE_TABLE} t2 ON t2.__rid = p.r2 "
+        f"WHERE {conjunction_sql(rest)}"
+    )
+
+
+def run_cached(connection, shared_dcs, csv_file, results_list, budget_mb, verbose=False):
+    """
+    Conta as violações das DCs que compartilham subconjuntos de predicados,
+    reaproveitando os pares já calculados para um subconjunto em vez de
+    refazer o self-join. As DCs são processadas das menores para as maiores
+    para que os subconjuntos fiquem prontos antes das DCs que os estendem.
+    Com verbose, imprime os acertos e faltas do cache no fim.
+    """
+    if not shared_dcs:
+        return
+
+    connection.execute(
+        f"CREATE OR REPLACE TEMP TABLE {BASE_TABLE} AS "
+        f"SELECT row_number() OVER () AS __rid, * FROM {source_sql(csv_file)};"
+    )
+
+    keyed = [(i, predicate_key(dc_to_predicates(dc_json))) for i, dc_json in shared_dcs]
+    subsets = shared_subsets([key for _, key in keyed])
+    cache = PairCache(connection, budget_mb * 1024 ** 2)
+
+    for i, key in sorted(keyed, key=lambda item: len(item[1])):
+        hit = cache.lookup(key)
+
+        # materializa o maior subconjunto compartilhado desta DC que ainda
+        # não está no cache, refinando a entrada encontrada quando possível
+        target = max((s for s in subsets if s < key and s not in cache), key=len, default=None)
+        if target is not None and (hit is None or hit[0] < target):
+            if hit is None:
+                target_sql = pairs_from_base(target)
+            else:
+                target_sql = refine_pairs(hit[1], target - hit[0])
+            table, rows = cache.store(target, target_sql)
+            hit = (target, table, rows)
+
+        if hit is None:
+            select_sql = pairs_from_base(key)
+        else:
+            cached_key, table, rows = hit
+            if cached_key == key:
+                results_list.append((i, rows))
+                continue
+            select_sql = refine_pairs(table, key - cached_key)
+
+        if key in subsets:
+            table, num_violations = cache.store(key, select_sql)
+            cache.release(table)
+        else:
+            num_violations = connection.execute(
+                f"SELECT COUNT(*) FROM ({select_sql}) as violations_subquery;"
+            ).fetchone()[0]
+
+        if hit is not None:
+            cache.release(hit[1])
+
+        results_list.append((i, num_violations))
+
+    if verbose:
+        print(f"Cache de pares: {cache.hits} acertos, {cache.misses} faltas")
+
+    cache.close()
+    connection.execute(f"DROP TABLE IF EXISTS {BASE_TABLE};")
@@ -0,0 +1,502 @@
+import argparse
+import http.client
+import io
+import json
+import os
+import socket
+import sys
+import time
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Lock
+from urllib.parse import urlparse, parse_qs
+
+from dc_datasets import DatasetRegistry, parse_dataset_arg, group_by_table
+
+
+DEFAULT_PORT = 8765
+DEFAULT_MEMORY_MB = 1024
+
+CONTENT_TYPE = "application/x-ndjson"
+
+
+###########################################################
+# datasets residentes
+###########################################################
+
+def in_memory_table_bytes(connection) -> int:
+    """Memória que o DuckDB atribui às tabelas em memória da conexão."""
+    row = connection.execute(
+        "SELECT memory_usage_bytes FROM duckdb_memory() WHERE tag = 'IN_MEMORY_TABLE';"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+class WarmRegistry(DatasetRegistry):
+    """
+    DatasetRegistry que mantém as tabelas carregadas entre requisições,
+    com despejo LRU quando a memória das tabelas passa de memory_mb.
+
+    As requisições fixam (acquire) as tabelas que usam e as soltam
+    (release) no fim; só tabelas sem ninguém usando são despejadas, e a
+    que acabou de ser carregada nunca é, então uma tabela maior que o
+    limite ainda é atendida. O tamanho de cada tabela é a memória que o
+    DuckDB passa a usar ao carregá-la (as cargas são serializadas para a
+    medida não misturar tabelas). Um CSV modificado desde a carga, ou um
+    tableIdentifier remapeado para outro CSV, é lido de novo. Ao despejar, os índices de colunas e as estatísticas da
+    tabela também saem da memória.
+    """
+    def __init__(self, data_dir=".", datasets=None, memory_mb=DEFAULT_MEMORY_MB, index_store=None, table_stats=None):
+        super().__init__(data_dir, datasets)
+        self._memory_bytes = memory_mb * 1024 * 1024
+        self._index_store = index_store
+        self._table_stats = table_stats
+        self._state_lock = Lock()
+        self._load_lock = Lock()
+        # table_id -> (bytes, (caminho, mtime) do CSV); alterado com os dois locks, lido com qualquer um
+        self._lru = OrderedDict()
+        self._pins = Counter()
+        self._run_locks = {}
+        self.evictions = 0
+
+    def run_lock(self, table_id) -> Lock:
+        """
+        Lock que serializa as requisições sobre uma tabela: a cópia tipada
+        do coerce_dcs é recriada por requisição com as conversões do lote.
+        """
+        with self._state_lock:
+            return self._run_locks.setdefault(table_id, Lock())
+
+    def _signature(self, table_id):
+        path = self.path(table_id)
+        try:
+            return path, os.path.getmtime(path)
+        except OSError:
+            return path, None
+
+    def acquire(self, connection, table_ids) -> dict:
+        """Carrega (se preciso) e fixa as tabelas; devolve {tableIdentifier: tabela}."""
+        with self._state_lock:
+            for table_id in table_ids:
+                self._pins[table_id] += 1
+
+        try:
+            with self._load_lock:
+                for table_id in table_ids:
+                    self._refresh(connection, table_id)
+                self._evict(connection, keep=set(table_ids))
+        except Exception:
+            self.release(table_ids)
+            raise
+
+        return {table_id: self.loaded()[table_id] for table_id in table_ids}
+
+    def _refresh(self, connection, table_id):
+        signature = self._signature(table_id)
+        entry = self._lru.get(table_id)
+
+        # o CSV mudou (ou o tableIdentifier foi remapeado por POST /datasets):
+        # só recarrega se ninguém mais está usando a versão antiga
+        with self._state_lock:
+            only_user = self._pins[table_id] == 1
+        if entry is not None and entry[1] != signature and only_user:
+            self._drop(connection, table_id)
+            entry = None
+
+        if entry is None:
+            before = in_memory_table_bytes(connection)
+            name = self.load(connection, table_id)
+            if self._index_store is not None:
+                self._index_store.bind(name, self.path(table_id))
+            entry = (max(0, in_memory_table_bytes(connection) - before), signature)
+            print(f"Dataset {table_id} carregado como {name} ({entry[0] / (1024 ** 2):.1f} MB)", flush=True)
+
+        with self._state_lock:
+            self._lru[table_id] = entry
+            self._lru.move_to_end(table_id)
+
+    def _drop(self, connection, table_id):
+        from dc_planner import unregister_table
+        from dc_types import typed_table_name
+
+        name = self.unload(connection, table_id)
+        with self._state_lock:
+            self._lru.pop(table_id, None)
+        if name is None:
+            return
+
+        typed = typed_table_name(name)
+        connection.execute(f'DROP TABLE IF EXISTS "{typed}";')
+        unregister_table(typed)
+        for table_name in (name, typed):
+            if self._index_store is not None:
+                self._index_store.forget(table_name)
+            if self._table_stats is not None:
+                self._table_stats.forget(table_name)
+
+    def _evict(self, connection, keep):
+        used = sum(size for size, _ in self._lru.values())
+
+        for table_id in list(self._lru):
+            if used <= self._memory_bytes:
+                break
+            with self._state_lock:
+                idle = self._pins[table_id] == 0
+            if idle and table_id not in keep:
+                used -= self._lru[table_id][0]
+                self._drop(connection, table_id)
+                self.evictions += 1
+                print(f"Dataset {table_id} despejado (LRU)", flush=True)
+
+    def release(self, table_ids):
+        with self._state_lock:
+            for table_id in table_ids:
+                self._pins[table_id] -= 1
+
+    def status(self) -> list:
+        with self._state_lock:
+            return [{"table": table_id, "name": self.loaded().get(table_id), "mb": size / (1024 ** 2),
+                     "in_use": self._pins[table_id]}
+                    for table_id, (size, _) in reversed(self._lru.items())]
+
+
+###########################################################
+# servidor
+###########################################################
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class DcDaemon:
+    """
+    Estado do servidor: uma conexão do DuckDB, as tabelas residentes, os
+    índices de colunas e as estatísticas, compartilhados por todas as
+    requisições (cada uma com o seu cursor). A gramática do dc_to_sql é
+    compilada uma vez no início.
+    """
+    def __init__(self, registry, connection, index_store, table_stats, cache_budget_mb):
+        self.registry = registry
+        self.connection = connection
+        self.index_store = index_store
+        self.table_stats = table_stats
+        self.cache_budget_mb = cache_budget_mb
+        self.requests = 0
+
+    def parse(self, dcs_text) -> dict:
+        """
+        Separa as DCs do texto (objetos JSON concatenados, como no
+        results.txt) e as agrupa pelas tabelas que referenciam. Um texto
+        cortado, que não é de DCs ou com uma DC sem predicados levanta
+        ValueError ou KeyError antes de qualquer DC rodar.
+        """
+        from dc_stream import iter_json_texts
+
+        indexed_dcs = list(enumerate(iter_json_texts(io.StringIO(dcs_text))))
+        for i, dc_json in indexed_dcs:
+            dc = json.loads(dc_json)
+            predicates = dc.get("predicates") if isinstance(dc, dict) else None
+            if not isinstance(predicates, list) or not predicates:
+                raise ValueError(f"DC #{i + 1} sem lista de predicados")
+
+        return group_by_table(indexed_dcs)
+
+    def check(self, groups, strategy, output):
+        """
+        Executa as DCs do parse, grupo de tabelas por grupo, e grava em
+        output um registro JSON por DC assim que ela termina (os do
+        ResultLog) e um último com o total. As DCs de um grupo cuja tabela
+        não carrega, ou cuja execução falha, ganham um registro com error.
+        """
+        from dc_metrics import ResultLog
+        from dc_parsimonious import dc_to_sql, run_plan
+
+        self.requests += 1
+        start_time = time.perf_counter()
+        result_log = ResultLog(output, dc_to_sql)
+        cursor = self.connection.cursor()
+        results = []
+        errors = 0
+
+        for tables, table_dcs in groups.items():
+            try:
+                table_names = self.registry.acquire(cursor, tables)
+            except Exception as e:
+                errors += write_errors(output, table_dcs, e)
+                continue
+
+            try:
+                with self.registry.run_lock(tables[0]):
+                    if len(tables) == 1:
+                        run_plan(cursor, table_dcs, table_names[tables[0]], results, False, strategy,
+                                 cache_budget_mb=self.cache_budget_mb, result_log=result_log,
+                                 index_store=self.index_store, table_stats=self.table_stats)
+                    else:
+                        run_plan(cursor, table_dcs, table_names[tables[0]], results, False,
+                                 table_names=table_names, result_log=result_log)
+            except BrokenPipeError:
+                raise
+            except Exception as e:
+                # as DCs do grupo que já terminaram têm o seu registro
+                finished = {i for i, _ in results}
+                errors += write_errors(output, [(i, dc_json) for i, dc_json in table_dcs if i not in finished], e)
+            finally:
+                self.registry.release(tables)
+
+        cursor.close()
+        summary = {"done": True, "dcs": sum(len(table_dcs) for table_dcs in groups.values()), "errors": errors,
+                   "violations": sum(v for _, v in results if v is not None),
+                   "wall_s": time.perf_counter() - start_time}
+        output.write(json.dumps(summary) + "\n")
+        output.flush()
+
+
+def write_errors(output, indexed_dcs, error) -> int:
+    """Grava um registro com o erro para cada DC e devolve quantas foram."""
+    for i, _ in indexed_dcs:
+        output.write(json.dumps({"dc": i + 1, "error": str(error)}, ensure_ascii=False) + "\n")
+    output.flush()
+    return len(indexed_dcs)
+
+
+def make_handler(daemon):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                self._send_json(200, {"ok": True, "requests": daemon.requests})
+            elif path == "/datasets":
+                self._send_json(200, {"datasets": daemon.registry.status(), "evictions": daemon.registry.evictions})
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+
+            if url.path == "/datasets":
+                # registra (ou remapeia) tableIdentifier=caminho
+                try:
+                    table_id, path = parse_dataset_arg(body.strip())
+                except ValueError as e:
+                    self._send_json(400, {"error": str(e)})
+                    return
+                daemon.registry.register(table_id, path)
+                self._send_json(200, {"table": table_id, "path": path})
+                return
+
+            if url.path != "/check":
+                self.send_error(404)
+                return
+
+            strategy = query.get("strategy", "auto")
+            if strategy not in ("auto", "sql", "evidence"):
+                self._send_json(400, {"error": f"Estratégia desconhecida: {strategy}"})
+                return
+
+            from dc_ir import column_scope
+
+            # as colunas internadas pelas DCs da requisição saem da memória com ela
+            with column_scope():
+                try:
+                    groups = daemon.parse(body)
+                except (ValueError, KeyError) as e:
+                    self._send_json(400, {"error": f"DCs inválidas: {e!r}"})
+                    return
+
+                # resposta em fluxo, sem Content-Length: o fim vem com o fechamento da conexão
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.end_headers()
+
+                output = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+                try:
+                    daemon.check(groups, strategy, output)
+                except BrokenPipeError:
+                    pass
+                finally:
+                    output.detach()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(args):
+    """Carrega o que for pedido em --preload e atende até um Ctrl-C."""
+    import duckdb
+    from dc_index import IndexStore
+    from dc_parsimonious import dc_grammar
+    from dc_strategy import TableStats
+
+    dc_grammar()
+
+    index_store = IndexStore(args.index_dir)
+    table_stats = TableStats()
+    registry = WarmRegistry(args.data_dir, [parse_dataset_arg(d) for d in args.dataset], args.memory_mb, index_store,
+                            table_stats)
+    connection = duckdb.connect(config={"threads": args.threads} if args.threads else {})
+    daemon = DcDaemon(registry, connection, index_store, table_stats, args.cache_budget_mb)
+
+    cursor = connection.cursor()
+    for table_id in args.preload:
+        registry.acquire(cursor, [table_id])
+        registry.release([table_id])
+    cursor.close()
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, make_handler(daemon))
+        print(f"Atendendo em {args.socket}", flush=True)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(daemon))
+        server.daemon_threads = True
+        print(f"Atendendo em http://{args.host}:{server.server_address[1]}", flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        connection.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+###########################################################
+# cliente
+###########################################################
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._socket_path)
+
+
+def open_connection(args):
+    if args.socket:
+        return UnixHTTPConnection(args.socket)
+    return http.client.HTTPConnection(args.host, args.port)
+
+
+def submit(args) -> int:
+    """
+    Envia o arquivo de DCs ao servidor e imprime os registros à medida
+    que chegam. O cliente não importa o DuckDB nem o parsimonious.
+    Devolve 1 se alguma DC terminou com erro ou se a resposta acabou
+    sem o registro final (servidor caiu no meio da checagem).
+    """
+    with open(args.results_file, "rb") as f:
+        body = f.read()
+
+    connection = open_connection(args)
+    connection.request("POST", f"/check?strategy={args.strategy}", body=body,
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+
+    if response.status != 200:
+        print(response.read().decode("utf-8"), file=sys.stderr)
+        return 1
+
+    done = False
+    errors = 0
+
+    for line in response:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # linha cortada: a conexão caiu no meio de um registro
+            break
+
+        if args.raw:
+            print(line.decode("utf-8"), end="", flush=True)
+
+        if record.get("done"):
+            done = True
+            if not args.raw:
+                print(f"{record['dcs']} DCs, {record['violations']} violações em {record['wall_s'] * 1000:.1f} ms")
+        elif "error" in record:
+            errors += 1
+            if not args.raw:
+                print(f"DC #{record['dc']}: erro: {record['error']}", flush=True)
+        elif not args.raw:
+            violations = "rejeitada" if record["violations"] is None else f"{record['violations']} violações"
+            print(f"DC #{record['dc']}: {violations} ({record['strategy']}, {record['wall_s'] * 1000:.1f} ms)",
+                  flush=True)
+
+    connection.close()
+
+    if not done:
+        print("A resposta do servidor terminou antes do registro final", file=sys.stderr)
+        return 1
+    if errors:
+        print(f"{errors} DCs com erro", file=sys.stderr)
+        return 1
+    return 0
+
+
+def get_json(args, path):
+    connection = open_connection(args)
+    connection.request("GET", path)
+    payload = json.loads(connection.getresponse().read())
+    connection.close()
+    return payload
+
+
+###################################################
+# Main
+###################################################
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor local que mantém datasets carregados para checar DCs")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Endereço do servidor HTTP")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Porta do servidor HTTP")
+    parser.add_argument("--socket", type=str, default=None, help="Socket Unix em vez de TCP")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Sobe o servidor")
+    serve_parser.add_argument("--data-dir", type=str, default=".", help="Diretório onde procurar os CSVs dos tableIdentifiers")
+    serve_parser.add_argument("--dataset", action="append", default=[], metavar="TABELA=CAMINHO",
+                              help="Mapeia um tableIdentifier para um CSV (pode repetir)")
+    serve_parser.add_argument("--preload", nargs="*", default=[], metavar="TABELA",
+                              help="tableIdentifiers carregados antes da primeira requisição")
+    serve_parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                              help="Memória máxima das tabelas residentes; acima dela as ociosas saem por LRU")
+    serve_parser.add_argument("--threads", type=int, default=None, help="Threads do DuckDB")
+    serve_parser.add_argument("--cache-budget-mb", type=int, default=512,
+                              help="Memória máxima para o cache de pares entre DCs que compartilham predicados")
+    serve_parser.add_argument("--index-dir", type=str, default=None, metavar="DIR",
+                              help="Grava e reutiliza os índices ordenados das colunas em DIR")
+
+    check_parser = commands.add_parser("check", help="Envia um arquivo de DCs e imprime os resultados")
+    check_parser.add_argument("--results-file", type=str, default="results.txt", help="Caminho para o JSON com DCs")
+    check_parser.add_argument("--strategy", choices=["auto", "sql", "evidence"], default="auto")
+    check_parser.add_argument("--raw", action="store_true", help="Imprime os registros JSON como chegam")
+
+    commands.add_parser("datasets", help="Lista os datasets residentes")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args)
+    elif args.command == "check":
+        sys.exit(submit(args))
+    else:
+        print(json.dumps(get_json(args, "/datasets"), indent=2, ensure_ascii=False))
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import re
+from collections import defaultdict
+from threading import Lock
+
+from dc_planner import dc_tables, register_table, unregister_table
+
+
+###########################################################
+# registro de datasets
+###########################################################
+
+def parse_dataset_arg(value: str) -> tuple:
+    """Converte 'tableIdentifier=caminho' (argumento --dataset) em uma tupla."""
+    table_id, sep, path = value.partition("=")
+    if not sep or not table_id or not path:
+        raise ValueError(f"Dataset inválido '{value}', use tableIdentifier=caminho")
+
+    return table_id, path
+
+
+class DatasetRegistry:
+    """
+    Resolve o tableIdentifier das DCs para um CSV e carrega cada tabela uma
+    única vez na conexão, como uma tabela do DuckDB que todos os cursores
+    enxergam.
+
+    Sem mapeamento explícito, o tableIdentifier é tratado como nome de
+    arquivo dentro de data_dir (flights.csv -> data_dir/flights.csv).
+    """
+    def __init__(self, data_dir=".", datasets=None):
+        self._data_dir = data_dir
+        self._paths = dict(datasets or [])
+        self._loaded = {}
+        self._lock = Lock()
+        self._table_locks = defaultdict(Lock)
+
+    def path(self, table_id: str) -> str:
+        return self._paths.get(table_id) or os.path.join(self._data_dir, table_id)
+
+    def register(self, table_id: str, path: str):
+        """Mapeia (ou remapeia) um tableIdentifier para um CSV."""
+        with self._lock:
+            self._paths[table_id] = path
+
+    @staticmethod
+    def table_name(table_id: str) -> str:
+        # nome sem extensão nem caracteres especiais; o hash do tableIdentifier
+        # separa a/flights.csv de b/flights.csv e flights.csv de flights.tsv
+        stem = re.sub(r"\W", "_", os.path.splitext(os.path.basename(table_id))[0])
+        return f"dc_{stem}_{hashlib.sha1(table_id.encode('utf-8')).hexdigest()[:8]}"
+
+    def load(self, connection, table_id: str) -> str:
+        """
+        Materializa a tabela na primeira chamada e devolve o seu nome.
+        Tabelas diferentes podem ser carregadas ao mesmo tempo; chamadas
+        concorrentes para a mesma tabela esperam a primeira terminar.
+        """
+        with self._lock:
+            table_lock = self._table_locks[table_id]
+
+        with table_lock:
+            if table_id not in self._loaded:
+                name = self.table_name(table_id)
+                with self._lock:
+                    owner = next((t for t, n in self._loaded.items() if n == name), None)
+                if owner is not None:
+                    # CREATE OR REPLACE sobrescreveria a tabela do outro tableIdentifier
+                    raise ValueError(f"Os tableIdentifiers '{owner}' e '{table_id}' usam a mesma tabela {name}")
+                path = self.path(table_id).replace("'", "''")
+                connection.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM read_csv_auto(\'{path}\');')
+                register_table(name)
+                self._loaded[table_id] = name
+
+        return self._loaded[table_id]
+
+    def load_all(self, connection, table_ids) -> dict:
+        return {table_id: self.load(connection, table_id) for table_id in table_ids}
+
+    def unload(self, connection, table_id: str):
+        """
+        Remove a tabela da conexão; a próxima load lê o CSV de novo.
+        Devolve o nome da tabela removida, ou None se ela não estava carregada.
+        """
+        with self._lock:
+            table_lock = self._table_locks[table_id]
+
+        with table_lock:
+            name = self._loaded.pop(table_id, None)
+            if name is not None:
+                connection.execute(f'DROP TABLE IF EXISTS "{name}";')
+                unregister_table(name)
+
+        return name
+
+    def loaded(self) -> dict:
+        """{tableIdentifier: tabela} das tabelas carregadas."""
+        return dict(self._loaded)
+
+
+def group_by_table(indexed_dcs) -> dict:
+    """
+    Agrupa as DCs (i, dc_json) pelo conjunto de tabelas que referenciam.
+    DCs de uma única tabela ficam sob (tabela,); DCs entre tabelas ficam
+    sob a tupla ordenada de todas elas.
+    """
+    groups = defaultdict(list)
+
+    for i, dc_json in indexed_dcs:
+        groups[dc_tables(dc_json)].append((i, dc_json))
+
+    return dict(groups)
@@ -0,0 +1,240 @@
+from collections import Counter
+
+import numpy as np
+
+from dc_ir import quote_column
+from dc_planner import dc_to_predicates, canonical_predicate, source_sql
+
+
+# nome da estratégia nos resultados estruturados
+EVIDENCE = "evidence"
+
+###########################################################
+# espaço de predicados
+###########################################################
+
+COMPARATORS = {
+    "EQUAL": np.equal,
+    "UNEQUAL": np.not_equal,
+    "LESS": np.less,
+    "LESS_EQUAL": np.less_equal,
+    "GREATER": np.greater,
+    "GREATER_EQUAL": np.greater_equal
+}
+
+
+class PredicateSpace:
+    """
+    Conjunto de todos os predicados distintos (na forma canônica) usados
+    pelas DCs do lote. Cada predicado ocupa um bit das evidências; com
+    mais de 64 predicados as máscaras usam várias palavras uint64.
+    """
+    def __init__(self, predicate_lists):
+        self.predicates = sorted({canonical_predicate(p) for preds in predicate_lists for p in preds})
+        self.bit_of = {p: k for k, p in enumerate(self.predicates)}
+        self.words = max(1, (len(self.predicates) + 63) // 64)
+
+    def columns(self) -> list:
+        return sorted({p[0] for p in self.predicates} | {p[3] for p in self.predicates})
+
+    def mask(self, predicates) -> np.ndarray:
+        """Máscara de bits de uma DC: os predicados que precisam valer juntos."""
+        mask = np.zeros(self.words, dtype=np.uint64)
+        for p in predicates:
+            k = self.bit_of[canonical_predicate(p)]
+            mask[k // 64] |= np.uint64(1) << np.uint64(k % 64)
+        return mask
+
+
+###########################################################
+# colunas em memória
+###########################################################
+
+def load_columns(connection, table_name, columns) -> dict:
+    """
+    Lê as colunas da tabela como arrays NumPy e devolve
+    {coluna: (valores, nulos)}. Strings viram códigos inteiros de um
+    dicionário ordenado comum a todas as colunas de texto, então =, <, etc.
+    entre códigos dão o mesmo resultado que entre as strings.
+    """
+    select = ", ".join(quote_column(c) for c in columns)
+    data = connection.execute(f"SELECT {select} FROM {source_sql(table_name)};").fetchnumpy()
+
+    arrays = {}
+    for column in columns:
+        values = data[column]
+
+        if isinstance(values, np.ma.MaskedArray):
+            nulls = np.ma.getmaskarray(values)
+            # o valor guardado sob a máscara é indiferente: pares com nulo
+            # são descartados na comparação
+            values = np.ma.getdata(values)
+        else:
+            nulls = np.zeros(len(values), dtype=bool)
+
+        if values.dtype == object:
+            nulls = nulls | np.equal(values, None)
+            if all(isinstance(v, str) for v in values[~nulls]):
+                values = np.where(nulls, "", values).astype(str)
+
+        arrays[column] = (values, nulls)
+
+    _encode_strings(arrays)
+
+    return arrays
+
+
+def _encode_strings(arrays):
+    text_columns = [c for c, (values, _) in arrays.items() if values.dtype.kind == "U"]
+    if not text_columns:
+        return
+
+    _, codes = np.unique(np.concatenate([arrays[c][0] for c in text_columns]), return_inverse=True)
+
+    start = 0
+    for column in text_columns:
+        values, nulls = arrays[column]
+        arrays[column] = (codes[start:start + len(values)], nulls)
+        start += len(values)
+
+
+###########################################################
+# construção do conjunto de evidências
+###########################################################
+
+def _side(arrays, column, idx, left, right):
+    """Valores e nulos de t[idx].column para o bloco de pares (left x right)."""
+    values, nulls = arrays[column]
+    rows = left if idx == 0 else right
+    shape = (-1, 1) if idx == 0 else (1, -1)
+    return values[rows].reshape(shape), nulls[rows].reshape(shape)
+
+
+def _pair_masks(space, arrays, left, right) -> np.ndarray:
+    """Máscaras (len(left) * len(right), palavras) dos pares left x right."""
+    masks = np.zeros((len(left), len(right), space.words), dtype=np.uint64)
+
+    for k, (col1, idx1, op, col2, idx2) in enumerate(space.predicates):
+        values1, nulls1 = _side(arrays, col1, idx1, left, right)
+        values2, nulls2 = _side(arrays, col2, idx2, left, right)
+
+        holds = COMPARATORS[op](values1, values2) & ~nulls1 & ~nulls2
+        holds = np.broadcast_to(holds, (len(left), len(right)))
+
+        masks[:, :, k // 64] |= holds.astype(np.uint64) << np.uint64(k % 64)
+
+    return masks.reshape(-1, space.words)
+
+
+def _pair_masks_sampled(space, arrays, t0_rows, t1_rows) -> np.ndarray:
+    """Máscaras dos pares (t0_rows[k], t1_rows[k]) sorteados."""
+    masks = np.zeros((len(t0_rows), space.words), dtype=np.uint64)
+    rows = (t0_rows, t1_rows)
+
+    for k, (col1, idx1, op, col2, idx2) in enumerate(space.predicates):
+        values1, nulls1 = arrays[col1]
+        values2, nulls2 = arrays[col2]
+        rows1, rows2 = rows[idx1], rows[idx2]
+
+        holds = COMPARATORS[op](values1[rows1], values2[rows2]) & ~nulls1[rows1] & ~nulls2[rows2]
+        masks[:, k // 64] |= holds.astype(np.uint64) << np.uint64(k % 64)
+
+    return masks
+
+
+def _accumulate(evidence, masks):
+    if masks.shape[1] == 1:
+        # uma palavra só: o unique 1D ordena uint64 direto, bem mais rápido
+        # que o unique por linhas
+        unique, counts = np.unique(masks[:, 0], return_counts=True)
+        unique = unique.reshape(-1, 1)
+    else:
+        unique, counts = np.unique(masks, axis=0, return_counts=True)
+
+    for mask, count in zip(map(tuple, unique.tolist()), counts.tolist()):
+        evidence[mask] += count
+
+
+class EvidenceSet:
+    """
+    Multiconjunto de evidências: para cada combinação de predicados que
+    vale em algum par de tuplas, quantos pares a produzem.
+
+    Uma DC é violada por um par quando todos os seus predicados valem nele,
+    então as violações da DC são a soma das contagens das evidências que
+    contêm a máscara da DC. scale converte contagens de uma amostra em
+    estimativas para a tabela inteira.
+    """
+    def __init__(self, space, evidence: Counter, scale=1.0):
+        self.space = space
+        self.masks = np.array(list(evidence.keys()), dtype=np.uint64).reshape(-1, space.words)
+        self.counts = np.array(list(evidence.values()), dtype=np.int64)
+        self.scale = scale
+
+    def count(self, predicates):
+        if not predicates:
+            return 0
+
+        mask = self.space.mask(predicates)
+        covered = np.all((self.masks & mask) == mask, axis=1)
+        total = int(self.counts[covered].sum())
+        return total if self.scale == 1.0 else round(total * self.scale)
+
+    def __len__(self):
+        return len(self.counts)
+
+
+def build_evidence(connection, table_name, space, sample_size=None, block_pairs=4_000_000, seed=0) -> EvidenceSet:
+    """
+    Calcula as evidências de todos os pares ordenados (t0, t1) da tabela,
+    incluindo t0 = t1 como o self-join de dc_to_sql, em blocos de até
+    block_pairs pares. Com sample_size, sorteia esse número de pares e as
+    contagens viram estimativas.
+    """
+    arrays = load_columns(connection, table_name, space.columns())
+    n = len(next(iter(arrays.values()))[0]) if arrays else 0
+    evidence = Counter()
+
+    if n == 0:
+        return EvidenceSet(space, evidence)
+
+    if sample_size is not None and sample_size < n * n:
+        rng = np.random.default_rng(seed)
+        for start in range(0, sample_size, block_pairs):
+            size = min(block_pairs, sample_size - start)
+            t0_rows = rng.integers(n, size=size)
+            t1_rows = rng.integers(n, size=size)
+            _accumulate(evidence, _pair_masks_sampled(space, arrays, t0_rows, t1_rows))
+
+        return EvidenceSet(space, evidence, scale=(n * n) / sample_size)
+
+    all_rows = np.arange(n)
+    block = max(1, block_pairs // n)
+    for start in range(0, n, block):
+        _accumulate(evidence, _pair_masks(space, arrays, all_rows[start:start + block], all_rows))
+
+    return EvidenceSet(space, evidence)
+
+
+###########################################################
+# execução
+###########################################################
+
+def run_evidence(connection, indexed_dcs, csv_file, results_list, sample_size=None, verbose=False):
+    """
+    Checa todas as DCs (i, dc_json) de uma vez contra um único conjunto de
+    evidências, em vez de um self-join por DC. Com verbose, imprime o
+    tamanho do espaço de predicados e do conjunto de evidências.
+    """
+    if not indexed_dcs:
+        return
+
+    predicate_lists = [(i, dc_to_predicates(dc_json)) for i, dc_json in indexed_dcs]
+    space = PredicateSpace([predicates for _, predicates in predicate_lists])
+    evidence = build_evidence(connection, csv_file, space, sample_size)
+
+    if verbose:
+        print(f"Evidências: {len(space.predicates)} predicados, {len(evidence)} evidências distintas")
+
+    for i, predicates in predicate_lists:
+        results_list.append((i, evidence.count(predicates)))
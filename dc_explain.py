@@ -0,0 +1,114 @@
+from collections import namedtuple
+
+import duckdb
+
+from dc_cache import split_shared, PAIR_CACHE
+from dc_evidence import EVIDENCE
+from dc_planner import dc_to_predicates, SQL_JOIN
+from dc_strategy import TableStats, choose, estimate_pairs
+from dc_types import coerce_dcs
+
+
+# o que a execução faria com uma DC: estratégia, motivo da escolha, pares
+# (violações) estimados, custo estimado da estratégia, SQL do self-join e o
+# plano do DuckDB para ele
+Explanation = namedtuple("Explanation", ["i", "strategy", "reason", "pairs", "cost", "sql", "plan"])
+
+
+###########################################################
+# plano de cada DC
+###########################################################
+
+def explain_sql(connection, sql_query) -> str:
+    """Plano físico do DuckDB para a contagem do self-join, sem executá-la."""
+    count_query = f"SELECT COUNT(*) FROM ({sql_query.replace(';', '')}) AS violations_subquery"
+    try:
+        return "\n".join(plan for _, plan in connection.execute(f"EXPLAIN {count_query};").fetchall())
+    except duckdb.Error as e:
+        return f"EXPLAIN falhou: {e}"
+
+
+def explain_table(connection, indexed_dcs, source, to_sql, strategy="auto", cache_budget_mb=0, table_names=None,
+                  stats=None) -> list:
+    """
+    Explica, sem executar nenhuma DC, as DCs (i, dc_json) de uma tabela: a
+    estratégia que o run_plan escolheria (com o cache de pares para as DCs
+    do self-join que compartilham predicados), as estimativas do modelo de
+    custo e o SQL do dc_to_sql (to_sql) com o EXPLAIN do DuckDB. source é
+    o CSV (ou tabela carregada). Os dados só são lidos para as estatísticas
+    das colunas e, como na execução, para a cópia tipada do coerce_dcs
+    quando algum predicado compara colunas de tipos diferentes; as DCs
+    rejeitadas por ele aparecem como rejected. DCs entre tabelas
+    (table_names) só têm o self-join e ficam sem estimativas.
+    """
+    if table_names is not None:
+        explained = []
+        for i, dc_json in indexed_dcs:
+            sql_query = to_sql(dc_json, source, table_names)
+            explained.append(Explanation(i, SQL_JOIN, "DC entre tabelas", None, None, sql_query,
+                                         explain_sql(connection, sql_query)))
+        return explained
+
+    source, indexed_dcs, rejected = coerce_dcs(connection, source, indexed_dcs)
+    explained = [Explanation(i, "rejected", reason, None, None, None, None) for i, reason in rejected]
+
+    stats = stats or TableStats()
+    parsed = [(i, dc_json, dc_to_predicates(dc_json)) for i, dc_json in indexed_dcs]
+
+    columns = sorted({c for _, _, predicates in parsed for p in predicates for c in (p[0], p[3])})
+    rows, column_stats = stats.get(connection, source, columns) if parsed else (0, {})
+
+    choices = {i: choose(predicates, rows, column_stats) for i, _, predicates in parsed}
+    if strategy == "auto":
+        strategies = {i: choice.strategy for i, choice in choices.items()}
+    else:
+        strategies = {i: EVIDENCE if strategy == "evidence" else SQL_JOIN for i in choices}
+
+    if strategy == "auto" and cache_budget_mb > 0:
+        shared_dcs, _ = split_shared([(i, dc_json) for i, dc_json, _ in parsed if strategies[i] == SQL_JOIN])
+        strategies.update((i, PAIR_CACHE) for i, _ in shared_dcs)
+
+    for i, dc_json, predicates in parsed:
+        # o cache de pares no pior caso custa o self-join; as evidências não têm modelo de custo
+        cost = choices[i].costs.get(SQL_JOIN if strategies[i] == PAIR_CACHE else strategies[i])
+        sql_query = to_sql(dc_json, source)
+        explained.append(Explanation(i, strategies[i], choices[i].reason,
+                                     estimate_pairs(predicates, rows, column_stats), cost, sql_query,
+                                     explain_sql(connection, sql_query)))
+
+    return explained
+
+
+###########################################################
+# relatório
+###########################################################
+
+def print_explanations(explained, duplicates=None, implied=None, top=5):
+    """
+    Imprime o plano de cada DC e, no fim, as top DCs de maior custo
+    estimado: as candidatas a podar ou executar em outro horário.
+    """
+    for e in sorted(explained):
+        print(f"\nDC #{e.i+1}: {e.strategy}")
+        print(f"  {e.reason}")
+        if e.pairs is not None:
+            cost = f"~{e.cost:.2g}" if e.cost is not None else "sem estimativa"
+            print(f"  Pares estimados: ~{e.pairs:.2g} | custo estimado da estratégia: {cost}")
+        if e.sql is None:
+            continue
+        print(f"  SQL: {e.sql}")
+        print("  EXPLAIN:")
+        for line in e.plan.splitlines():
+            print(f"    {line}")
+
+    for i, j in sorted((duplicates or {}).items()):
+        print(f"\nDC #{i+1}: duplicada da DC #{j+1}, não executada")
+    for i, j in sorted((implied or {}).items()):
+        print(f"\nDC #{i+1}: implicada pela DC #{j+1}, não executada")
+
+    costly = sorted((e for e in explained if e.cost is not None), key=lambda e: -e.cost)[:top]
+    if costly:
+        print("\n-------------------------")
+        print("DCs de maior custo estimado:")
+        for e in costly:
+            print(f"  DC #{e.i+1}: ~{e.cost:.2g} ({e.strategy}, ~{e.pairs:.2g} pares)")
@@ -0,0 +1,340 @@
+import hashlib
+import os
+from itertools import combinations
+from threading import Lock
+
+import duckdb
+import numpy as np
+
+from dc_planner import canonical_predicate
+from dc_evidence import load_columns
+
+
+# nome da estratégia nos resultados estruturados
+SORT_RANK = "sort_rank"
+
+ORDER_OPS = {"LESS", "LESS_EQUAL", "GREATER", "GREATER_EQUAL"}
+
+# cada != dobra o número de contagens (inclusão-exclusão)
+MAX_UNEQUAL = 2
+
+
+###########################################################
+# índice de uma coluna
+###########################################################
+
+class ColumnIndex:
+    """
+    Projeção ordenada de uma coluna: ranks[r] é o posto denso do valor da
+    linha r (valores iguais têm o mesmo posto, -1 para NULL) e order é a
+    permutação estável que ordena as linhas pelo posto, com os nulos no
+    começo. Como o posto preserva =, < e > entre valores da mesma coluna,
+    os predicados t0.a op t1.a podem ser avaliados só com inteiros.
+    """
+    def __init__(self, ranks, order=None):
+        self.ranks = ranks
+        self.order = np.argsort(ranks, kind="stable") if order is None else order
+        self.null_count = int(np.count_nonzero(ranks < 0))
+        self.distinct = int(ranks.max()) + 1 if len(ranks) else 0
+
+    @classmethod
+    def build(cls, values, nulls):
+        ranks = np.full(len(values), -1, dtype=np.int64)
+        if not nulls.all():
+            _, ranks[~nulls] = np.unique(values[~nulls], return_inverse=True)
+        return cls(ranks)
+
+    def sorted_rows(self) -> np.ndarray:
+        """Linhas não nulas em ordem crescente do valor."""
+        return self.order[self.null_count:]
+
+
+###########################################################
+# armazenamento por tabela
+###########################################################
+
+class IndexStore:
+    """
+    Índices (ColumnIndex) das colunas usadas pelas DCs, construídos uma vez
+    por tabela e compartilhados por todas as DCs e threads.
+
+    Com cache_dir, os índices de tabelas que vêm de um CSV são gravados
+    em .npz chaveados pelo caminho, tamanho e mtime do arquivo (e versão
+    do DuckDB, que define os tipos lidos pelo read_csv_auto); a próxima
+    execução sobre o mesmo arquivo lê os postos prontos em vez de
+    ordenar as colunas de novo. Tabelas sem arquivo de origem conhecido
+    ficam só em memória.
+
+    As colunas de uma tabela são sempre lidas na ordem de inserção, então
+    os postos de colunas diferentes se referem às mesmas linhas.
+    """
+    def __init__(self, cache_dir=None):
+        self._cache_dir = cache_dir
+        self._sources = {}
+        self._indexes = {}
+        self._lock = Lock()
+        self.built = 0
+        self.loaded = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def bind(self, table_name, source):
+        """
+        Registra que table_name tem as mesmas linhas de source: o CSV de
+        uma tabela carregada pelo DatasetRegistry ou a tabela original da
+        cópia tipada do coerce_dcs.
+        """
+        with self._lock:
+            self._sources[table_name] = self._sources.get(source, source)
+
+    def _fingerprint(self, table_name):
+        source = self._sources.get(table_name, table_name)
+        if not self._cache_dir or not os.path.isfile(source):
+            return None
+
+        stat = os.stat(source)
+        key = f"{os.path.abspath(source)}|{stat.st_size}|{stat.st_mtime_ns}|{duckdb.__version__}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def _cache_path(self, fingerprint, column):
+        column_id = hashlib.sha1(column.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self._cache_dir, f"{fingerprint}_{column_id}.npz")
+
+    def get(self, connection, table_name, columns) -> dict:
+        """
+        Devolve {coluna: ColumnIndex}, lendo do cache em disco ou
+        construindo (com um único scan da tabela) os que faltam.
+        """
+        with self._lock:
+            fingerprint = self._fingerprint(table_name)
+            missing = [c for c in dict.fromkeys(columns) if (table_name, c) not in self._indexes]
+
+            to_build = []
+            for column in missing:
+                path = self._cache_path(fingerprint, column) if fingerprint else None
+                if path and os.path.exists(path):
+                    with np.load(path) as data:
+                        self._indexes[table_name, column] = ColumnIndex(data["ranks"], data["order"])
+                    self.loaded += 1
+                else:
+                    to_build.append(column)
+
+            if to_build:
+                arrays = load_columns(connection, table_name, to_build)
+                for column in to_build:
+                    index = ColumnIndex.build(*arrays[column])
+                    self._indexes[table_name, column] = index
+                    self.built += 1
+                    if fingerprint:
+                        self._save(self._cache_path(fingerprint, column), index)
+
+            return {c: self._indexes[table_name, c] for c in columns}
+
+    @staticmethod
+    def _save(path, index):
+        # grava em um temporário e renomeia, para outra execução nunca ler
+        # um .npz pela metade
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, ranks=index.ranks, order=index.order)
+        os.replace(tmp_path, path)
+
+    def forget(self, table_name):
+        """Descarta da memória os índices da tabela (o cache em disco fica)."""
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == table_name]:
+                del self._indexes[key]
+            self._sources.pop(table_name, None)
+
+    def print_stats(self):
+        print(f"Índices de colunas: {self.built} construídos, {self.loaded} lidos do cache")
+
+
+###########################################################
+# contagem sobre postos
+###########################################################
+
+def dense_key(*keys) -> np.ndarray:
+    """
+    Combina arrays de postos em um único posto denso, na ordem
+    lexicográfica das chaves (a primeira é a mais significativa).
+    """
+    combined = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        combined = combined * (int(key.max()) + 1 if len(key) else 1) + key
+        _, combined = np.unique(combined, return_inverse=True)
+    return combined.astype(np.int64, copy=False)
+
+
+def square_sum(*keys) -> int:
+    """Σ c² sobre os grupos de linhas com as mesmas chaves (pares ordenados iguais)."""
+    if not keys:
+        return 0
+    counts = np.bincount(dense_key(*keys))
+    return int(np.dot(counts, counts))
+
+
+def count_inversions(values) -> int:
+    """
+    Número de pares i < j com values[i] > values[j], para postos inteiros
+    não negativos, com um merge sort de baixo para cima vetorizado: em cada
+    nível os blocos de 2*width posições juntam duas metades já ordenadas e
+    um searchsorted conta, para cada elemento da metade direita, quantos da
+    esquerda do mesmo bloco são maiores. O(n log² n) sem laço por linha.
+    """
+    v = np.asarray(values, dtype=np.int64)
+    n = len(v)
+    if n < 2:
+        return 0
+
+    # deslocar cada bloco por block * span mantém os blocos separados em
+    # um único array ordenado
+    span = int(v.max()) + 1
+    positions = np.arange(n, dtype=np.int64)
+    total = 0
+    width = 1
+
+    while width < n:
+        block = positions // (2 * width)
+        right = (positions // width) % 2 == 1
+        key = block * span + v
+
+        left_keys = key[~right]
+        block_end = np.searchsorted(left_keys, (block[right] + 1) * span)
+        total += int((block_end - np.searchsorted(left_keys, key[right], side="right")).sum())
+
+        # cada bloco são duas sequências ordenadas: o timsort só as intercala
+        v = np.sort(key, kind="stable") - block * span
+        width *= 2
+
+    return total
+
+
+def count_order_pairs(group, x, op_x, y=None, op_y=None, y_rows=None) -> int:
+    """
+    Conta os pares ordenados (i, j), incluindo i = j, com group[i] = group[j],
+    x[i] op_x x[j] e, se dado, y[i] op_y y[j]. Os arrays são postos densos
+    sem nulos das mesmas linhas; y_rows, se dado, são essas linhas em
+    ordem crescente de y (a permutação do índice), que poupa uma ordenação.
+    """
+    if op_x in ("GREATER", "GREATER_EQUAL"):
+        # x[i] > x[j] equivale a -x[i] < -x[j]
+        x = x.max() - x if len(x) else x
+        op_x = "LESS" if op_x == "GREATER" else "LESS_EQUAL"
+
+    same_group = square_sum(group)
+    same_x = square_sum(group, x)
+
+    if y is None:
+        less = (same_group - same_x) // 2
+        return less if op_x == "LESS" else less + same_x
+
+    same_y = square_sum(group, y)
+    same_xy = square_sum(group, x, y)
+
+    # pares com x[i] < x[j]: y menor (concordant), y igual ou y maior (discordant)
+    less_x = (same_group - same_x) // 2
+    equal_y = (same_y - same_xy) // 2
+
+    # ordenadas por (grupo, x, y), as inversões do posto de (grupo, y) são
+    # exatamente os pares do mesmo grupo com x[i] < x[j] e y[i] > y[j]
+    rows = np.arange(len(x)) if y_rows is None else y_rows
+    for key in (x, group):
+        rows = rows[np.argsort(key[rows], kind="stable")]
+    discordant = count_inversions(dense_key(group, y)[rows])
+    concordant = less_x - discordant - equal_y
+
+    pairs = {
+        "LESS": concordant,
+        "LESS_EQUAL": concordant + equal_y,
+        "GREATER": discordant,
+        "GREATER_EQUAL": discordant + equal_y,
+    }[op_y]
+
+    if op_x == "LESS_EQUAL":
+        # pares com x igual: a ordem de y dentro dos grupos de (grupo, x)
+        strict = (same_x - same_xy) // 2
+        pairs += strict if op_y in ("LESS", "GREATER") else strict + same_xy
+
+    return pairs
+
+
+###########################################################
+# estratégia sort_rank
+###########################################################
+
+def order_form(predicates):
+    """
+    Reconhece DCs da forma ¬(t0.a = t1.a ∧ ... ∧ t0.x op t1.x [∧ t0.y op t1.y]
+    [∧ t0.b != t1.b ...]) com uma ou duas desigualdades de ordem (<, <=,
+    >, >=) e até MAX_UNEQUAL diferenças, cada coluna em um só predicado,
+    todos entre tuplas diferentes e na mesma coluna. Devolve
+    (colunas de igualdade, [(coluna, op)], colunas diferentes) ou None.
+    """
+    equalities, orders, unequals = [], [], []
+
+    for col1, idx1, op, col2, idx2 in map(canonical_predicate, predicates):
+        if col1 != col2 or idx1 == idx2:
+            return None
+        if op == "EQUAL":
+            equalities.append(col1)
+        elif op == "UNEQUAL":
+            unequals.append(col1)
+        else:
+            orders.append((col1, op))
+
+    columns = equalities + [column for column, _ in orders] + unequals
+    if not 1 <= len(orders) <= 2 or len(unequals) > MAX_UNEQUAL or len(set(columns)) != len(columns):
+        return None
+
+    return equalities, orders, unequals
+
+
+def count_order_dc(connection, table_name, predicates, index_store) -> int:
+    """
+    Conta as violações de uma DC de order_form sobre os postos do
+    índice: linhas com NULL em alguma coluna da DC não formam par
+    nenhum, como no self-join, e saem antes da contagem.
+
+    Cada t0.b != t1.b entra por inclusão-exclusão: os pares com b
+    diferente são todos os pares menos os com b igual, e b igual é só
+    mais uma coluna de igualdade.
+    """
+    equalities, orders, unequals = order_form(predicates)
+    order_columns = [column for column, _ in orders]
+    indexes = index_store.get(connection, table_name, equalities + order_columns + unequals)
+
+    valid = np.ones(len(next(iter(indexes.values())).ranks), dtype=bool)
+    for index in indexes.values():
+        valid &= index.ranks >= 0
+    ranks = {column: index.ranks[valid] for column, index in indexes.items()}
+
+    (x_column, op_x), *rest = orders
+    y_args = ()
+    if rest:
+        y_column, op_y = rest[0]
+
+        # linhas válidas em ordem de y, renumeradas para as posições do subconjunto
+        position = np.cumsum(valid) - 1
+        y_rows = indexes[y_column].sorted_rows()
+        y_args = (ranks[y_column], op_y, position[y_rows[valid[y_rows]]])
+
+    total = 0
+    for k in range(len(unequals) + 1):
+        for same in combinations(unequals, k):
+            group_columns = equalities + list(same)
+            group = dense_key(*(ranks[c] for c in group_columns)) if group_columns \
+                else np.zeros(int(valid.sum()), dtype=np.int64)
+            total += (-1) ** k * count_order_pairs(group, ranks[x_column], op_x, *y_args)
+
+    return total
+
+
+def run_sort_rank(connection, order_dcs, table_name, results_list, index_store):
+    """
+    Conta as DCs de order_form pelos postos do índice da tabela e
+    adiciona (i, violações) em results_list.
+    """
+    for i, predicates in order_dcs:
+        results_list.append((i, count_order_dc(connection, table_name, predicates, index_store)))
@@ -0,0 +1,260 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from operator import attrgetter
+from threading import Lock
+
+
+###########################################################
+# representação intermediária das DCs
+###########################################################
+
+class Op(str, Enum):
+    """
+    Operadores dos predicados. Herda de str para continuar comparável com
+    os nomes do JSON do Metanome ("EQUAL", "LESS", ...).
+    """
+    EQUAL = "EQUAL"
+    UNEQUAL = "UNEQUAL"
+    LESS = "LESS"
+    LESS_EQUAL = "LESS_EQUAL"
+    GREATER = "GREATER"
+    GREATER_EQUAL = "GREATER_EQUAL"
+
+    @property
+    def sql(self) -> str:
+        return _SQL_OPS[self]
+
+    @property
+    def flipped(self) -> "Op":
+        """Operador equivalente com os lados trocados (a < b  <=>  b > a)."""
+        return _FLIPPED_OPS[self]
+
+    @classmethod
+    def from_sql(cls, symbol: str) -> "Op":
+        return _OPS_BY_SQL[symbol]
+
+
+_SQL_OPS = {
+    Op.EQUAL: "=", Op.UNEQUAL: "!=", Op.LESS: "<",
+    Op.LESS_EQUAL: "<=", Op.GREATER: ">", Op.GREATER_EQUAL: ">="
+}
+_FLIPPED_OPS = {
+    Op.EQUAL: Op.EQUAL, Op.UNEQUAL: Op.UNEQUAL, Op.LESS: Op.GREATER,
+    Op.LESS_EQUAL: Op.GREATER_EQUAL, Op.GREATER: Op.LESS, Op.GREATER_EQUAL: Op.LESS_EQUAL
+}
+_OPS_BY_NAME = dict(Op.__members__)
+_OPS_BY_SQL = {symbol: op for op, symbol in _SQL_OPS.items()}
+_OPS_BY_SQL["<>"] = Op.UNEQUAL
+
+
+class ColumnPool:
+    """
+    Interna os pares (tableIdentifier, columnIdentifier) em ids inteiros,
+    para que um milhão de predicados sobre as mesmas colunas guardem só
+    inteiros pequenos em vez de cópias dos nomes.
+    """
+    def __init__(self):
+        self._ids = {}
+        self._columns = []
+        self._lock = Lock()
+
+    def intern(self, table: str, column: str) -> int:
+        key = (table, column)
+        column_id = self._ids.get(key)
+        if column_id is None:
+            with self._lock:
+                column_id = self._ids.get(key)
+                if column_id is None:
+                    column_id = len(self._columns)
+                    self._columns.append(key)
+                    self._ids[key] = column_id
+
+        return column_id
+
+    def table(self, column_id: int) -> str:
+        return self._columns[column_id][0]
+
+    def column(self, column_id: int) -> str:
+        return self._columns[column_id][1]
+
+    def __len__(self):
+        return len(self._columns)
+
+
+# pool compartilhado pelos tradutores e backends do processo
+COLUMNS = ColumnPool()
+
+# pool usado por quem constrói predicados agora; column_scope troca o do contexto
+_CURRENT_POOL = ContextVar("dc_column_pool", default=COLUMNS)
+
+
+def current_pool() -> ColumnPool:
+    return _CURRENT_POOL.get()
+
+
+@contextmanager
+def column_scope():
+    """
+    Interna as colunas dos predicados construídos no bloco (nesta thread)
+    em um pool novo, que é liberado junto com eles. Para processos longos,
+    como o dc_daemon, em que o pool global só cresceria requisição a
+    requisição.
+    """
+    token = _CURRENT_POOL.set(ColumnPool())
+    try:
+        yield _CURRENT_POOL.get()
+    finally:
+        _CURRENT_POOL.reset(token)
+
+
+class Predicate:
+    """
+    Predicado t[idx1].col1 op t[idx2].col2 com ids de coluna internados.
+
+    Desempacota como a tupla (coluna1, indice1, op, coluna2, indice2) com
+    os nomes das colunas, que é a forma usada pelo planejador. Os ids são
+    do pool em que as colunas foram internadas (o atual, por padrão).
+    """
+    __slots__ = ("col1", "idx1", "op", "col2", "idx2", "pool")
+
+    def __init__(self, col1: int, idx1: int, op: Op, col2: int, idx2: int, pool=None):
+        self.col1 = col1
+        self.idx1 = idx1
+        self.op = op
+        self.col2 = col2
+        self.idx2 = idx2
+        self.pool = pool or current_pool()
+
+    @property
+    def column1(self) -> str:
+        return self.pool.column(self.col1)
+
+    @property
+    def column2(self) -> str:
+        return self.pool.column(self.col2)
+
+    @property
+    def table1(self) -> str:
+        return self.pool.table(self.col1)
+
+    @property
+    def table2(self) -> str:
+        return self.pool.table(self.col2)
+
+    def as_tuple(self) -> tuple:
+        return (self.column1, self.idx1, self.op, self.column2, self.idx2)
+
+    def __iter__(self):
+        yield self.pool.column(self.col1)
+        yield self.idx1
+        yield self.op
+        yield self.pool.column(self.col2)
+        yield self.idx2
+
+    def __getitem__(self, item):
+        # p[0], p[2], p[3] estão nos laços quentes do planejador: lê só o campo pedido
+        if isinstance(item, slice):
+            return self.as_tuple()[item]
+        return _PREDICATE_FIELDS[item](self)
+
+    def __len__(self):
+        return 5
+
+    def __eq__(self, other):
+        # ids só se comparam dentro do mesmo pool
+        if isinstance(other, Predicate):
+            return self.pool is other.pool and \
+                   (self.col1, self.idx1, self.op, self.col2, self.idx2) == \
+                   (other.col1, other.idx1, other.op, other.col2, other.idx2)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.col1, self.idx1, self.op, self.col2, self.idx2))
+
+    def __repr__(self):
+        return f"t{self.idx1}.{self.column1} {self.op.sql} t{self.idx2}.{self.column2}"
+
+
+_PREDICATE_FIELDS = (
+    lambda p: p.pool.column(p.col1), attrgetter("idx1"), attrgetter("op"),
+    lambda p: p.pool.column(p.col2), attrgetter("idx2"),
+)
+
+
+class DenialConstraint:
+    """Conjunção de predicados ¬(p1 ∧ p2 ∧ ...)."""
+    __slots__ = ("predicates",)
+
+    def __init__(self, predicates):
+        self.predicates = tuple(predicates)
+
+    def tables(self) -> tuple:
+        return tuple(sorted({p.table1 for p in self.predicates} | {p.table2 for p in self.predicates}))
+
+    def __len__(self):
+        return len(self.predicates)
+
+    def __iter__(self):
+        return iter(self.predicates)
+
+    def __repr__(self):
+        return "¬(" + " ∧ ".join(repr(p) for p in self.predicates) + ")"
+
+
+###########################################################
+# construção a partir do JSON do Metanome
+###########################################################
+
+def predicate_from_json(p: dict) -> Predicate:
+    column1 = p["column1"]
+    column2 = p["column2"]
+    pool = current_pool()
+
+    return Predicate(
+        pool.intern(column1["tableIdentifier"], column1["columnIdentifier"]), p["index1"],
+        _OPS_BY_NAME[p["op"]],
+        pool.intern(column2["tableIdentifier"], column2["columnIdentifier"]), p["index2"],
+        pool
+    )
+
+
+def dc_from_json(dc_json) -> DenialConstraint:
+    """Constrói a DC a partir do texto JSON ou do dicionário já decodificado."""
+    if isinstance(dc_json, str):
+        dc_json = json.loads(dc_json)
+
+    return DenialConstraint(predicate_from_json(p) for p in dc_json["predicates"])
+
+
+###########################################################
+# backend SQL
+###########################################################
+
+def quote_column(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def predicate_to_sql(predicate: Predicate) -> str:
+    t_var1 = "t1" if predicate.idx1 == 0 else "t2"
+    t_var2 = "t1" if predicate.idx2 == 0 else "t2"
+
+    return f"{t_var1}.{quote_column(predicate.column1)} {predicate.op.sql} {t_var2}.{quote_column(predicate.column2)}"
+
+
+def dc_to_sql_ir(dc: DenialConstraint, source: str) -> str:
+    """
+    Gera a mesma consulta de self-join de dc_to_sql a partir da IR.
+    source é a expressão do FROM (ver dc_planner.source_sql).
+    """
+    if not dc.predicates:
+        return f"SELECT 1 FROM {source} WHERE 1=0;"
+
+    conjunction = " AND ".join(predicate_to_sql(p) for p in dc.predicates)
+
+    return (
+        f"SELECT t1.*, t2.* "
+        f"FROM {source} t1, {source} t2 "
+        f"WHERE {conjunction};"
+    )
@@ -0,0 +1,509 @@
+import hashlib
+import json
+import os
+import re
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from dc_normalize import canonical_dc
+from dc_ir import Op
+from dc_planner import dc_to_predicates
+
+
+###########################################################
+# getrusage
+###########################################################
+
+# ru_maxrss vem em KB no Linux e em bytes no macOS
+_MAXRSS_TO_MB = 1 / 1024 ** 2 if sys.platform == "darwin" else 1 / 1024
+
+
+def _cpu_seconds(usage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+
+def thread_cpu_seconds() -> float:
+    """CPU da thread atual; sem RUSAGE_THREAD (fora do Linux), do processo."""
+    who = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+    return _cpu_seconds(resource.getrusage(who))
+
+
+@contextmanager
+def measure_usage():
+    """
+    Mede o bloco: tempo de parede, CPU da thread atual, CPU do processo e
+    quanto o pico de RSS do processo subiu (0 se o bloco não passou do
+    pico anterior). CPU e pico do processo incluem as outras threads.
+    """
+    usage = {}
+    start_wall = time.perf_counter()
+    start_thread = thread_cpu_seconds()
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    yield usage
+
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+    usage["wall_s"] = time.perf_counter() - start_wall
+    usage["thread_cpu_s"] = thread_cpu_seconds() - start_thread
+    usage["process_cpu_s"] = _cpu_seconds(end_usage) - _cpu_seconds(start_usage)
+    usage["maxrss_delta_mb"] = (end_usage.ru_maxrss - start_usage.ru_maxrss) * _MAXRSS_TO_MB
+
+
+###########################################################
+# cgroup v2
+###########################################################
+
+def cgroup_dir():
+    """Diretório do cgroup v2 do processo, ou None se não houver."""
+    try:
+        with open("/proc/self/cgroup", "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    path = os.path.join("/sys/fs/cgroup", line[3:].strip().lstrip("/"))
+                    if os.path.exists(os.path.join(path, "cpu.stat")):
+                        return path
+    except OSError:
+        pass
+
+    return None
+
+
+def _cgroup_cpu_usec(path) -> int:
+    with open(os.path.join(path, "cpu.stat"), "r") as f:
+        for line in f:
+            key, value = line.split()
+            if key == "usage_usec":
+                return int(value)
+    return 0
+
+
+class _CgroupPeak:
+    """
+    Lê memory.peak do cgroup. Em kernels que aceitam escrita no arquivo
+    (6.12+), o pico é zerado para este descritor e vale só para a janela
+    medida; nos outros é o pico desde a criação do cgroup.
+    """
+    def __init__(self, path):
+        self.windowed = False
+        self._file = None
+
+        peak_file = os.path.join(path, "memory.peak")
+        try:
+            self._file = open(peak_file, "r+")
+        except OSError:
+            try:
+                self._file = open(peak_file, "r")
+            except OSError:
+                pass
+            return
+
+        try:
+            self._file.write("reset\n")
+            self._file.flush()
+            self.windowed = True
+        except OSError:
+            pass
+
+    def read_mb(self):
+        if self._file is None:
+            return None
+
+        self._file.seek(0)
+        value = self._file.read().strip()
+        self._file.close()
+        self._file = None
+        return int(value) / 1024 ** 2 if value.isdigit() else None
+
+
+###########################################################
+# métricas do processo
+###########################################################
+
+class ResourceMeter:
+    """
+    Substituto do ResourceMonitor sem thread de amostragem: mesma interface
+    (start, e stop devolvendo (CPU %, pico de memória em MB)), mas os
+    números vêm do kernel.
+
+    - CPU: tempo de usuário + sistema de getrusage do processo e dos
+      filhos já finalizados, dividido pelo tempo de parede. Conta todas as
+      threads do DuckDB e não disputa o GIL com elas.
+    - Memória: ru_maxrss do processo e dos filhos (o maior deles); com
+      cgroup v2 e memory.peak zerável, o pico do cgroup, que cobre a
+      árvore de processos inteira, tem precedência.
+
+    details guarda todos os valores para print_details.
+    """
+    def __init__(self):
+        self.details = {}
+        self._cgroup = cgroup_dir()
+
+    def start(self):
+        self._start_wall = time.perf_counter()
+        self._start_self = _cpu_seconds(resource.getrusage(resource.RUSAGE_SELF))
+        self._start_children = _cpu_seconds(resource.getrusage(resource.RUSAGE_CHILDREN))
+
+        self._peak = None
+        if self._cgroup:
+            self._start_cgroup_cpu = _cgroup_cpu_usec(self._cgroup)
+            self._peak = _CgroupPeak(self._cgroup)
+
+    def stop(self):
+        wall = time.perf_counter() - self._start_wall
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        cpu_self = _cpu_seconds(self_usage) - self._start_self
+        cpu_children = _cpu_seconds(children_usage) - self._start_children
+        maxrss_self = self_usage.ru_maxrss * _MAXRSS_TO_MB
+        maxrss_children = children_usage.ru_maxrss * _MAXRSS_TO_MB
+
+        self.details = {
+            "wall_s": wall,
+            "cpu_self_s": cpu_self,
+            "cpu_children_s": cpu_children,
+            "maxrss_self_mb": maxrss_self,
+            "maxrss_children_mb": maxrss_children,
+        }
+
+        peak_mb = max(maxrss_self, maxrss_children)
+
+        if self._cgroup:
+            self.details["cgroup_cpu_s"] = (_cgroup_cpu_usec(self._cgroup) - self._start_cgroup_cpu) / 1e6
+            cgroup_peak = self._peak.read_mb()
+            if cgroup_peak is not None:
+                self.details["cgroup_peak_mb"] = cgroup_peak
+                self.details["cgroup_peak_windowed"] = self._peak.windowed
+                # o pico desde a criação do cgroup não é desta execução
+                if self._peak.windowed:
+                    peak_mb = cgroup_peak
+
+        cpu_pct = (cpu_self + cpu_children) / wall * 100 if wall > 0 else 0.0
+        return cpu_pct, peak_mb
+
+    def print_details(self):
+        d = self.details
+        print(f"CPU (getrusage): processo {d['cpu_self_s']:.3f} s, filhos {d['cpu_children_s']:.3f} s")
+        print(f"Pico de RSS (ru_maxrss): processo {d['maxrss_self_mb']:.2f} MB, filhos {d['maxrss_children_mb']:.2f} MB")
+        if "cgroup_cpu_s" in d:
+            print(f"cgroup: CPU {d['cgroup_cpu_s']:.3f} s", end="")
+            if "cgroup_peak_mb" in d:
+                scope = "na execução" if d["cgroup_peak_windowed"] else "desde a criação do cgroup"
+                print(f", memory.peak {d['cgroup_peak_mb']:.2f} MB ({scope})", end="")
+            print()
+
+
+###########################################################
+# métricas por DC
+###########################################################
+
+class QueryProfiler:
+    """
+    Liga o profiler JSON do DuckDB em uma conexão (ou cursor): cada query
+    executada nela grava as métricas em output_file, que last_metrics lê.
+    As configurações de profiling são por conexão, então cursores de
+    threads diferentes não se misturam.
+    """
+    def __init__(self, connection, output_file=None):
+        # arquivo temporário criado aqui, apagado no close
+        self._temp_file = None
+        if output_file is None:
+            import tempfile
+
+            fd, output_file = tempfile.mkstemp(prefix="dc_profile_", suffix=".json")
+            os.close(fd)
+            self._temp_file = output_file
+
+        self.output_file = output_file
+        self._connection = connection
+        connection.execute("PRAGMA enable_profiling='json';")
+        self.set_output(output_file)
+
+    def set_output(self, output_file):
+        self.output_file = output_file
+        path = output_file.replace("'", "''")
+        self._connection.execute(f"PRAGMA profiling_output='{path}';")
+
+    def last_profile(self) -> dict:
+        with open(self.output_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def last_metrics(self) -> dict:
+        profile = self.last_profile()
+        return {
+            "latency_s": profile.get("latency", 0.0),
+            "cpu_time_s": profile.get("cpu_time", 0.0),
+            "rows_scanned": profile.get("cumulative_rows_scanned", 0),
+            "peak_buffer_mb": profile.get("system_peak_buffer_memory", 0) / 1024 ** 2,
+        }
+
+    def close(self):
+        self._connection.execute("PRAGMA disable_profiling;")
+        if self._temp_file and os.path.exists(self._temp_file):
+            os.remove(self._temp_file)
+
+
+@contextmanager
+def measure_dc(profiler, profile_file=None):
+    """
+    Mede uma DC executada na conexão do profiler. O dicionário entregue é
+    preenchido na saída com o tempo de parede e a CPU da thread Python
+    (tradução, fetch) e com a CPU e o pico de buffer que o DuckDB atribui
+    à query, que continuam corretos com várias DCs rodando ao mesmo tempo.
+    Com profile_file, o profile da DC fica gravado nesse arquivo. Sem
+    profiler só há as medidas do measure_usage.
+    """
+    if profile_file is not None:
+        profiler.set_output(profile_file)
+
+    with measure_usage() as metrics:
+        yield metrics
+
+    if profiler is not None:
+        metrics.update(profiler.last_metrics())
+
+
+def print_dc_metrics(i, metrics):
+    print(f"  [MÉTRICAS DC #{i+1}] parede {metrics['wall_s']:.4f} s | CPU DuckDB {metrics['cpu_time_s']:.4f} s | "
+          f"CPU thread {metrics['thread_cpu_s']:.4f} s | pico de buffer {metrics['peak_buffer_mb']:.2f} MB | "
+          f"linhas lidas {metrics['rows_scanned']}")
+
+
+###########################################################
+# profiles por DC (--profile)
+###########################################################
+
+PROFILE_METRICS = ["latency", "cpu_time", "cumulative_rows_scanned", "system_peak_buffer_memory"]
+
+_PROFILE_FILE = re.compile(r"^dc_(\d+)\.json$")
+
+
+def dc_profile_path(profile_dir, i) -> str:
+    return os.path.join(profile_dir, f"dc_{i+1}.json")
+
+
+def prepare_profile_dir(profile_dir):
+    """Cria o diretório e apaga os profiles de uma execução anterior."""
+    os.makedirs(profile_dir, exist_ok=True)
+    for name in os.listdir(profile_dir):
+        if _PROFILE_FILE.match(name):
+            os.remove(os.path.join(profile_dir, name))
+
+
+def operators(node):
+    """Operadores da árvore do profile: [(nome, tempo em s, cardinalidade)]."""
+    found = []
+    stack = list(node.get("children", []))
+    while stack:
+        op = stack.pop()
+        found.append((op.get("operator_name", "").strip(), op.get("operator_timing", 0.0),
+                      op.get("operator_cardinality", 0)))
+        stack.extend(op.get("children", []))
+
+    return found
+
+
+def summarize_profiles(profile_dir, top=3) -> dict:
+    """
+    Lê os profiles dc_N.json do diretório e monta o resumo: as métricas de
+    cada DC com os seus top operadores mais lentos, a ordem das DCs por
+    cada uma das PROFILE_METRICS e o tempo somado por tipo de operador.
+    """
+    dcs = []
+    operator_totals = {}
+
+    for name in os.listdir(profile_dir):
+        match = _PROFILE_FILE.match(name)
+        if not match:
+            continue
+
+        with open(os.path.join(profile_dir, name), "r", encoding="utf-8") as f:
+            profile = json.load(f)
+
+        ops = sorted(operators(profile), key=lambda op: op[1], reverse=True)
+        for op_name, timing, _ in ops:
+            operator_totals[op_name] = operator_totals.get(op_name, 0.0) + timing
+
+        entry = {"dc": int(match.group(1)), "file": name}
+        entry.update({metric: profile.get(metric, 0) for metric in PROFILE_METRICS})
+        entry["operators"] = [
+            {"name": op_name, "timing": timing, "cardinality": cardinality}
+            for op_name, timing, cardinality in ops[:top]
+        ]
+        dcs.append(entry)
+
+    dcs.sort(key=lambda entry: entry["dc"])
+
+    return {
+        "dcs": dcs,
+        "rankings": {
+            metric: [entry["dc"] for entry in sorted(dcs, key=lambda entry: entry[metric], reverse=True)]
+            for metric in PROFILE_METRICS
+        },
+        "operators": dict(sorted(operator_totals.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def write_profile_summary(profile_dir, top=5) -> dict:
+    """Grava summary.json no diretório e imprime as top DCs de cada métrica."""
+    summary = summarize_profiles(profile_dir)
+    with open(os.path.join(profile_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    by_dc = {entry["dc"]: entry for entry in summary["dcs"]}
+    print(f"\nProfiles de {len(by_dc)} DCs em {profile_dir}")
+
+    for metric in PROFILE_METRICS:
+        print(f"Maior {metric}:")
+        for dc in summary["rankings"][metric][:top]:
+            entry = by_dc[dc]
+            ops = ", ".join(f"{op['name']} {op['timing']:.4f} s" for op in entry["operators"])
+            print(f"  DC #{dc}: {entry[metric]} ({ops})")
+
+    print("Tempo por operador:")
+    for op_name, timing in list(summary["operators"].items())[:top]:
+        print(f"  {op_name}: {timing:.4f} s")
+
+    return summary
+
+
+###########################################################
+# saída estruturada (--jsonl)
+###########################################################
+
+def canonical_text(predicates) -> str:
+    """Forma canônica da DC (canonical_dc) escrita como t0[tabela].a = t1[tabela].a ∧ ..."""
+    return " ∧ ".join(
+        f"t{idx1}[{table1}].{col1} {Op(op).sql} t{idx2}[{table2}].{col2}"
+        for (table1, col1), idx1, op, (table2, col2), idx2 in canonical_dc(predicates)
+    )
+
+
+class ResultLog:
+    """
+    Grava um objeto JSON por linha para cada DC assim que ela termina, para
+    que o pipeline acompanhe a execução sem ler o texto do stdout:
+
+    - dc, canonical, sql_sha1: número da DC no arquivo, forma canônica e
+      hash do SQL de self-join que dc_to_sql gera para ela;
+    - strategy, violations;
+    - wall_s, cpu_s, peak_mem_delta_mb: custo da DC. Com cpu_scope "query"
+      a CPU é a que o profiler do DuckDB atribui à query, que já inclui a
+      parte da execução feita na thread que a chamou; com "process" é a do
+      processo inteiro no período, exata só quando uma DC roda por vez.
+
+    DCs resolvidas juntas (group_count, evidências, cache de pares) dividem
+    igualmente o custo do lote e têm batch_size > 1. As DCs com self-join
+    têm ainda parse_s (tradução para SQL) e rows_scanned: o do profiler
+    quando ele está ligado (--dc-metrics ou --profile), que também dá o
+    cpu_scope "query", senão as linhas das tabelas lidas pelo join.
+
+    translate(dc_json, tabela, table_names) gera o SQL das DCs registradas
+    com register; o registro de cada DC é descartado quando ela é gravada,
+    exceto a forma canônica e o hash das DCs marcadas com keep (as que
+    representam duplicadas e implicadas, gravadas no fim).
+
+    output_file é um caminho, - para o stdout ou um arquivo já aberto (que
+    close não fecha). Sem output_file nada é gravado e os registros só vão
+    para o exporter (ver dc_prometheus.DcMetrics).
+    """
+    def __init__(self, output_file, translate, exporter=None):
+        self._file = None
+        self._owns_file = False
+        if output_file == "-":
+            self._file = sys.stdout
+        elif hasattr(output_file, "write"):
+            self._file = output_file
+        elif output_file is not None:
+            self._file = open(output_file, "w", encoding="utf-8")
+            self._owns_file = True
+
+        self._translate = translate
+        self._exporter = exporter
+        self._dcs = {}
+        self._kept = {}
+        self._lock = Lock()
+
+    def register(self, indexed_dcs, table_name, table_names=None):
+        # sem arquivo a DC nunca é descrita
+        if self._file is None:
+            return
+
+        with self._lock:
+            for i, dc_json in indexed_dcs:
+                self._dcs[i] = (dc_json, table_name, table_names)
+
+    def keep(self, indices):
+        """Guarda a descrição das DCs indices depois de gravadas, para o same_as."""
+        with self._lock:
+            self._kept.update((i, None) for i in indices)
+
+    def _describe(self, i):
+        if self._kept.get(i) is not None:
+            return self._kept[i]
+
+        with self._lock:
+            dc_json, table_name, table_names = self._dcs.pop(i)
+        sql = self._translate(dc_json, table_name, table_names) or ""
+
+        description = canonical_text(dc_to_predicates(dc_json)), hashlib.sha1(sql.encode("utf-8")).hexdigest()
+        if i in self._kept:
+            self._kept[i] = description
+
+        return description
+
+    def write(self, i, strategy, violations, usage, batch_size=1, same_as=None, **extra):
+        """
+        Grava o registro da DC i. same_as indica a DC que a representa
+        (duplicadas e implicadas), de onde vêm a forma canônica e o hash.
+        """
+        if "cpu_time_s" in usage:
+            cpu, cpu_scope = usage["cpu_time_s"], "query"
+        else:
+            cpu, cpu_scope = usage.get("process_cpu_s", 0.0) / batch_size, "process"
+
+        record = {
+            "dc": i + 1,
+            "strategy": strategy,
+            "violations": violations,
+            "wall_s": usage.get("wall_s", 0.0) / batch_size,
+            "cpu_s": cpu,
+            "cpu_scope": cpu_scope,
+            "peak_mem_delta_mb": usage.get("maxrss_delta_mb", 0.0) / batch_size,
+            "batch_size": batch_size,
+            "finished_at": time.time(),
+        }
+        for key in ("peak_buffer_mb", "rows_scanned", "parse_s"):
+            if key in usage:
+                record[key] = usage[key]
+        record.update(extra)
+
+        if self._exporter is not None:
+            self._exporter.observe(record)
+
+        if self._file is None:
+            return
+
+        # a forma canônica e o hash exigem traduzir a DC, só quando há arquivo
+        if same_as is None:
+            canonical, sql_hash = self._describe(i)
+        else:
+            canonical, sql_hash = self._describe(same_as)
+            with self._lock:
+                self._dcs.pop(i, None)
+        line = json.dumps({"dc": record.pop("dc"), "canonical": canonical, "sql_sha1": sql_hash, **record},
+                          ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def write_batch(self, results, strategy, usage):
+        for i, violations in results:
+            self.write(i, strategy, violations, usage, batch_size=len(results))
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
@@ -0,0 +1,136 @@
+from collections import defaultdict
+
+from dc_planner import dc_to_predicates, canonical_predicate
+
+
+###########################################################
+# forma canônica das DCs
+###########################################################
+
+def qualified(predicate) -> tuple:
+    """
+    O predicado com cada coluna como (tableIdentifier, coluna): a mesma DC
+    sobre tabelas diferentes não tem as mesmas violações.
+    """
+    col1, idx1, op, col2, idx2 = predicate
+    return ((predicate.table1, col1), idx1, op, (predicate.table2, col2), idx2)
+
+
+def swap_tuples(predicate) -> tuple:
+    """Troca os papéis de t0 e t1 em um predicado."""
+    col1, idx1, op, col2, idx2 = predicate
+    return (col1, 1 - idx1, op, col2, 1 - idx2)
+
+
+def canonical_variants(predicates) -> tuple:
+    """
+    As duas escritas canônicas de uma DC, uma para cada atribuição de
+    papéis às tuplas. Em cada uma os predicados (com as colunas
+    qualificadas pela tabela) têm o operador orientado por
+    canonical_predicate e estão ordenados.
+    """
+    predicates = [qualified(p) for p in predicates]
+    as_is = tuple(sorted({canonical_predicate(p) for p in predicates}))
+    swapped = tuple(sorted({canonical_predicate(swap_tuples(p)) for p in predicates}))
+    return as_is, swapped
+
+
+def canonical_dc(predicates) -> tuple:
+    """
+    Forma canônica de uma DC: DCs que diferem só na ordem dos predicados,
+    na direção dos operadores (t0.a < t1.a e t1.a > t0.a) ou na troca de
+    t0 com t1 têm a mesma forma e o mesmo número de violações. DCs sobre
+    tabelas diferentes nunca têm a mesma forma.
+    """
+    return min(canonical_variants(predicates))
+
+
+###########################################################
+# remoção de DCs duplicadas e implicadas
+###########################################################
+
+def find_implied(keys) -> dict:
+    """
+    Procura DCs implicadas trivialmente: se os predicados de A (em alguma
+    atribuição de papéis) são subconjunto dos de B, todo par que viola B
+    também viola A, então B vale sempre que A vale.
+
+    keys é uma lista de (i, variantes); retorna {i_de_B: i_de_A}.
+    """
+    # índice invertido: predicado -> DCs (e variante) que o contêm
+    containing = defaultdict(list)
+    sizes = {}
+    for i, variants in keys:
+        for v, variant in enumerate(variants):
+            sizes[(i, v)] = len(variant)
+            for p in variant:
+                containing[p].append((i, v))
+
+    implied = {}
+    for i, variants in keys:
+        hits = defaultdict(int)
+        for p in variants[0]:
+            for other in containing[p]:
+                hits[other] += 1
+
+        smallest = None
+        for (j, v), n in hits.items():
+            if j != i and n == sizes[(j, v)] < len(variants[0]):
+                if smallest is None or n < sizes[smallest]:
+                    smallest = (j, v)
+
+        if smallest is not None:
+            implied[i] = smallest[0]
+
+    return implied
+
+
+def normalize_dcs(indexed_dcs, drop_implied=False):
+    """
+    Remove as DCs (i, dc_json) logicamente idênticas a uma DC anterior e,
+    com drop_implied, as implicadas por outra DC do lote.
+
+    Retorna (dcs_restantes, duplicadas, implicadas), onde duplicadas e
+    implicadas mapeiam o índice da DC removida para o da DC que a cobre.
+    """
+    representative = {}
+    duplicates = {}
+    unique = []
+
+    for i, dc_json in indexed_dcs:
+        predicates = dc_to_predicates(dc_json)
+        key = canonical_dc(predicates)
+
+        if key in representative:
+            duplicates[i] = representative[key]
+            continue
+
+        representative[key] = i
+        unique.append((i, dc_json, canonical_variants(predicates)))
+
+    implied = {}
+    if drop_implied:
+        implied = find_implied([(i, variants) for i, _, variants in unique])
+
+        # uma DC que implica outra pode ela mesma ser implicada; segue a
+        # cadeia até uma DC que será executada
+        for i, j in implied.items():
+            while j in implied:
+                j = implied[j]
+            implied[i] = j
+
+        # cópias de uma DC implicada também são implicadas
+        for i, j in list(duplicates.items()):
+            if j in implied:
+                implied[i] = implied[j]
+                del duplicates[i]
+
+    remaining = [(i, dc_json) for i, dc_json, _ in unique if i not in implied]
+
+    return remaining, duplicates, implied
+
+
+def print_normalization_report(total, duplicates, implied):
+    saved = len(duplicates) + len(implied)
+    print(f"Normalização: {total} DCs, {len(duplicates)} duplicadas, {len(implied)} implicadas "
+          f"-> {saved} queries economizadas")
@@ -1,5 +1,31 @@
-from lark import Lark, Transformer, ParseError, v_args
+from lark import Lark, Transformer, ParseError, UnexpectedInput, v_args
+from functools import lru_cache
+import io
 import json
+from dc_stream import iter_json_texts
+from dc_ir import current_pool, Op, Predicate, DenialConstraint
+
+# gramática do formato textual "¬(t.a = t'.a ∧ ...)", compartilhada pelos
+# parsers Earley e LALR
+TEXT_DC_GRAMMAR = r"""
+    start: "¬(" predicate_conjunction ")"
+
+    predicate_conjunction: predicate ("∧" predicate)*
+
+    predicate: tuple_variable "." column operator tuple_variable "." column
+
+    tuple_variable: TUPLEVAR
+    TUPLEVAR: "t" | "t'"
+
+    column: CNAME
+
+    operator: OP
+    OP: "=" | "!=" | "<" | "<=" | ">" | ">="
+
+    %import common.CNAME
+    %import common.WS
+    %ignore WS
+"""
 
 # ==============================================================================
 # SEÇÃO 1: Tradutor original para o formato "¬(t.col ...)"
@@ -11,25 +37,6 @@ def translate_dc_to_sql_lark(dc_string: str, table_name: str) -> str:
     e a traduz para uma consulta SQL.
     """
     print("Iniciando análise da Denial Constraint com lark (formato original)...")
-    dc_grammar = r"""
-        start: "¬(" predicate_conjunction ")"
-
-        predicate_conjunction: predicate ("∧" predicate)*
-
-        predicate: tuple_variable "." column operator tuple_variable "." column
-
-        tuple_variable: TUPLEVAR
-        TUPLEVAR: "t" | "t'"
-
-        column: CNAME
-
-        operator: OP
-        OP: "=" | "!=" | "<" | "<=" | ">" | ">="
-
-        %import common.CNAME
-        %import common.WS
-        %ignore WS
-    """
 
     @v_args(inline=True)
     class DcToSqlTransformer(Transformer):
@@ -61,7 +68,7 @@ def translate_dc_to_sql_lark(dc_string: str, table_name: str) -> str:
             )
 
     try:
-        dc_parser = Lark(dc_grammar, start='start')
+        dc_parser = earley_text_parser()
         parse_tree = dc_parser.parse(dc_string)
         transformer = DcToSqlTransformer(table_name)
         sql_query = transformer.transform(parse_tree)
@@ -71,7 +78,77 @@ def translate_dc_to_sql_lark(dc_string: str, table_name: str) -> str:
 
 
 # ==============================================================================
-# SEÇÃO 2: Novo tradutor para o formato JSON (CORRIGIDO NOVAMENTE)
+# SEÇÃO 2: Parser LALR do formato "¬(t.col ...)" direto para a IR
+# ==============================================================================
+
+@v_args(inline=True)
+class TextDcToIrTransformer(Transformer):
+    """
+    Monta a IR (dc_ir) a partir do formato textual. No parser LALR ele roda
+    junto com o parser, a cada redução, então nenhuma árvore é construída.
+    O formato textual não diz a tabela: as colunas são internadas sob
+    table_id.
+    """
+    def __init__(self, table_id=""):
+        super().__init__()
+        self.table_id = table_id
+
+    def column(self, token):
+        return current_pool().intern(self.table_id, token.value)
+
+    def operator(self, token):
+        return Op.from_sql(token.value)
+
+    def tuple_variable(self, token):
+        return 0 if token.value == "t" else 1
+
+    def predicate(self, idx1, col1, op, idx2, col2):
+        return Predicate(col1, idx1, op, col2, idx2)
+
+    def predicate_conjunction(self, *preds):
+        return DenialConstraint(preds)
+
+    def start(self, dc):
+        return dc
+
+
+@lru_cache(maxsize=None)
+def earley_text_parser() -> Lark:
+    """Parser Earley padrão do Lark, construído uma vez por processo."""
+    return Lark(TEXT_DC_GRAMMAR, start='start')
+
+
+@lru_cache(maxsize=None)
+def lalr_text_parser(table_id="") -> Lark:
+    """
+    Parser LALR com lexer contextual (o "t" da variável de tupla e o "t"
+    nome de coluna só se distinguem pelo contexto) e o transformador
+    embutido. cache=True guarda a análise da gramática serializada no
+    diretório temporário, então só a primeira execução paga a construção
+    das tabelas LALR. Para não depender do Lark em produção dá para gerar
+    um parser standalone com a mesma gramática:
+    python -m lark.tools.standalone --lexer contextual -s start gramatica.lark
+    """
+    return Lark(TEXT_DC_GRAMMAR, start='start', parser='lalr', lexer='contextual', cache=True,
+                transformer=TextDcToIrTransformer(table_id))
+
+
+def parse_text_dc(dc_string: str, table_id="", parser="lalr") -> DenialConstraint:
+    """
+    Converte uma DC no formato "¬(t.a = t'.a ∧ ...)" para a IR.
+    parser="earley" usa o parser Earley com árvore + transformador, para
+    comparação.
+    """
+    try:
+        if parser == "lalr":
+            return lalr_text_parser(table_id).parse(dc_string)
+        return TextDcToIrTransformer(table_id).transform(earley_text_parser().parse(dc_string))
+    except UnexpectedInput as e:
+        raise ValueError(f"Erro de sintaxe na Denial Constraint: {e}")
+
+
+# ==============================================================================
+# SEÇÃO 3: Novo tradutor para o formato JSON (CORRIGIDO NOVAMENTE)
 # ==============================================================================
 
 def translate_json_dc_to_sql_lark(dc_json_string: str, table_name: str) -> str:
@@ -88,17 +165,9 @@ def translate_json_dc_to_sql_lark(dc_json_string: str, table_name: str) -> str:
 
         predicate_array: "[" [predicate ("," predicate)*] "]"
 
-        predicate: "{" "\"type\"" ":" ESCAPED_STRING ","
-                         "\" column1\" " ":" column_object ","
-                         "\"index1\"" ":" SIGNED_INT ","
-                         "\"op\"" ":" ESCAPED_STRING ","
-                         "\"column2\"" ":" column_object ","
-                         "\"index2\"" ":" SIGNED_INT
-                   "}"
+        predicate: "{" "\"type\"" ":" ESCAPED_STRING "," "\"column1\"" ":" column_object "," "\"index1\"" ":" SIGNED_INT "," "\"op\"" ":" ESCAPED_STRING "," "\"column2\"" ":" column_object "," "\"index2\"" ":" SIGNED_INT "}"
 
-        column_object: "{" "\"tableIdentifier\"" ":" ESCAPED_STRING ","
-                             "\"columnIdentifier\"" ":" ESCAPED_STRING
-                       "}"
+        column_object: "{" "\"tableIdentifier\"" ":" ESCAPED_STRING "," "\"columnIdentifier\"" ":" ESCAPED_STRING "}"
 
         %import common.ESCAPED_STRING
         %import common.SIGNED_INT
@@ -139,12 +208,12 @@ def translate_json_dc_to_sql_lark(dc_json_string: str, table_name: str) -> str:
 
 
 # ==============================================================================
-# SEÇÃO 3: Exemplos de uso
+# SEÇÃO 4: Exemplos de uso
 # ==============================================================================
 if __name__ == '__main__':
     dc_json_stream = """{"type":"DenialConstraint","predicates":[{"type":"de.metanome.algorithm_integration.PredicateVariable","column1":{"tableIdentifier":"flights.csv","columnIdentifier":"passengers"},"index1":0,"op":"LESS","column2":{"tableIdentifier":"flights.csv","columnIdentifier":"passengers"},"index2":1},{"type":"de.metanome.algorithm_integration.PredicateVariable","column1":{"tableIdentifier":"flights.csv","columnIdentifier":"year"},"index1":0,"op":"LESS","column2":{"tableIdentifier":"flights.csv","columnIdentifier":"year"},"index2":1},{"type":"de.metanome.algorithm_integration.PredicateVariable","column1":{"tableIdentifier":"flights.csv","columnIdentifier":"month"},"index1":0,"op":"UNEQUAL","column2":{"tableIdentifier":"flights.csv","columnIdentifier":"month"},"index2":1}]}{"type":"DenialConstraint","predicates":[{"type":"de.metanome.algorithm_integration.PredicateVariable","column1":{"tableIdentifier":"flights.csv","columnIdentifier":"passengers"},"index1":0,"op":"EQUAL","column2":{"tableIdentifier":"flights.csv","columnIdentifier":"passengers"},"index2":1}]}{"type":"DenialConstraint","predicates":[{"type":"de.metanome.algorithm_integration.PredicateVariable","column1":{"tableIdentifier":"flights.csv","columnIdentifier":"month"},"index1":0,"op":"EQUAL","column2":{"tableIdentifier":"flights.csv","columnIdentifier":"month"},"index2":1},{"type":"de.metanome.algorithm_integration.PredicateVariable","column1":{"tableIdentifier":"flights.csv","columnIdentifier":"year"},"index1":0,"op":"EQUAL","column2":{"tableIdentifier":"flights.csv","columnIdentifier":"year"},"index2":1}]}"""
 
-    json_objects = dc_json_stream.replace('}{', '}\n{').splitlines()
+    json_objects = list(iter_json_texts(io.StringIO(dc_json_stream)))
 
     table_json = "unknown_table"
     try:
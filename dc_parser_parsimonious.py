@@ -1,5 +1,3 @@
-import pandas as pd
-import duckdb
 import os
 from parsimonious.grammar import Grammar
 from parsimonious.nodes import NodeVisitor
@@ -1,14 +1,27 @@
 import json
-from parsimonious.grammar import Grammar
-from parsimonious.nodes import NodeVisitor
-import duckdb
 import argparse
 import time
 import os
-from multiprocessing import Pool, Process, Manager
-import psutil
-from threading import Thread, Event
-
+import sys
+from contextlib import nullcontext
+from functools import lru_cache
+from threading import Thread, Event, Lock
+from dc_planner import (run_group_count, run_fd_histogram, count_equality_dcs, count_fd_dc, source_sql, dc_tables,
+                        GROUP_COUNT, FD_HISTOGRAM, SQL_JOIN)
+from dc_cache import split_shared, run_cached, PAIR_CACHE
+from dc_normalize import normalize_dcs, print_normalization_report
+from dc_stream import read_dcs, parse_dcs, run_streaming
+from dc_datasets import DatasetRegistry, parse_dataset_arg, group_by_table
+from dc_types import coerce_dcs, print_rejected
+from dc_metrics import (ResourceMeter, QueryProfiler, measure_dc, measure_usage, print_dc_metrics, dc_profile_path,
+                        prepare_profile_dir, write_profile_summary, ResultLog)
+from dc_plan_cache import parse_dc, count_violations, print_plan_cache_stats
+from dc_violations import violation_chunks
+
+# duckdb, parsimonious, psutil, numpy (dc_evidence, dc_index, dc_strategy) e
+# http.server (dc_prometheus) são importados só nos caminhos que os usam:
+# juntos custam ~200 ms, mais que a checagem de um arquivo pequeno de DCs.
+# O bench_startup.py mede o tempo de --help e de --sql-only.
 
 ######################################################
 # obtenção de métricas
@@ -17,6 +30,9 @@ from threading import Thread, Event
 class ResourceMonitor:
     """Monitora o uso de CPU e memória de um processo em um thread separado."""
     def __init__(self, process_pid, interval=0.01):
+        import psutil
+
+        self._psutil = psutil
         self._process = psutil.Process(process_pid)
         self._interval = interval
         self._stop_event = Event()
@@ -38,7 +54,7 @@ class ResourceMonitor:
                 
                 self.cpu_percents.append(self._process.cpu_percent(interval=self._interval))
 
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
+            except (self._psutil.NoSuchProcess, self._psutil.AccessDenied):
                 break
 
     def start(self):
@@ -50,42 +66,62 @@ class ResourceMonitor:
         total_cpu_usage = sum(self.cpu_percents) / len(self.cpu_percents) if self.cpu_percents else 0
         return total_cpu_usage, self.peak_memory_mb
 
+def make_monitor(backend):
+    """rusage: ResourceMeter (getrusage/cgroup); poll: ResourceMonitor, que amostra o RSS"""
+    if backend == "poll":
+        return ResourceMonitor(os.getpid())
+
+    return ResourceMeter()
+
 ###########################################################
 # tradução de results.txt para sql
 ###########################################################
 
-def dc_to_sql(dc_json_string: str, table_name: str) -> str:
+DC_GRAMMAR = r"""
 
-    dc_grammar = r"""
+    dc_object = "{" ws "\"type\"" ws ":" ws "\"DenialConstraint\"" ws "," ws "\"predicates\"" ws ":" ws predicate_array ws "}"
+    
+    predicate_array = "[" ws predicate_list? ws "]"
+    
+    predicate_list  = predicate (ws "," ws predicate)*
+    
+    predicate = "{" ws "\"type\"" ws ":" ws escaped_string ws "," ws
+                    "\"column1\"" ws ":" ws column_object ws "," ws
+                    "\"index1\"" ws ":" ws signed_int ws "," ws
+                    "\"op\"" ws ":" ws escaped_string ws "," ws
+                    "\"column2\"" ws ":" ws column_object ws "," ws
+                    "\"index2\"" ws ":" ws signed_int ws "}"
+    
+    column_object = "{" ws "\"tableIdentifier\"" ws ":" ws escaped_string ws "," ws
+                        "\"columnIdentifier\"" ws ":" ws escaped_string ws "}"
+    
+    escaped_string = ~r'"(?:\\.|[^"\\])*"'
+    
+    signed_int = ~r"-?\d+"
+    
+    ws = ~r"\s*"
+"""
 
-        dc_object = "{" ws "\"type\"" ws ":" ws "\"DenialConstraint\"" ws "," ws "\"predicates\"" ws ":" ws predicate_array ws "}"
-        
-        predicate_array = "[" ws predicate_list? ws "]"
-        
-        predicate_list  = predicate (ws "," ws predicate)*
-        
-        predicate = "{" ws "\"type\"" ws ":" ws escaped_string ws "," ws
-                        "\"column1\"" ws ":" ws column_object ws "," ws
-                        "\"index1\"" ws ":" ws signed_int ws "," ws
-                        "\"op\"" ws ":" ws escaped_string ws "," ws
-                        "\"column2\"" ws ":" ws column_object ws "," ws
-                        "\"index2\"" ws ":" ws signed_int ws "}"
-        
-        column_object = "{" ws "\"tableIdentifier\"" ws ":" ws escaped_string ws "," ws
-                            "\"columnIdentifier\"" ws ":" ws escaped_string ws "}"
-        
-        escaped_string = ~r'"(?:\\.|[^"\\])*"'
-        
-        signed_int = ~r"-?\d+"
-        
-        ws = ~r"\s*"
-    """
+
+@lru_cache(maxsize=None)
+def dc_grammar() -> "Grammar":
+    """Gramática compilada uma vez por processo; compilar custa ~5 ms por DC."""
+    from parsimonious.grammar import Grammar
+
+    return Grammar(DC_GRAMMAR)
+
+
+def dc_to_sql(dc_json_string: str, table_name: str, table_names=None) -> str:
+    from parsimonious.nodes import NodeVisitor
 
     class DcToSqlVisitor(NodeVisitor):
-        def __init__(self, table_name):
+        def __init__(self, table_name, table_names=None):
             super().__init__()
             # self.table_name = table_name
-            self.table_name_or_path = f"read_csv_auto('{table_name}')"
+            self.table_name_or_path = source_sql(table_name)
+            # tableIdentifier -> tabela carregada, para DCs de várias tabelas
+            self.table_names = table_names
+            self.tuple_tables = {}
             self.op_map = {
                 "EQUAL": "=",
                 "UNEQUAL": "!=", 
@@ -105,17 +141,20 @@ def dc_to_sql(dc_json_string: str, table_name: str) -> str:
             return int(node.text)
 
         def visit_column_object(self, node, visited_children):
-            return visited_children[14]
+            return visited_children[6], visited_children[14]
 
         def visit_predicate(self, node, visited_children):
-            col1 = visited_children[14]
+            table1, col1 = visited_children[14]
             idx1 = visited_children[22]
 
             op_str = visited_children[30]
             
-            col2 = visited_children[38]
+            table2, col2 = visited_children[38]
             idx2 = visited_children[46]
 
+            self.tuple_tables[idx1] = table1
+            self.tuple_tables[idx2] = table2
+
             sql_op = self.op_map.get(op_str, "???")
 
             t_var1 = "t1" if idx1 == 0 else "t2"
@@ -144,6 +183,12 @@ def dc_to_sql(dc_json_string: str, table_name: str) -> str:
 
             return ""
 
+        def tuple_source(self, idx):
+            if self.table_names is None or idx not in self.tuple_tables:
+                return self.table_name_or_path
+
+            return source_sql(self.table_names[self.tuple_tables[idx]])
+
         def visit_dc_object(self, node, visited_children):
             conjunction = visited_children[14]
 
@@ -152,7 +197,7 @@ def dc_to_sql(dc_json_string: str, table_name: str) -> str:
 
             return (
                 f"SELECT t1.*, t2.* "
-                f"FROM {self.table_name_or_path} t1, {self.table_name_or_path} t2 "
+                f"FROM {self.tuple_source(0)} t1, {self.tuple_source(1)} t2 "
                 f"WHERE {conjunction};"
             )
         
@@ -160,9 +205,8 @@ def dc_to_sql(dc_json_string: str, table_name: str) -> str:
             return visited_children[1]
 
     try:
-        grammar = Grammar(dc_grammar)
-        parse_tree = grammar.parse(dc_json_string)
-        visitor = DcToSqlVisitor(table_name)
+        parse_tree = dc_grammar().parse(dc_json_string)
+        visitor = DcToSqlVisitor(table_name, table_names)
         sql_query = visitor.visit(parse_tree)
 
         return sql_query
@@ -174,64 +218,302 @@ def dc_to_sql(dc_json_string: str, table_name: str) -> str:
 # funções para execução de queries
 ###########################################################
 
-def run_query_in_thread(main_connection, dc_json, csv_file, thread_n, results_list, print_violations):
+def scanned_rows(connection, table_stats, csv_file, table_names=None) -> int:
+    """
+    Linhas lidas pelo self-join quando o profiler está desligado: cada lado
+    lê a sua tabela uma vez. As contagens vêm do table_stats, uma por tabela.
+    """
+    tables = table_names.values() if table_names else (csv_file, csv_file)
+    return sum(table_stats.get(connection, table, [])[0] for table in tables)
+
+
+def run_query_in_thread(main_connection, dc_json, csv_file, thread_n, results_list, print_violations,
+                        dc_metrics=False, profile_dir=None, result_log=None, table_stats=None):
     """
     Executa uma única query de DC em uma thread
     """
     cursor = main_connection.cursor()
+    # o profiler é do cursor, então as métricas são só desta DC; o ResultLog
+    # sozinho não liga o profiling, que grava um profile JSON a cada query
+    profiler = QueryProfiler(cursor) if dc_metrics or profile_dir else None
+    measured = profiler or result_log
     
-    sql_query = dc_to_sql(dc_json, csv_file)
-    if sql_query:
-        num_violations = 0
-
-        if print_violations:
-            # for row in cursor.execute(sql_query).fetchall():
-            # for row in cursor.execute(sql_query):
-            cursor.execute(sql_query)
-            while True:
-                linha = cursor.fetchone() # Pega apenas UMA linha
-                if linha is None: # Acabaram as linhas
-                    break
-
-                print(f"  [VIOLATION DC #{thread_n+1}] {linha}")
-                num_violations += 1
-        
-        else:
-            count_query = f"SELECT COUNT(*) FROM ({sql_query.replace(';', '')}) as violations_subquery;"
-            num_violations = cursor.execute(count_query).fetchone()[0]
+    parse_start = time.perf_counter()
+    # a contagem sai do template da forma da DC; o SQL com as linhas só com --print
+    translated = dc_to_sql(dc_json, csv_file) if print_violations else parse_dc(dc_json)
+    parse_s = time.perf_counter() - parse_start
+
+    if translated is not None:
+        profile_file = dc_profile_path(profile_dir, thread_n) if profile_dir else None
+        with measure_dc(profiler, profile_file) if measured else nullcontext() as metrics:
+            num_violations = 0
+
+            if print_violations:
+                # pares em blocos de tuplas (fetchmany) em vez de um fetchone por par
+                for chunk in violation_chunks(cursor, translated, fmt="rows"):
+                    for linha in chunk:
+                        print(f"  [VIOLATION DC #{thread_n+1}] {linha}")
+                    num_violations += len(chunk)
+            
+            else:
+                num_violations = count_violations(cursor, translated, source_sql(csv_file))
         
+        if dc_metrics:
+            print_dc_metrics(thread_n, metrics)
+
         results_list.append((thread_n, num_violations))
+        if result_log:
+            metrics["parse_s"] = parse_s
+            if profiler is None:
+                from dc_strategy import TableStats
 
+                metrics["rows_scanned"] = scanned_rows(cursor, table_stats or TableStats(), csv_file)
+            result_log.write(thread_n, SQL_JOIN, num_violations, metrics)
+
+    if profiler:
+        profiler.close()
+
+
+def run_batch(connection, run_strategy, strategy, planned_dcs, csv_file, results_list, result_log, *args):
+    """
+    Executa um lote de DCs de uma estratégia do planejador (run_group_count,
+    run_fd_histogram, run_sort_rank, run_cached, run_evidence); com result_log, as DCs do
+    lote são registradas quando ele termina, dividindo o custo medido
+    """
+    if result_log is None:
+        run_strategy(connection, planned_dcs, csv_file, results_list, *args)
+        return
+
+    batch_results = []
+    with measure_usage() as usage:
+        run_strategy(connection, planned_dcs, csv_file, batch_results, *args)
+
+    results_list.extend(batch_results)
+    result_log.write_batch(batch_results, strategy, usage)
+
+
+def run_strategy_in_thread(main_connection, run_strategy, strategy, planned_dcs, csv_file, results_list, result_log,
+                           *args):
+    """
+    Executa em uma thread um lote de DCs de uma estratégia do planejador
+    """
+    cursor = main_connection.cursor()
+    run_batch(cursor, run_strategy, strategy, planned_dcs, csv_file, results_list, result_log, *args)
+
+
+def count_dc(connection, dc_json, predicates, strategy, csv_file, table_names=None, index_store=None):
+    """
+    Conta as violações de uma única DC com a estratégia escolhida para ela
+    """
+    if strategy == GROUP_COUNT:
+        return count_equality_dcs(connection, csv_file, [predicates])[0]
+
+    if strategy == FD_HISTOGRAM:
+        return count_fd_dc(connection, csv_file, predicates)
+
+    from dc_index import count_order_dc, SORT_RANK
+
+    if strategy == SORT_RANK:
+        return count_order_dc(connection, csv_file, predicates, index_store)
+
+    if table_names is not None:
+        sql_query = dc_to_sql(dc_json, csv_file, table_names)
+        count_query = f"SELECT COUNT(*) FROM ({sql_query.replace(';', '')}) as violations_subquery;"
+        return connection.execute(count_query).fetchone()[0]
+
+    return count_violations(connection, parse_dc(dc_json), source_sql(csv_file))
+
+
+def coerce_table(connection, csv_file, indexed_dcs, results_list, result_log=None):
+    """
+    Resolve os tipos dos predicados entre colunas antes da execução: as DCs
+    rejeitadas são reportadas já e entram nos resultados sem contagem
+    """
+    csv_file, indexed_dcs, rejected = coerce_dcs(connection, csv_file, indexed_dcs)
+    print_rejected(rejected)
+    results_list.extend((i, None) for i, _ in rejected)
+
+    if result_log:
+        for i, reason in rejected:
+            result_log.write(i, "rejected", None, {}, reason=reason)
+
+    return csv_file, indexed_dcs
+
+
+def run_sequential(thread_count, indexed_dcs, csv_file, results_list, print_violations, strategy="auto", print_groups=False,
+                   cache_budget_mb=0, evidence_sample=None, dc_metrics=False, profile_dir=None, result_log=None,
+                   index_store=None, log_strategy=False):
+    import duckdb
 
-def run_sequential(thread_count, dc_json, csv_file, results_list, print_violations):    
     con = duckdb.connect(config={'threads': thread_count})
+
+    run_plan(con, indexed_dcs, csv_file, results_list, print_violations, strategy, print_groups, cache_budget_mb,
+             evidence_sample=evidence_sample, dc_metrics=dc_metrics, profile_dir=profile_dir, result_log=result_log,
+             index_store=index_store, log_strategy=log_strategy)
+
+    con.close()
+
+
+def run_plan(con, indexed_dcs, csv_file, results_list, print_violations, strategy="auto", print_groups=False,
+             cache_budget_mb=0, table_names=None, evidence_sample=None, dc_metrics=False, profile_dir=None,
+             result_log=None, index_store=None, log_strategy=False, table_stats=None):
+    """
+    Executa em sequência, na conexão dada, as DCs de uma tabela: primeiro
+    as estratégias do planejador, escolhidas por DC pelas estatísticas das
+    colunas (com log_strategy, o motivo de cada escolha é impresso; com
+    table_stats, as estatísticas já lidas são reaproveitadas), depois o
+    self-join para as que sobrarem.
+    Com table_names (DCs entre tabelas) só o self-join é usado.
+    Com dc_metrics, cada DC do self-join imprime as suas métricas; com
+    profile_dir, grava o profile JSON do DuckDB de cada uma nesse diretório.
+    Com result_log, cada DC é registrada assim que termina. Os índices de
+    colunas das DCs de ordem ficam em index_store (um novo, só em memória,
+    se não for dado).
+    """
+    from dc_evidence import run_evidence, EVIDENCE
+    from dc_index import IndexStore, run_sort_rank, SORT_RANK
+    from dc_strategy import plan_strategies, print_choices
+
+    if result_log:
+        result_log.register(indexed_dcs, csv_file, table_names)
+
+    if table_names is not None:
+        strategy = "sql"
+    else:
+        source = csv_file
+        csv_file, indexed_dcs = coerce_table(con, csv_file, indexed_dcs, results_list, result_log)
+        if index_store is None:
+            index_store = IndexStore()
+        index_store.bind(csv_file, source)
+
+    # todas as DCs checadas contra um único conjunto de evidências
+    if strategy == "evidence" and not print_violations:
+        run_batch(con, run_evidence, EVIDENCE, indexed_dcs, csv_file, results_list, result_log, evidence_sample,
+                  log_strategy)
+        return
+
+    # --print precisa dos pares, então só o self-join serve
+    if strategy == "auto" and not print_violations:
+        plan, choices = plan_strategies(con, csv_file, indexed_dcs, table_stats)
+        print_choices(choices, log_strategy)
+
+        run_batch(con, run_group_count, GROUP_COUNT, plan[GROUP_COUNT], csv_file, results_list, result_log)
+        for fd_dc in plan[FD_HISTOGRAM]:
+            run_batch(con, run_fd_histogram, FD_HISTOGRAM, [fd_dc], csv_file, results_list, result_log, print_groups)
+        # DCs de ordem contadas pelos postos do índice, sem self-join
+        for order_dc in plan[SORT_RANK]:
+            run_batch(con, run_sort_rank, SORT_RANK, [order_dc], csv_file, results_list, result_log, index_store)
+        indexed_dcs = plan[SQL_JOIN]
+
+        # DCs que compartilham predicados refinam os pares umas das outras
+        if cache_budget_mb > 0:
+            shared_dcs, indexed_dcs = split_shared(indexed_dcs)
+            run_batch(con, run_cached, PAIR_CACHE, shared_dcs, csv_file, results_list, result_log, cache_budget_mb,
+                      log_strategy)
     
-    for i, dc_json in enumerate(dc_json):
-        sql_query = dc_to_sql(dc_json, csv_file)
+    profiler = QueryProfiler(con) if (dc_metrics or profile_dir) and indexed_dcs else None
+    measured = profiler or result_log
+    if result_log and profiler is None and table_stats is None:
+        from dc_strategy import TableStats
 
-        if sql_query:
-            num_violations = 0
+        table_stats = TableStats()
 
-            if print_violations:
-                # for row in cursor.execute(sql_query).fetchall():
-                # for row in cursor.execute(sql_query):
-                con.execute(sql_query)
-                while True:
-                    linha = con.fetchone() # Pega apenas UMA linha
-                    if linha is None: # Acabaram as linhas
-                        break
+    # contagens de uma tabela saem do template da forma da DC, sem passar
+    # pelo parsimonious; --print e DCs entre tabelas usam o dc_to_sql
+    templated = not print_violations and table_names is None
 
-                    print(f"  [VIOLATION DC #{i+1}] {linha}")
-                    num_violations += 1
+    for i, dc_json in indexed_dcs:
+        parse_start = time.perf_counter()
+        if templated:
+            translated = parse_dc(dc_json)
+        else:
+            translated = dc_to_sql(dc_json, csv_file, table_names)
+        parse_s = time.perf_counter() - parse_start
 
-            else:
-                count_query = f"SELECT COUNT(*) FROM ({sql_query.replace(';', '')}) as violations_subquery;"
-                num_violations = con.execute(count_query).fetchone()[0]
+        if translated is not None:
+            profile_file = dc_profile_path(profile_dir, i) if profile_dir else None
+            with measure_dc(profiler, profile_file) if measured else nullcontext() as metrics:
+                num_violations = 0
+
+                if print_violations:
+                    # pares em blocos de tuplas (fetchmany) em vez de um fetchone por par
+                    for chunk in violation_chunks(con, translated, fmt="rows"):
+                        for linha in chunk:
+                            print(f"  [VIOLATION DC #{i+1}] {linha}")
+                        num_violations += len(chunk)
+
+                elif templated:
+                    num_violations = count_violations(con, translated, source_sql(csv_file))
+
+                else:
+                    count_query = f"SELECT COUNT(*) FROM ({translated.replace(';', '')}) as violations_subquery;"
+                    # fetchall esgota o resultado, e só então o DuckDB grava o profile da query
+                    num_violations = con.execute(count_query).fetchall()[0][0]
+
+            if dc_metrics:
+                print_dc_metrics(i, metrics)
 
             results_list.append((i, num_violations))
+            if result_log:
+                metrics["parse_s"] = parse_s
+                if profiler is None:
+                    metrics["rows_scanned"] = scanned_rows(con, table_stats, csv_file, table_names)
+                result_log.write(i, SQL_JOIN, num_violations, metrics)
+
+    if profiler:
+        profiler.close()
+
+
+def run_table_group(main_connection, registry, tables, indexed_dcs, results_list, print_violations, strategy,
+                    print_groups, cache_budget_mb, evidence_sample=None, dc_metrics=False, profile_dir=None,
+                    result_log=None, index_store=None, log_strategy=False, errors_list=None):
+    """
+    Carrega as tabelas de um grupo (uma só vez por execução) e executa as
+    DCs do grupo em uma thread com cursor próprio. Se a carga ou a execução
+    falha, as DCs do grupo ainda sem resultado vão para errors_list como
+    (i, exceção).
+    """
+    if result_log:
+        # para os registros de erro; o run_plan registra de novo com a tabela carregada
+        result_log.register(indexed_dcs, tables[0] if tables else "", tables if len(tables) > 1 else None)
+
+    if not tables:
+        # DCs sem predicados não referenciam tabela: como no dc_to_sql (WHERE 1=0), não têm violações
+        for i, _ in indexed_dcs:
+            results_list.append((i, 0))
+            if result_log:
+                result_log.write(i, SQL_JOIN, 0, {})
+        return
+
+    cursor = main_connection.cursor()
+    try:
+        table_names = registry.load_all(cursor, tables)
+
+        if len(tables) == 1:
+            # o índice da tabela carregada é persistido pelo CSV de origem
+            if index_store is not None:
+                index_store.bind(table_names[tables[0]], registry.path(tables[0]))
+
+            run_plan(cursor, indexed_dcs, table_names[tables[0]], results_list, print_violations, strategy,
+                     print_groups, cache_budget_mb, evidence_sample=evidence_sample, dc_metrics=dc_metrics,
+                     profile_dir=profile_dir, result_log=result_log, index_store=index_store,
+                     log_strategy=log_strategy)
+        else:
+            run_plan(cursor, indexed_dcs, table_names[tables[0]], results_list, print_violations,
+                     table_names=table_names, dc_metrics=dc_metrics, profile_dir=profile_dir, result_log=result_log)
+    except Exception as e:
+        if errors_list is None:
+            raise
+
+        finished = {i for i, _ in results_list}
+        for i, _ in indexed_dcs:
+            if i not in finished:
+                errors_list.append((i, e))
+                if result_log:
+                    result_log.write(i, "error", None, {}, error=str(e))
+    finally:
+        cursor.close()
 
-    con.close()
-    
 
 ###################################################
 # Main
@@ -239,25 +521,262 @@ def run_sequential(thread_count, dc_json, csv_file, results_list, print_violatio
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Run Denial Constraints on a CSV using DuckDB")
-    parser.add_argument("--csv-file", type=str, default="flights.csv", help="Caminho para o CSV com os dados")
+    parser.add_argument("--csv-file", type=str, default=None,
+                        help="Caminho para o CSV com os dados; sem ele (o padrão, que antes era flights.csv) cada DC "
+                             "usa a tabela do seu tableIdentifier")
+    parser.add_argument("--data-dir", type=str, default=".", help="Diretório onde procurar os CSVs dos tableIdentifiers")
+    parser.add_argument("--dataset", action="append", default=[], metavar="TABELA=CAMINHO",
+                        help="Mapeia um tableIdentifier para um CSV (pode repetir)")
     parser.add_argument("--results-file", type=str, default="results.txt", help="Caminho para o JSON com DCs")
-    parser.add_argument("--parallel", action="store_true", help="Executa as queries em paralelo")
+    parser.add_argument("--parallel", action="store_true", help="Executa as queries em paralelo (com --csv-file)")
     parser.add_argument("--print", action="store_true", help="Imprime todas as linhas que violam as DCs")
+    parser.add_argument("--strategy", choices=["auto", "sql", "evidence"], default="auto",
+                        help="auto escolhe por DC, pelas estatísticas das colunas, entre GROUP BY (só igualdades), "
+                             "histograma (tipo FD), postos ordenados (uma ou duas desigualdades de ordem) e o "
+                             "self-join; sql força o self-join em todas; evidence checa todas contra um conjunto de evidências")
+    parser.add_argument("--evidence-sample", type=int, default=None,
+                        help="Com --strategy evidence, sorteia esse número de pares e estima as violações")
+    parser.add_argument("--print-groups", action="store_true",
+                        help="Imprime os grupos que violam DCs do tipo FD em vez dos pares")
+    parser.add_argument("--cache-budget-mb", type=int, default=512,
+                        help="Memória máxima para o cache de pares entre DCs que compartilham predicados (0 desativa)")
+    parser.add_argument("--drop-implied", action="store_true",
+                        help="Não executa DCs implicadas por outra DC do arquivo (predicados são superconjunto)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Lê e executa as DCs em fluxo, sem carregar o arquivo inteiro (sem deduplicação)")
+    parser.add_argument("--stream-workers", type=int, default=1, help="Threads que executam DCs no modo --stream")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="DCs lidas à frente da execução no modo --stream antes de a leitura pausar")
+    parser.add_argument("--metrics", choices=["rusage", "poll"], default="rusage",
+                        help="rusage mede CPU e memória com getrusage/cgroup; poll amostra o RSS a cada 10 ms")
+    parser.add_argument("--dc-metrics", action="store_true",
+                        help="Imprime CPU, pico de buffer e linhas lidas de cada DC executada com self-join")
+    parser.add_argument("--profile", type=str, default=None, metavar="DIR",
+                        help="Grava o profile JSON do DuckDB de cada DC executada com self-join em DIR, "
+                             "com um resumo das DCs e operadores mais caros")
+    parser.add_argument("--jsonl", type=str, default=None, metavar="ARQUIVO",
+                        help="Grava um registro JSON por DC (forma canônica, hash do SQL, estratégia, violações, "
+                             "tempo, CPU e memória) assim que ela termina; - para o stdout, com o relatório "
+                             "passando para o stderr")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Expõe contadores e histogramas da checagem em http://127.0.0.1:PORTA/metrics "
+                             "(formato do Prometheus) durante a execução")
+    parser.add_argument("--metrics-textfile", type=str, default=None, metavar="ARQUIVO",
+                        help="Grava as mesmas métricas no fim da execução, para o textfile collector do node_exporter")
+    parser.add_argument("--index-dir", type=str, default=None, metavar="DIR",
+                        help="Grava em DIR os índices ordenados das colunas (por CSV de origem) e os reutiliza nas "
+                             "próximas execuções sobre o mesmo arquivo")
+    parser.add_argument("--log-strategy", action="store_true",
+                        help="Imprime a estratégia escolhida para cada DC com a mistura de predicados e os custos "
+                             "estimados, o total por estratégia e os resumos do cache de pares, do conjunto de "
+                             "evidências, dos templates de contagem e dos índices de colunas")
+    parser.add_argument("--sql-only", action="store_true",
+                        help="Só traduz as DCs e imprime o SQL do self-join de cada uma, sem executar nada")
+    parser.add_argument("--explain", action="store_true",
+                        help="Mostra, sem executar as DCs, a estratégia, o SQL, o EXPLAIN do DuckDB, os pares e o custo "
+                             "estimados de cada uma")
+    parser.add_argument("--explain-top", type=int, default=5,
+                        help="Com --explain, quantas DCs de maior custo estimado listar no fim")
     args = parser.parse_args()
 
-    # le o json de cada dc
-    with open(args.results_file, 'r', encoding='utf-8') as f:
-        json_objects = [line.strip() for line in f if line.strip()]
+    if args.jsonl == "-":
+        # o stdout fica só com os registros JSON: o relatório vai para o stderr
+        args.jsonl = sys.stdout
+        sys.stdout = sys.stderr
+
+    if args.parallel and args.csv_file is None:
+        # sem --csv-file os grupos de tabelas já rodam em threads e --parallel seria ignorado
+        parser.error("--parallel precisa de --csv-file")
+    if args.stream and args.print:
+        parser.error("--stream não suporta --print")
+    if args.stream and args.strategy == "evidence":
+        # as evidências são calculadas uma vez para o lote inteiro de DCs
+        parser.error("--stream não suporta --strategy evidence")
+    if args.stream and args.profile:
+        parser.error("--stream não suporta --profile")
+    if args.stream and args.sql_only:
+        parser.error("--stream não suporta --sql-only")
+    if args.stream and args.explain:
+        parser.error("--stream não suporta --explain")
+    if args.sql_only and args.explain:
+        parser.error("use --sql-only ou --explain, não os dois")
 
-    process = psutil.Process(os.getpid())
+    try:
+        registry = DatasetRegistry(args.data_dir, [parse_dataset_arg(d) for d in args.dataset])
+    except ValueError as e:
+        parser.error(str(e))
 
     results = [] # Lista para coletar os resultados dos threads
+    errors = [] # (i, exceção) das DCs que falharam
+    duplicates, implied = {}, {}
+
+    if not args.stream:
+        # le o json de cada dc
+        json_objects = [dc_json for _, dc_json in read_dcs(args.results_file)]
+
+        # remove DCs logicamente idênticas (e implicadas, com --drop-implied)
+        indexed_dcs, duplicates, implied = normalize_dcs(list(enumerate(json_objects)), args.drop_implied)
+        print_normalization_report(len(json_objects), duplicates, implied)
+
+    if args.sql_only:
+        # só a tradução, sem abrir o DuckDB: o SQL que o self-join de cada DC executaria
+        for i, dc_json in indexed_dcs:
+            tables = dc_tables(dc_json)
+            paths = {table_id: registry.path(table_id) for table_id in tables}
+            table_names = paths if len(tables) > 1 and not args.csv_file else None
+            print(f"DC #{i+1}: {dc_to_sql(dc_json, args.csv_file or paths[tables[0]], table_names)}")
+        sys.exit(0)
+
+    import duckdb
+    from dc_evidence import run_evidence, EVIDENCE
+    from dc_index import IndexStore, run_sort_rank, SORT_RANK
+    from dc_strategy import TableStats, plan_strategies, choose, print_choices
+
+    if args.explain:
+        from dc_explain import explain_table, print_explanations
+
+        # as mesmas escolhas da execução; os dados só são lidos para as estatísticas das colunas
+        con = duckdb.connect()
+        explain_stats = TableStats()
+        strategy = "sql" if args.print else args.strategy
+
+        if args.csv_file:
+            explained = explain_table(con, indexed_dcs, args.csv_file, dc_to_sql, strategy, args.cache_budget_mb,
+                                      stats=explain_stats)
+        else:
+            explained = []
+            for tables, table_dcs in group_by_table(indexed_dcs).items():
+                paths = {table_id: registry.path(table_id) for table_id in tables}
+                explained += explain_table(con, table_dcs, paths[tables[0]], dc_to_sql, strategy,
+                                           args.cache_budget_mb, paths if len(tables) > 1 else None, explain_stats)
+
+        con.close()
+        print_explanations(explained, duplicates, implied, args.explain_top)
+        sys.exit(0)
+
+    if args.profile:
+        prepare_profile_dir(args.profile)
+
+    exporter = None
+    if args.metrics_port is not None or args.metrics_textfile:
+        from dc_prometheus import DcMetrics, serve_metrics
+
+        exporter = DcMetrics()
+        if args.metrics_port is not None:
+            metrics_server = serve_metrics(exporter, args.metrics_port)
+
+    result_log = ResultLog(args.jsonl, dc_to_sql, exporter) if args.jsonl or exporter else None
+    if result_log:
+        result_log.keep(set(duplicates.values()) | set(implied.values()))
+
+    # índices das colunas compartilhados por todas as DCs e threads
+    index_store = IndexStore(args.index_dir)
+
+    if args.stream:
+        print("Executando em fluxo")
+
+        monitor = make_monitor(args.metrics)
+
+        main_con = duckdb.connect()
+        stream_totals = {"dcs": 0, "violations": 0}
+        totals_lock = Lock()
+        stream_stats = TableStats()
+
+        def check_dc(cursor, i, dc_json, predicates, strategy):
+            if args.strategy == "sql":
+                strategy = SQL_JOIN
+
+            if args.csv_file:
+                table_name, table_names = args.csv_file, None
+            else:
+                # sem --csv-file cada tabela é carregada na primeira DC que a usa
+                tables = dc_tables(dc_json)
+                loaded = registry.load_all(cursor, tables)
+                table_name, table_names = loaded[tables[0]], None
+                if len(tables) > 1:
+                    strategy, table_names = SQL_JOIN, loaded
+                else:
+                    index_store.bind(table_name, registry.path(tables[0]))
+
+            if args.strategy == "auto" and table_names is None:
+                # as estatísticas de cada tabela são lidas uma vez e valem para as DCs seguintes
+                columns = sorted({c for p in predicates for c in (p[0], p[3])})
+                choice = choose(predicates, *stream_stats.get(cursor, table_name, columns))
+                strategy = choice.strategy
+                if args.log_strategy:
+                    print(f"Estratégia da DC #{i+1}: {strategy} ({choice.reason})", flush=True)
+
+            if result_log is None:
+                return count_dc(cursor, dc_json, predicates, strategy, table_name, table_names, index_store)
+
+            result_log.register([(i, dc_json)], table_name, table_names)
+            with measure_usage() as usage:
+                num_violations = count_dc(cursor, dc_json, predicates, strategy, table_name, table_names,
+                                          index_store)
+            result_log.write(i, strategy, num_violations, usage)
+
+            return num_violations
+
+        def on_result(i, num_violations):
+            # imprime assim que termina em vez de acumular em results; o
+            # lock evita que linhas de workers diferentes se misturem
+            with totals_lock:
+                print(f"DC #{i+1}: {num_violations} violações", flush=True)
+                stream_totals["dcs"] += 1
+                stream_totals["violations"] += num_violations
 
-    if args.parallel:
+        monitor.start()
+        start_time = time.perf_counter()
+
+        parsed_dcs = parse_dcs(read_dcs(args.results_file))
+        try:
+            run_streaming(main_con, parsed_dcs, check_dc, on_result, args.stream_workers, args.queue_size)
+        except Exception as e:
+            # as contagens já impressas são parciais: a execução falha
+            main_con.close()
+            print(f"Erro ao ler as DCs de {args.results_file}: {e!r}", file=sys.stderr)
+            sys.exit(1)
+
+        end_time = time.perf_counter()
+        total_cpu, peak_mem = monitor.stop()
+
+        main_con.close()
+
+        print(f"DCs verificadas: {stream_totals['dcs']}, violações: {stream_totals['violations']}")
+
+    elif args.csv_file is None:
+        print("Executando por tabela")
+
+        monitor = make_monitor(args.metrics)
+
+        main_con = duckdb.connect()
+
+        threads = []
+
+        monitor.start()
+        start_time = time.perf_counter()
+
+        # uma thread por grupo de tabelas; cada tabela é carregada uma vez
+        for tables, table_dcs in group_by_table(indexed_dcs).items():
+            thread = Thread(target=run_table_group,
+                            args=(main_con, registry, tables, table_dcs, results, args.print, args.strategy,
+                                  args.print_groups, args.cache_budget_mb, args.evidence_sample, args.dc_metrics,
+                                  args.profile, result_log, index_store, args.log_strategy, errors))
+            threads.append(thread)
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        end_time = time.perf_counter()
+        total_cpu, peak_mem = monitor.stop()
+
+        main_con.close()
+
+    elif args.parallel:
         print("Executando em paralelo")
 
-        pid = os.getpid()
-        monitor = ResourceMonitor(pid)
+        monitor = make_monitor(args.metrics)
 
         main_con = duckdb.connect()
         # main_con = duckdb.connect(config={'memory_limit': '3GB'})
@@ -268,10 +787,50 @@ if __name__ == '__main__':
         monitor.start()
         start_time = time.perf_counter()
 
+        if result_log:
+            result_log.register(indexed_dcs, args.csv_file)
+
+        csv_file, indexed_dcs = coerce_table(main_con, args.csv_file, indexed_dcs, results, result_log)
+        index_store.bind(csv_file, args.csv_file)
+        # estatísticas da tabela lidas uma vez para o planejador e as threads
+        parallel_stats = TableStats()
+
+        # DCs só de igualdades dividem uma única thread com um GROUP BY;
+        # cada DC do tipo FD ganha a sua thread com o histograma
+        if args.strategy == "auto" and not args.print:
+            plan, choices = plan_strategies(main_con, csv_file, indexed_dcs, parallel_stats)
+            print_choices(choices, args.log_strategy)
+
+            batches = [(run_group_count, GROUP_COUNT, plan[GROUP_COUNT], ())] if plan[GROUP_COUNT] else []
+            batches += [(run_fd_histogram, FD_HISTOGRAM, [fd_dc], (args.print_groups,)) for fd_dc in plan[FD_HISTOGRAM]]
+            # cada DC de ordem na sua thread; o índice de cada coluna é construído uma vez
+            batches += [(run_sort_rank, SORT_RANK, [order_dc], (index_store,)) for order_dc in plan[SORT_RANK]]
+            indexed_dcs = plan[SQL_JOIN]
+
+            # as DCs que usam o cache de pares ficam juntas na mesma thread
+            if args.cache_budget_mb > 0:
+                shared_dcs, indexed_dcs = split_shared(indexed_dcs)
+                if shared_dcs:
+                    batches.append((run_cached, PAIR_CACHE, shared_dcs, (args.cache_budget_mb, args.log_strategy)))
+
+        # um único conjunto de evidências para todas as DCs
+        if args.strategy == "evidence" and not args.print:
+            batches = [(run_evidence, EVIDENCE, indexed_dcs, (args.evidence_sample, args.log_strategy))]
+            indexed_dcs = []
+
+        if args.strategy != "sql" and not args.print:
+            for run_strategy, strategy, planned_dcs, extra_args in batches:
+                thread = Thread(target=run_strategy_in_thread,
+                                args=(main_con, run_strategy, strategy, planned_dcs, csv_file, results, result_log,
+                                      *extra_args))
+                threads.append(thread)
+                thread.start()
+
         # uma thread para cada query de DC
-        for i, dc_json in enumerate(json_objects):
+        for i, dc_json in indexed_dcs:
             thread = Thread(target=run_query_in_thread, 
-                            args=(main_con, dc_json, args.csv_file, i, results, args.print))
+                            args=(main_con, dc_json, csv_file, i, results, args.print, args.dc_metrics, args.profile,
+                                  result_log, parallel_stats))
             threads.append(thread)
             thread.start()
 
@@ -289,22 +848,61 @@ if __name__ == '__main__':
         
         thread_count = 4 # os.cpu_count()
 
-        pid = os.getpid()
-        monitor = ResourceMonitor(pid)
+        monitor = make_monitor(args.metrics)
 
         monitor.start()
         start_time = time.perf_counter()
 
-        run_sequential(thread_count, json_objects, args.csv_file, results, args.print)
+        run_sequential(thread_count, indexed_dcs, args.csv_file, results, args.print, args.strategy, args.print_groups,
+                       args.cache_budget_mb, args.evidence_sample, args.dc_metrics, args.profile, result_log,
+                       index_store, args.log_strategy)
 
         end_time = time.perf_counter()
         total_cpu, peak_mem = monitor.stop()
 
+    # DCs duplicadas têm as mesmas violações da DC que as representa
+    counts = dict(results)
+    results += [(i, counts[j]) for i, j in duplicates.items() if j in counts]
+
+    if result_log:
+        for i, j in sorted(duplicates.items()):
+            if j in counts:
+                result_log.write(i, "duplicate", counts[j], {}, same_as=j, duplicate_of=j + 1)
+        for i, j in sorted(implied.items()):
+            result_log.write(i, "implied", None, {}, same_as=j, implied_by=j + 1)
+        result_log.close()
+
+    if args.metrics_textfile:
+        exporter.write_textfile(args.metrics_textfile)
+    if args.metrics_port is not None:
+        metrics_server.shutdown()
+
     print("\n-------------------------")
     for i, num_violations in sorted(results):
-        print(f"DC #{i+1}: {num_violations} violações")
+        if num_violations is None:
+            print(f"DC #{i+1}: rejeitada, tipos incompatíveis")
+        else:
+            print(f"DC #{i+1}: {num_violations} violações")
+
+    for i, j in sorted(implied.items()):
+        print(f"DC #{i+1}: implicada pela DC #{j+1}, não executada")
+
+    for i, e in sorted(errors, key=lambda error: error[0]):
+        print(f"DC #{i+1}: erro: {e}")
 
     print("\n-------------------------")
     print(f"Tempo total: {end_time - start_time:.4f} segundos")
     print(f"Pico de Memória (MB): {peak_mem:.2f}")
     print(f"Uso Médio de CPU (%): {total_cpu:.2f}")
+    if isinstance(monitor, ResourceMeter):
+        monitor.print_details()
+    if args.log_strategy:
+        print_plan_cache_stats()
+        index_store.print_stats()
+
+    if args.profile:
+        write_profile_summary(args.profile)
+
+    # DCs que falharam não têm contagem: a execução falha
+    if errors:
+        sys.exit(1)
@@ -0,0 +1,83 @@
+from functools import lru_cache
+
+from dc_ir import dc_from_json, quote_column
+
+
+###########################################################
+# forma das DCs
+###########################################################
+
+def dc_shape(dc) -> tuple:
+    """
+    Separa a DC da IR em (forma, colunas). colunas são os nomes na ordem
+    em que aparecem e a forma troca cada nome pela sua posição nessa
+    lista: ¬(t0.a = t1.a ∧ t0.b < t1.b) e ¬(t0.x = t1.x ∧ t0.y < t1.y)
+    têm a mesma forma.
+    """
+    slots = {}
+    shape = []
+    for p in dc.predicates:
+        slot1 = slots.setdefault(p.col1, len(slots))
+        slot2 = slots.setdefault(p.col2, len(slots))
+        shape.append((slot1, p.idx1, p.op, slot2, p.idx2))
+
+    return tuple(shape), tuple(dc.predicates[0].pool.column(column_id) for column_id in slots)
+
+
+@lru_cache(maxsize=4096)
+def count_template(shape) -> str:
+    """
+    COUNT(*) do self-join de uma forma, com {source} no lugar da tabela e
+    {c0}, {c1}, ... no lugar das colunas. Montado uma vez por forma.
+    """
+    if not shape:
+        return "SELECT COUNT(*) FROM {source} WHERE 1=0"
+
+    tuple_var = {0: "t1", 1: "t2"}
+    conjunction = " AND ".join(
+        f"{tuple_var[idx1]}.{{c{slot1}}} {op.sql} {tuple_var[idx2]}.{{c{slot2}}}"
+        for slot1, idx1, op, slot2, idx2 in shape
+    )
+
+    return f"SELECT COUNT(*) FROM {{source}} t1, {{source}} t2 WHERE {conjunction}"
+
+
+def _fill(shape, columns, source: str) -> str:
+    return count_template(shape).format(source=source, **{f"c{k}": quote_column(c) for k, c in enumerate(columns)})
+
+
+def count_sql(dc, source: str) -> str:
+    """Consulta que conta as violações da DC; source é a expressão do FROM."""
+    shape, columns = dc_shape(dc)
+    return _fill(shape, columns, source)
+
+
+def parse_dc(dc_json):
+    """DC da IR a partir do JSON, ou None (com o erro impresso) como o dc_to_sql."""
+    try:
+        return dc_from_json(dc_json)
+    except (ValueError, KeyError, TypeError) as e:
+        print(e)
+        return None
+
+
+###########################################################
+# contagem
+###########################################################
+
+def count_violations(connection, dc, source: str) -> int:
+    """
+    Conta as violações da DC da IR com o template da sua forma.
+
+    PREPARE/EXECUTE não é usado: sobre read_csv_auto o EXECUTE volta a
+    inspecionar o CSV a cada execução e sai mais caro que o SQL direto, e
+    no DuckDB 1.4 a reexecução de um plano preparado com IEJoin (DCs com
+    duas desigualdades) falha com erro interno.
+    """
+    # fetchall esgota o resultado, e só então o DuckDB grava o profile da query
+    return connection.execute(count_sql(dc, source)).fetchall()[0][0]
+
+
+def print_plan_cache_stats():
+    info = count_template.cache_info()
+    print(f"Templates de contagem: {info.currsize} formas de DC, {info.hits} reutilizações")
@@ -0,0 +1,290 @@
+from dc_ir import Op, dc_from_json, quote_column
+
+
+###########################################################
+# classificação das DCs
+###########################################################
+
+# estratégias de avaliação
+GROUP_COUNT = "group_count"
+FD_HISTOGRAM = "fd_histogram"
+SQL_JOIN = "sql_join"
+
+
+
+def dc_to_predicates(dc_json_string: str) -> list:
+    """
+    Extrai os predicados de uma DC em JSON como objetos Predicate da IR,
+    que desempacotam como (coluna1, indice1, op, coluna2, indice2).
+    """
+    return list(dc_from_json(dc_json_string).predicates)
+
+
+def dc_tables(dc_json_string: str) -> tuple:
+    """Tabelas (tableIdentifier) referenciadas pelos predicados de uma DC."""
+    return dc_from_json(dc_json_string).tables()
+
+
+def is_equality_only(predicates) -> bool:
+    """
+    Uma DC é só de igualdades quando todos os predicados têm a forma
+    t0.a = t1.a (mesma coluna, tuplas diferentes).
+    """
+    return bool(predicates) and all(
+        op == "EQUAL" and col1 == col2 and idx1 != idx2
+        for col1, idx1, op, col2, idx2 in predicates
+    )
+
+
+def is_fd_style(predicates) -> bool:
+    """
+    Uma DC tem forma de dependência funcional quando é composta de
+    igualdades t0.a = t1.a mais exatamente um t0.b != t1.b na mesma coluna.
+    Sem igualdades ela equivale a checar a tabela inteira como um só grupo.
+    """
+    unequal = [p for p in predicates if p[2] == "UNEQUAL"]
+    equalities = [p for p in predicates if p[2] != "UNEQUAL"]
+
+    if len(unequal) != 1:
+        return False
+
+    col1, idx1, _, col2, idx2 = unequal[0]
+    if col1 != col2 or idx1 == idx2:
+        return False
+
+    return not equalities or is_equality_only(equalities)
+
+
+def choose_strategy(predicates) -> str:
+    if is_equality_only(predicates):
+        return GROUP_COUNT
+
+    if is_fd_style(predicates):
+        return FD_HISTOGRAM
+
+    return SQL_JOIN
+
+
+def equality_columns(predicates) -> tuple:
+    return tuple(sorted({col1 for col1, _, op, _, _ in predicates if op == "EQUAL"}))
+
+
+def unequal_column(predicates) -> str:
+    return next(col1 for col1, _, op, _, _ in predicates if op == "UNEQUAL")
+
+
+def canonical_predicate(predicate) -> tuple:
+    """
+    Escreve o predicado com o menor índice de tupla à esquerda, trocando
+    o operador se preciso: t1.a > t0.b vira t0.b < t1.a.
+    """
+    col1, idx1, op, col2, idx2 = predicate
+
+    if (idx1, col1) > (idx2, col2):
+        return (col2, idx2, Op(op).flipped, col1, idx1)
+
+    return (col1, idx1, op, col2, idx2)
+
+
+def predicate_sql(predicate) -> str:
+    col1, idx1, op, col2, idx2 = predicate
+
+    t_var1 = "t1" if idx1 == 0 else "t2"
+    t_var2 = "t1" if idx2 == 0 else "t2"
+
+    return f"{t_var1}.{quote_column(col1)} {Op(op).sql} {t_var2}.{quote_column(col2)}"
+
+
+###########################################################
+# origem das tabelas
+###########################################################
+
+# tabelas materializadas na conexão (dc_datasets, dc_types); source_sql as
+# resolve antes de olhar o nome
+_loaded_tables = set()
+
+
+def register_table(table_name: str):
+    _loaded_tables.add(table_name)
+
+
+def unregister_table(table_name: str):
+    _loaded_tables.discard(table_name)
+
+
+def source_sql(table_name: str) -> str:
+    """
+    Expressão do FROM para uma tabela. Tabelas registradas (register_table)
+    são usadas pelo nome, tenham ou não '.' no nome; fora delas, nomes com
+    extensão ou caminho são lidos do CSV com read_csv_auto, e os demais são
+    tabelas criadas pelo chamador na conexão.
+    """
+    if table_name in _loaded_tables:
+        return quote_column(table_name)
+
+    if "." in table_name or "/" in table_name or "\\" in table_name:
+        return f"read_csv_auto('{table_name}')"
+
+    return quote_column(table_name)
+
+
+###########################################################
+# estratégia group_count
+###########################################################
+
+def group_count_sql(table_name: str, column_sets) -> tuple:
+    """
+    Monta uma única agregação com GROUPING SETS que conta as violações de
+    todos os conjuntos de colunas de igualdade com um só scan da tabela.
+
+    O self-join de dc_to_sql também pareia cada linha com ela mesma, então
+    para um grupo de tamanho c ele devolve c*(c-1) pares distintos mais os c
+    pares reflexivos, ou seja c*c. A soma aqui usa c*c para manter as
+    contagens idênticas às do SQL.
+
+    Retorna (sql, gids), onde gids[k] é o valor de GROUPING(...) que
+    identifica column_sets[k] no resultado.
+    """
+    all_columns = sorted({c for cols in column_sets for c in cols})
+    quoted = [quote_column(c) for c in all_columns]
+
+    gids = []
+    filters = []
+    for cols in column_sets:
+        # GROUPING() liga o bit de cada coluna que NÃO faz parte do grupo,
+        # sendo a primeira coluna o bit mais significativo
+        gid = sum(
+            1 << (len(all_columns) - 1 - pos)
+            for pos, col in enumerate(all_columns) if col not in cols
+        )
+        gids.append(gid)
+
+        # NULL nunca satisfaz t1.a = t2.a, então esses grupos não contam
+        not_null = " AND ".join(f"{quote_column(c)} IS NOT NULL" for c in cols)
+        filters.append(f"(gid = {gid} AND {not_null})")
+
+    grouping_sets = ", ".join(
+        "(" + ", ".join(quote_column(c) for c in cols) + ")" for cols in column_sets
+    )
+
+    sql = (
+        f"WITH grupos AS ("
+        f"SELECT GROUPING({', '.join(quoted)}) AS gid, {', '.join(quoted)}, COUNT(*) AS cnt "
+        f"FROM {source_sql(table_name)} "
+        f"GROUP BY GROUPING SETS ({grouping_sets})"
+        f") "
+        f"SELECT gid, SUM(CAST(cnt AS HUGEINT) * cnt) AS violations "
+        f"FROM grupos WHERE {' OR '.join(filters)} "
+        f"GROUP BY gid;"
+    )
+
+    return sql, gids
+
+
+def count_equality_dcs(connection, table_name: str, predicate_lists) -> list:
+    """
+    Conta as violações de várias DCs só de igualdades compartilhando um
+    único scan. Retorna as contagens na mesma ordem de predicate_lists.
+    """
+    column_sets = [equality_columns(p) for p in predicate_lists]
+    unique_sets = list(dict.fromkeys(column_sets))
+
+    sql, gids = group_count_sql(table_name, unique_sets)
+    counts_by_gid = dict(connection.execute(sql).fetchall())
+
+    counts_by_set = {
+        cols: int(counts_by_gid.get(gid, 0)) for cols, gid in zip(unique_sets, gids)
+    }
+
+    return [counts_by_set[cols] for cols in column_sets]
+
+
+###########################################################
+# estratégia fd_histogram
+###########################################################
+
+def fd_histogram_sql(table_name: str, predicates, list_groups=False) -> str:
+    """
+    Monta a agregação que avalia uma DC do tipo FD (X iguais, B diferente)
+    a partir do histograma de valores de B em cada grupo de X.
+
+    Em um grupo com g linhas e contagens c_v por valor de B, os pares
+    ordenados com B diferente são g² - Σ c_v², que é exatamente o que o
+    self-join conta (pares reflexivos nunca satisfazem B != B).
+
+    Com list_groups=True devolve um grupo violador por linha em vez do total.
+    """
+    group_cols = [quote_column(c) for c in equality_columns(predicates)]
+    target = quote_column(unequal_column(predicates))
+
+    not_null = " AND ".join(f"{c} IS NOT NULL" for c in group_cols + [target])
+    select_group = "".join(f"{c}, " for c in group_cols)
+    group_by = f" GROUP BY {', '.join(group_cols)}" if group_cols else ""
+
+    grupos = (
+        f"WITH valores AS ("
+        f"SELECT {select_group}{target}, COUNT(*) AS cnt "
+        f"FROM {source_sql(table_name)} "
+        f"WHERE {not_null} "
+        f"GROUP BY {', '.join(group_cols + [target])}"
+        f"), grupos AS ("
+        f"SELECT {select_group}SUM(cnt) AS tamanho, COUNT(*) AS distintos, "
+        f"SUM(CAST(cnt AS HUGEINT) * cnt) AS iguais "
+        f"FROM valores{group_by}"
+        f") "
+    )
+
+    if list_groups:
+        return (
+            grupos +
+            f"SELECT {select_group}tamanho, distintos, "
+            f"CAST(tamanho AS HUGEINT) * tamanho - iguais AS violations "
+            f"FROM grupos WHERE distintos > 1 "
+            f"ORDER BY violations DESC;"
+        )
+
+    return grupos + "SELECT COALESCE(SUM(CAST(tamanho AS HUGEINT) * tamanho - iguais), 0) FROM grupos;"
+
+
+def count_fd_dc(connection, table_name: str, predicates) -> int:
+    return int(connection.execute(fd_histogram_sql(table_name, predicates)).fetchone()[0])
+
+
+def list_fd_groups(connection, table_name: str, predicates) -> list:
+    """
+    Lista os grupos que violam uma DC do tipo FD: os valores das colunas de
+    igualdade, o tamanho do grupo, quantos valores distintos a coluna
+    diferente assume nele e quantos pares violadores ele gera.
+    """
+    return connection.execute(fd_histogram_sql(table_name, predicates, list_groups=True)).fetchall()
+
+
+def run_fd_histogram(connection, fd_dcs, table_name, results_list, print_groups=False):
+    """
+    Conta cada DC do tipo FD pelo histograma e adiciona (i, violações) em
+    results_list. Com print_groups imprime os grupos violadores.
+    """
+    for i, predicates in fd_dcs:
+        if print_groups:
+            groups = list_fd_groups(connection, table_name, predicates)
+            for group in groups:
+                print(f"  [VIOLATION GROUP DC #{i+1}] {group}")
+            num_violations = sum(int(group[-1]) for group in groups)
+        else:
+            num_violations = count_fd_dc(connection, table_name, predicates)
+
+        results_list.append((i, num_violations))
+
+
+def run_group_count(connection, equality_dcs, table_name, results_list):
+    """
+    Conta de uma vez todas as DCs só de igualdades e adiciona (i, violações)
+    em results_list.
+    """
+    if not equality_dcs:
+        return
+
+    counts = count_equality_dcs(connection, table_name, [p for _, p in equality_dcs])
+
+    for (i, _), num_violations in zip(equality_dcs, counts):
+        results_list.append((i, num_violations))
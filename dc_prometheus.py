@@ -0,0 +1,199 @@
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+from dc_planner import SQL_JOIN
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+PARSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+
+# registros de DCs que não foram executadas (ou falharam)
+NOT_CHECKED = {"rejected", "duplicate", "implied", "error"}
+
+
+###########################################################
+# formato texto do Prometheus
+###########################################################
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = Lock()
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, labels)} {_number(value)}" for labels, value in values
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    """Histograma com baldes cumulativos, _sum e _count, como no prometheus_client."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            counts, total = self._values.get(label_values, ([0] * len(self.buckets), 0.0))
+            for b, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[b] += 1
+            self._values[label_values] = (counts, total + value)
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+
+        lines = self.header()
+        for labels, (counts, total) in values:
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, [('le', _number(bound))])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {counts[-1]}")
+        return lines
+
+
+###########################################################
+# métricas da checagem
+###########################################################
+
+class DcMetrics:
+    """
+    Contadores e histogramas da checagem de DCs, alimentados pelos
+    registros do ResultLog (observe) à medida que as DCs terminam.
+
+    - dc_checks_completed_total{strategy}: DCs finalizadas, inclusive as
+      rejeitadas, duplicadas, implicadas e as que falharam;
+    - dc_violations_found_total{strategy}: só das DCs executadas; uma
+      duplicada não soma de novo as violações da DC que a representa;
+    - dc_rows_scanned_total: linhas lidas pelo DuckDB nas DCs com
+      self-join, do profiler ou, sem ele, as linhas das duas tabelas do
+      join (as estratégias em lote não têm o valor por DC);
+    - dc_check_duration_seconds{strategy}: tempo de parede por DC;
+    - dc_parse_duration_seconds: tradução da DC para SQL;
+    - dc_last_completion_timestamp_seconds.
+    """
+    def __init__(self):
+        self.completed = Counter("dc_checks_completed_total", "DCs finalizadas", ["strategy"])
+        self.violations = Counter("dc_violations_found_total", "Violações encontradas", ["strategy"])
+        self.rows_scanned = Counter("dc_rows_scanned_total", "Linhas lidas pelo DuckDB nas DCs com self-join")
+        self.latency = Histogram("dc_check_duration_seconds", "Tempo de parede por DC", ["strategy"],
+                                 LATENCY_BUCKETS)
+        self.parse = Histogram("dc_parse_duration_seconds", "Tempo de tradução da DC para SQL", (), PARSE_BUCKETS)
+        self.last_completion = Gauge("dc_last_completion_timestamp_seconds", "Momento em que a última DC terminou")
+
+    def observe(self, record):
+        strategy = record["strategy"]
+        self.completed.inc(1, strategy)
+        self.last_completion.set(record["finished_at"])
+
+        if strategy in NOT_CHECKED:
+            return
+
+        self.violations.inc(record["violations"], strategy)
+        self.latency.observe(record["wall_s"], strategy)
+        if "parse_s" in record:
+            self.parse.observe(record["parse_s"])
+        if strategy == SQL_JOIN and "rows_scanned" in record:
+            self.rows_scanned.inc(record["rows_scanned"])
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.completed, self.violations, self.rows_scanned, self.latency, self.parse,
+                       self.last_completion):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """
+        Grava as métricas para o textfile collector do node_exporter. A
+        escrita vai para um arquivo temporário renomeado no fim, para o
+        coletor nunca ler um arquivo pela metade.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+###########################################################
+# endpoint /metrics
+###########################################################
+
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    """
+    Sobe um servidor HTTP em uma thread daemon com as métricas em
+    /metrics; devolve o servidor (shutdown para parar).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # sem uma linha no stderr a cada coleta
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Métricas em http://{host}:{server.server_address[1]}/metrics")
+
+    return server
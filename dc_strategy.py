@@ -0,0 +1,197 @@
+import math
+from collections import Counter, namedtuple
+from threading import Lock
+
+from dc_ir import Op, quote_column
+from dc_planner import (dc_to_predicates, canonical_predicate, is_equality_only, is_fd_style, source_sql,
+                        GROUP_COUNT, FD_HISTOGRAM, SQL_JOIN)
+from dc_index import order_form, SORT_RANK
+
+
+# estratégia escolhida para uma DC, o porquê e o custo estimado de cada candidata
+Choice = namedtuple("Choice", ["strategy", "reason", "costs"])
+
+# em caso de empate vence a que aparece antes
+STRATEGY_ORDER = [GROUP_COUNT, FD_HISTOGRAM, SORT_RANK, SQL_JOIN]
+
+
+###########################################################
+# estatísticas das colunas
+###########################################################
+
+class TableStats:
+    """
+    Número de linhas e, por coluna, (não nulos, valores distintos) de cada
+    tabela, lidos com uma agregação por lote de colunas e guardados para
+    as próximas DCs. approx_count_distinct (HyperLogLog) basta para o
+    modelo de custo e não ordena nada.
+    """
+    def __init__(self):
+        self._rows = {}
+        self._columns = {}
+        self._lock = Lock()
+
+    def get(self, connection, table_name, columns) -> tuple:
+        """Devolve (linhas, {coluna: (não nulos, distintos)})."""
+        with self._lock:
+            missing = [c for c in dict.fromkeys(columns) if (table_name, c) not in self._columns]
+
+            if missing or table_name not in self._rows:
+                aggregates = ", ".join(
+                    f"COUNT({quote_column(c)}), approx_count_distinct({quote_column(c)})" for c in missing
+                )
+                row = connection.execute(
+                    f"SELECT COUNT(*){', ' + aggregates if aggregates else ''} FROM {source_sql(table_name)};"
+                ).fetchone()
+
+                self._rows[table_name] = row[0]
+                for k, column in enumerate(missing):
+                    self._columns[table_name, column] = (row[1 + 2 * k], max(1, row[2 + 2 * k]))
+
+            return self._rows[table_name], {c: self._columns[table_name, c] for c in columns}
+
+    def forget(self, table_name):
+        with self._lock:
+            self._rows.pop(table_name, None)
+            for key in [key for key in self._columns if key[0] == table_name]:
+                del self._columns[key]
+
+
+###########################################################
+# modelo de custo
+###########################################################
+
+def selectivity(op, distinct) -> float:
+    """Fração esperada dos pares que satisfazem o predicado, com valores uniformes."""
+    if op == "EQUAL":
+        return 1 / distinct
+    if op == "UNEQUAL":
+        return 1 - 1 / distinct
+    if op in ("LESS", "GREATER"):
+        return (1 - 1 / distinct) / 2
+    return (1 + 1 / distinct) / 2
+
+
+def non_null_rows(predicates, rows, column_stats) -> float:
+    """Linhas esperadas sem NULL em nenhuma coluna da DC, com colunas independentes."""
+    non_null = rows
+    for column in {p[0] for p in predicates} | {p[3] for p in predicates}:
+        non_null *= column_stats[column][0] / max(rows, 1)
+    return non_null
+
+
+def estimate_pairs(predicates, rows, column_stats) -> float:
+    """
+    Pares (t1, t2) estimados que satisfazem todos os predicados, ou seja,
+    as violações da DC, supondo colunas independentes e valores uniformes.
+    """
+    predicates = [canonical_predicate(p) for p in predicates]
+    pairs = non_null_rows(predicates, rows, column_stats) ** 2
+    for col1, _, op, col2, _ in predicates:
+        pairs *= selectivity(op, max(column_stats[col1][1], column_stats[col2][1]))
+    return pairs
+
+
+def estimate_costs(predicates, rows, column_stats) -> dict:
+    """
+    Custo estimado, em linhas ou pares tocados, de cada estratégia que
+    consegue avaliar a DC:
+
+    - group_count e fd_histogram: um scan com agregação, ~n;
+    - sort_rank: ordenar os postos, n log n por contagem, vezes log n com
+      duas ordens (inversões), vezes 2 a cada != (inclusão-exclusão);
+    - sql_join: n log n para o join mais os pares candidatos que ele
+      enumera. O DuckDB faz hash join nas igualdades e IEJoin/merge join
+      em até duas desigualdades quando não há igualdade; os outros
+      predicados só filtram os candidatos.
+    """
+    n = max(rows, 2)
+    log_n = math.log2(n)
+    predicates = [canonical_predicate(p) for p in predicates]
+
+    def distinct(column):
+        return column_stats[column][1]
+
+    non_null = non_null_rows(predicates, n, column_stats)
+    costs = {}
+
+    if is_equality_only(predicates):
+        costs[GROUP_COUNT] = n
+    if is_fd_style(predicates):
+        costs[FD_HISTOGRAM] = n
+
+    form = order_form(predicates)
+    if form is not None:
+        _, orders, unequals = form
+        costs[SORT_RANK] = n * log_n * (log_n if len(orders) == 2 else 1) * 2 ** len(unequals)
+
+    equalities = [p for p in predicates if p[2] == "EQUAL"]
+    ranges = [p for p in predicates if p[2] not in ("EQUAL", "UNEQUAL")][:2]
+    join_predicates = equalities or ranges
+
+    candidates = non_null ** 2
+    for col1, _, op, col2, _ in join_predicates:
+        candidates *= selectivity(op, max(distinct(col1), distinct(col2)))
+    costs[SQL_JOIN] = n * log_n + candidates
+
+    return costs
+
+
+def describe(predicates) -> str:
+    """Mistura de operadores da DC, como '= x1, < x2'."""
+    symbols = Counter(Op(op).sql for _, _, op, _, _ in predicates)
+    return ", ".join(f"{symbol} x{count}" for symbol, count in sorted(symbols.items()))
+
+
+def choose(predicates, rows, column_stats) -> Choice:
+    """Escolhe a estratégia de menor custo estimado entre as que avaliam a DC."""
+    costs = estimate_costs(predicates, rows, column_stats)
+    strategy = min(costs, key=lambda s: (costs[s], STRATEGY_ORDER.index(s)))
+
+    estimates = ", ".join(f"{s} ~{costs[s]:.2g}" for s in STRATEGY_ORDER if s in costs)
+    reason = f"{describe(predicates)}; {rows} linhas; custo estimado: {estimates}"
+
+    return Choice(strategy, reason, costs)
+
+
+###########################################################
+# plano de uma tabela
+###########################################################
+
+def plan_strategies(connection, table_name, indexed_dcs, stats=None) -> tuple:
+    """
+    Escolhe a estratégia de cada DC (i, dc_json) de uma tabela pelas
+    estatísticas das colunas que ela usa. Devolve (plano, escolhas): o
+    plano agrupa as DCs por estratégia, como (i, predicados), menos as de
+    sql_join, que continuam (i, dc_json); escolhas é [(i, Choice)].
+    """
+    stats = stats or TableStats()
+    parsed = [(i, dc_json, dc_to_predicates(dc_json)) for i, dc_json in indexed_dcs]
+
+    columns = sorted({c for _, _, predicates in parsed for p in predicates for c in (p[0], p[3])})
+    rows, column_stats = stats.get(connection, table_name, columns) if parsed else (0, {})
+
+    plan = {strategy: [] for strategy in STRATEGY_ORDER}
+    choices = []
+
+    for i, dc_json, predicates in parsed:
+        choice = choose(predicates, rows, column_stats)
+        choices.append((i, choice))
+        plan[choice.strategy].append((i, dc_json) if choice.strategy == SQL_JOIN else (i, predicates))
+
+    return plan, choices
+
+
+def print_choices(choices, verbose=False):
+    """
+    Com verbose, registra as escolhas: uma linha por DC com o motivo e um
+    resumo por estratégia.
+    """
+    if not choices or not verbose:
+        return
+
+    for i, choice in sorted(choices):
+        print(f"Estratégia da DC #{i+1}: {choice.strategy} ({choice.reason})")
+
+    totals = Counter(choice.strategy for _, choice in choices)
+    print("Estratégias: " + ", ".join(f"{totals[s]} {s}" for s in STRATEGY_ORDER if totals[s]))
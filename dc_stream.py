@@ -0,0 +1,139 @@
+import json
+import re
+from queue import Queue
+from threading import Thread
+
+from dc_planner import dc_to_predicates, choose_strategy
+
+
+###########################################################
+# leitura preguiçosa das DCs
+###########################################################
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+def iter_json_texts(stream, chunk_size=1 << 20):
+    """
+    Gera o texto de cada objeto JSON de um fluxo com objetos concatenados
+    ({...}{...}), um por linha ou separados por qualquer espaço em branco.
+
+    stream é qualquer objeto com read(n) que devolve str: um arquivo aberto
+    em modo texto, io.StringIO ou socket.makefile('r'). O fluxo é lido em
+    blocos de chunk_size e as fronteiras vêm do raw_decode do json, então
+    '}{' dentro de strings não quebra nada e só o trecho ainda não
+    consumido é copiado quando chega um bloco novo.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+
+        if pos == len(buffer):
+            if eof:
+                return
+            buffer = stream.read(chunk_size)
+            pos = 0
+            if not buffer:
+                return
+            continue
+
+        try:
+            _, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # objeto cortado no fim do bloco: lê mais e tenta de novo
+            if eof:
+                raise
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield buffer[pos:end]
+        pos = end
+
+
+def read_dcs(results_file):
+    """Gera (i, dc_json) para cada DC do arquivo, sem carregá-lo inteiro."""
+    with open(results_file, 'r', encoding='utf-8') as f:
+        yield from enumerate(iter_json_texts(f))
+
+
+def parse_dcs(indexed_dcs):
+    """Gera (i, dc_json, predicados, estratégia) para cada DC lida."""
+    for i, dc_json in indexed_dcs:
+        predicates = dc_to_predicates(dc_json)
+        yield i, dc_json, predicates, choose_strategy(predicates)
+
+
+###########################################################
+# pipeline produtor/consumidor com backpressure
+###########################################################
+
+_END = None
+
+
+def _produce(parsed_dcs, queue, num_workers, errors):
+    try:
+        for item in parsed_dcs:
+            queue.put(item) # bloqueia quando a fila está cheia
+    except Exception as e:
+        # JSON ou DC inválida: os workers terminam o que já foi lido e o
+        # erro é relançado na thread principal
+        errors.append(e)
+    finally:
+        for _ in range(num_workers):
+            queue.put(_END)
+
+
+def _consume(main_connection, queue, check_dc, on_result):
+    cursor = main_connection.cursor()
+
+    while True:
+        item = queue.get()
+        if item is _END:
+            break
+
+        i = item[0]
+        try:
+            on_result(i, check_dc(cursor, *item))
+        except Exception as e:
+            print(f"DC #{i+1}: erro: {e}")
+
+
+def run_streaming(main_connection, parsed_dcs, check_dc, on_result, num_workers=1, queue_size=64):
+    """
+    Executa as DCs à medida que são lidas do arquivo.
+
+    Um thread produtor consome o gerador parsed_dcs e coloca cada DC em uma
+    fila limitada a queue_size; num_workers threads, cada uma com seu
+    cursor, tiram DCs da fila e chamam check_dc(cursor, i, dc_json,
+    predicados, estratégia). Quando os workers ficam para trás a fila
+    enche e a leitura do arquivo pausa, então a memória não cresce com o
+    número de DCs. Cada resultado é entregue a on_result(i, violações)
+    assim que fica pronto. Um erro na leitura ou no parse das DCs é
+    relançado aqui, depois que os workers terminam.
+    """
+    queue = Queue(maxsize=queue_size)
+    errors = []
+
+    producer = Thread(target=_produce, args=(parsed_dcs, queue, num_workers, errors), daemon=True)
+    workers = [
+        Thread(target=_consume, args=(main_connection, queue, check_dc, on_result))
+        for _ in range(num_workers)
+    ]
+
+    producer.start()
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+    producer.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,199 @@
+import json
+import re
+
+from dc_ir import quote_column
+from dc_planner import source_sql, register_table
+
+
+###########################################################
+# tipos das colunas
+###########################################################
+
+NUMERIC = "numeric"
+TEXT = "text"
+TEMPORAL = "temporal"
+BOOLEAN = "boolean"
+
+_FAMILIES = [
+    (re.compile(r"^(U?(TINY|SMALL|BIG|HUGE)?INT(EGER)?|DECIMAL.*|NUMERIC.*|FLOAT|REAL|DOUBLE)$"), NUMERIC),
+    (re.compile(r"^(VARCHAR|TEXT|STRING)$"), TEXT),
+    (re.compile(r"^(DATE|TIME.*)$"), TEMPORAL),
+    (re.compile(r"^BOOL(EAN)?$"), BOOLEAN),
+]
+
+
+def type_family(sql_type: str) -> str:
+    """Família de comparação de um tipo do DuckDB (o próprio tipo se não for conhecido)."""
+    for pattern, family in _FAMILIES:
+        if pattern.match(sql_type):
+            return family
+
+    return sql_type
+
+
+def column_types(connection, table_name) -> dict:
+    """Tipos que o DuckDB detectou para as colunas da tabela: {coluna: tipo}."""
+    rows = connection.execute(f"DESCRIBE SELECT * FROM {source_sql(table_name)};").fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def cast_column(column: str, sql_type: str) -> str:
+    """Nome da coluna pré-convertida na tabela tipada."""
+    return f"{column}::{sql_type}"
+
+
+###########################################################
+# inferência dos pares comparáveis
+###########################################################
+
+class TypeResolver:
+    """
+    Decide, uma vez por par de colunas, como um predicado entre colunas
+    diferentes deve ser comparado.
+
+    Colunas da mesma família (BIGINT com DOUBLE, DATE com TIMESTAMP)
+    comparam direto. Uma coluna de texto só é comparada com uma de outra
+    família se todos os seus valores não nulos convertem para o tipo da
+    outra coluna (ou para DOUBLE, no caso numérico); nesse caso ela é
+    convertida uma única vez para uma coluna nova da tabela tipada. Os
+    demais pares são incompatíveis.
+    """
+    def __init__(self, connection, table_name):
+        self._connection = connection
+        self._table_name = table_name
+        self._source = source_sql(table_name)
+        self._types = None
+        self.casts = {} # coluna convertida -> (coluna original, tipo)
+        self._pairs = {}
+
+    @property
+    def types(self) -> dict:
+        # só consulta o esquema se aparecer um predicado entre colunas
+        if self._types is None:
+            self._types = column_types(self._connection, self._table_name)
+        return self._types
+
+    def _converts(self, column, sql_type) -> bool:
+        failures = self._connection.execute(
+            f"SELECT COUNT(*) FROM {self._source} "
+            f"WHERE {quote_column(column)} IS NOT NULL AND TRY_CAST({quote_column(column)} AS {sql_type}) IS NULL;"
+        ).fetchone()[0]
+        return failures == 0
+
+    def _text_target(self, text_column, other_type):
+        targets = [other_type]
+        if type_family(other_type) == NUMERIC and other_type != "DOUBLE":
+            targets.append("DOUBLE")
+
+        for target in targets:
+            if self._converts(text_column, target):
+                return target
+
+        return None
+
+    def resolve(self, column1, column2) -> tuple:
+        """
+        Devolve (coluna1, coluna2, motivo): as colunas que o predicado deve
+        comparar e, se o par for incompatível, o motivo (senão None).
+        """
+        key = (column1, column2)
+        if key in self._pairs:
+            return self._pairs[key]
+
+        type1, type2 = self.types.get(column1), self.types.get(column2)
+        family1, family2 = type_family(type1 or ""), type_family(type2 or "")
+        resolved = (column1, column2, None)
+
+        # coluna inexistente: o erro fica para a execução da DC
+        if type1 and type2 and column1 != column2 and family1 != family2:
+            if TEXT in (family1, family2):
+                text_column, other_type = (column1, type2) if family1 == TEXT else (column2, type1)
+                target = self._text_target(text_column, other_type)
+
+                if target is None:
+                    resolved = (column1, column2,
+                                f"{column1} ({type1}) e {column2} ({type2}) não são comparáveis: "
+                                f"{text_column} tem valores que não convertem para {other_type}")
+                else:
+                    cast = cast_column(text_column, target)
+                    self.casts[cast] = (text_column, target)
+                    resolved = (cast, column2, None) if text_column == column1 else (column1, cast, None)
+            else:
+                resolved = (column1, column2, f"{column1} ({type1}) e {column2} ({type2}) não são comparáveis")
+
+        self._pairs[key] = resolved
+        return resolved
+
+
+###########################################################
+# pré-conversão das DCs
+###########################################################
+
+def _coerce_dc(resolver, dc_json):
+    """Reescreve os predicados entre colunas; devolve (dc_json, motivo)."""
+    dc = json.loads(dc_json)
+    changed = False
+
+    for p in dc["predicates"]:
+        column1, column2 = p["column1"]["columnIdentifier"], p["column2"]["columnIdentifier"]
+        if column1 == column2:
+            continue
+
+        new_column1, new_column2, reason = resolver.resolve(column1, column2)
+        if reason is not None:
+            return dc_json, reason
+
+        if (new_column1, new_column2) != (column1, column2):
+            p["column1"]["columnIdentifier"] = new_column1
+            p["column2"]["columnIdentifier"] = new_column2
+            changed = True
+
+    if not changed:
+        return dc_json, None
+
+    return json.dumps(dc, separators=(",", ":"), ensure_ascii=False), None
+
+
+def typed_table_name(table_name: str) -> str:
+    return "dc_typed_" + re.sub(r"\W", "_", table_name)
+
+
+def coerce_dcs(connection, table_name, indexed_dcs) -> tuple:
+    """
+    Prepara as DCs (i, dc_json) de uma tabela para predicados entre colunas
+    de tipos diferentes.
+
+    Devolve (tabela, dcs, rejeitadas): se alguma coluna de texto precisa
+    de conversão, tabela é uma cópia da original com as colunas convertidas
+    a mais (col::TIPO), calculadas uma vez, e as DCs passam a referenciá-las;
+    assim o self-join e o conjunto de evidências comparam colunas já do
+    mesmo tipo, sem CAST por linha. rejeitadas lista (i, motivo) das DCs com
+    algum predicado entre colunas incompatíveis, que ficam de fora.
+    """
+    resolver = TypeResolver(connection, table_name)
+    coerced, rejected = [], []
+
+    for i, dc_json in indexed_dcs:
+        dc_json, reason = _coerce_dc(resolver, dc_json)
+        if reason is None:
+            coerced.append((i, dc_json))
+        else:
+            rejected.append((i, reason))
+
+    if not resolver.casts:
+        return table_name, coerced, rejected
+
+    casts = ", ".join(
+        f"TRY_CAST({quote_column(column)} AS {sql_type}) AS {quote_column(cast)}"
+        for cast, (column, sql_type) in sorted(resolver.casts.items())
+    )
+    typed_table = typed_table_name(table_name)
+    connection.execute(f'CREATE OR REPLACE TABLE "{typed_table}" AS SELECT *, {casts} FROM {source_sql(table_name)};')
+    register_table(typed_table)
+
+    return typed_table, coerced, rejected
+
+
+def print_rejected(rejected):
+    for i, reason in sorted(rejected):
+        print(f"DC #{i+1}: rejeitada, {reason}")
@@ -0,0 +1,178 @@
+from queue import Queue, Full
+from threading import Event, Thread
+
+
+# linhas por chunk; o DuckDB entrega vetores de 2048 linhas
+DEFAULT_CHUNK_ROWS = 64 * 2048
+
+FORMATS = ("numpy", "pandas", "arrow", "rows")
+
+
+###########################################################
+# chunks de violações
+###########################################################
+
+def violation_chunks(connection, sql_query, chunk_rows=DEFAULT_CHUNK_ROWS, fmt="numpy"):
+    """
+    Gera os pares que violam uma DC (o SELECT t1.*, t2.* do dc_to_sql) em
+    chunks de até chunk_rows linhas, em vez de uma tupla por fetchone:
+
+    - numpy: {coluna: array}, com os nomes que o DuckDB dá ao resultado
+      (as colunas de t2 repetidas ganham o sufixo _1), montado sem o
+      pandas (ver numpy_chunks);
+    - pandas: DataFrame;
+    - arrow: pyarrow.RecordBatch (fetch_record_batch, exige pyarrow);
+    - rows: lista de tuplas (fetchmany), os mesmos valores do fetchone.
+
+    O DuckDB executa a consulta em streaming: os pares só são calculados
+    à medida que os chunks são pedidos, então a memória não depende do
+    número de violações. A conexão não pode executar outra consulta
+    enquanto o gerador estiver em uso.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+
+    result = connection.execute(sql_query)
+
+    if fmt == "arrow":
+        yield from result.fetch_record_batch(chunk_rows)
+        return
+
+    if fmt == "rows":
+        while True:
+            rows = result.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield rows
+
+    if fmt == "numpy":
+        yield from numpy_chunks(result, chunk_rows)
+        return
+
+    # fetch_df_chunk pede o tamanho em vetores de 2048 linhas
+    vectors = max(1, chunk_rows // 2048)
+    while True:
+        df = result.fetch_df_chunk(vectors)
+        if len(df) == 0:
+            return
+        yield df
+
+
+def result_names(description) -> list:
+    """Nomes das colunas do resultado como o fetchnumpy do DuckDB: repetidos ganham _1, _2..."""
+    names = []
+    seen = set()
+    for column in description:
+        name, k = column[0], 1
+        while name in seen:
+            name = f"{column[0]}_{k}"
+            k += 1
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def numpy_chunks(result, chunk_rows):
+    """
+    {coluna: array} por chunk. O fetchnumpy lê o resultado inteiro de uma
+    vez, então os chunks vêm do fetch_record_batch (colunas Arrow
+    convertidas sem cópia quando possível) ou, sem pyarrow, das tuplas do
+    fetchmany.
+    """
+    import numpy
+
+    names = result_names(result.description)
+
+    try:
+        import pyarrow  # noqa: F401 -- só para saber se o fetch_record_batch funciona
+    except ImportError:
+        while True:
+            rows = result.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield {name: numpy.array(values) for name, values in zip(names, zip(*rows))}
+
+    for batch in result.fetch_record_batch(chunk_rows):
+        if batch.num_rows:
+            yield {name: batch.column(k).to_numpy(zero_copy_only=False) for k, name in enumerate(names)}
+
+
+def chunk_len(chunk) -> int:
+    if isinstance(chunk, dict):
+        return len(next(iter(chunk.values()), ()))
+    return chunk.num_rows if hasattr(chunk, "num_rows") else len(chunk)
+
+
+###########################################################
+# leitura antecipada com backpressure
+###########################################################
+
+_END = object()
+
+
+class ViolationStream:
+    """
+    Itera os chunks de violation_chunks com uma thread que busca os
+    próximos enquanto o consumidor processa o atual. A fila guarda no
+    máximo prefetch chunks: quando o consumidor atrasa a thread bloqueia,
+    para de pedir chunks e o DuckDB para de produzir pares, então a
+    memória fica limitada a prefetch + 2 chunks qualquer que seja o total.
+
+    A conexão (use um cursor próprio) fica com a thread até o fim da
+    iteração ou até close, que também vale para o consumidor que para
+    antes do fim:
+
+        with ViolationStream(cursor, sql) as stream:
+            for chunk in stream:
+                ...
+    """
+    def __init__(self, connection, sql_query, chunk_rows=DEFAULT_CHUNK_ROWS, fmt="numpy", prefetch=2):
+        self.rows = 0
+        # chunks já pedidos ao DuckDB pela thread, entregues ou não
+        self.fetched = 0
+        self._queue = Queue(maxsize=max(1, prefetch))
+        self._stop = Event()
+        self._thread = Thread(target=self._produce, args=(connection, sql_query, chunk_rows, fmt), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # put com timeout para perceber o close enquanto a fila está cheia
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _produce(self, connection, sql_query, chunk_rows, fmt):
+        try:
+            for chunk in violation_chunks(connection, sql_query, chunk_rows, fmt):
+                self.fetched += 1
+                if not self._put(chunk):
+                    return
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(_END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+
+            self.rows += chunk_len(item)
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()